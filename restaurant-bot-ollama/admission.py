@@ -0,0 +1,127 @@
+# Admission control in front of Ollama calls.
+#
+# At most `max_concurrent` model calls run at once; the rest wait in a bounded
+# queue. Waiters are served by priority (order summaries before chat), FIFO
+# within a priority, with aging so chat is never starved by a stream of
+# summaries. A request is shed with Overloaded when the queue is full, when its
+# estimated wait already exceeds `max_wait_s`, or when it actually waits that
+# long, so latency degrades gracefully instead of every call timing out at once.
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+SUMMARY, CHAT = 0, 1
+PRIORITIES = {"summary": SUMMARY, "chat": CHAT}
+DEFAULT_MAX_CONCURRENT = 2
+DEFAULT_MAX_QUEUE = 16
+DEFAULT_MAX_WAIT_S = 60.0
+AGING_S = 10.0            # a waiter gains one priority level per AGING_S seconds queued
+POLL_S = 0.5              # how often waiters report their position
+EWMA_ALPHA = 0.2
+INITIAL_SERVICE_S = 5.0   # service-time guess until real calls have been timed
+
+class Overloaded(Exception):
+    """Raised when a call is shed instead of queued."""
+
+class Ticket:
+    def __init__(self, priority: int, seq: int):
+        self.priority = priority
+        self.seq = seq
+        self.enqueued = time.monotonic()
+        self.granted = threading.Event()
+
+    def rank(self, now: float) -> float:
+        return self.priority - (now - self.enqueued) / AGING_S
+
+class AdmissionController:
+    def __init__(self, max_concurrent: int = DEFAULT_MAX_CONCURRENT, max_queue: int = DEFAULT_MAX_QUEUE,
+                 max_wait_s: float = DEFAULT_MAX_WAIT_S):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max_queue
+        self.max_wait_s = max_wait_s
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._waiting: List[Ticket] = []
+        self.active = 0
+        self.service_s = INITIAL_SERVICE_S
+        self.admitted = self.shed = 0
+
+    # ---------- Queue ----------
+    def _order(self) -> List[Ticket]:
+        now = time.monotonic()
+        return sorted(self._waiting, key=lambda t: (t.rank(now), t.seq))
+
+    def _grant_next(self):
+        # Caller holds the lock.
+        while self.active < self.max_concurrent and self._waiting:
+            ticket = self._order()[0]
+            self._waiting.remove(ticket)
+            self.active += 1
+            ticket.granted.set()
+
+    def estimated_wait(self, position: int) -> float:
+        """Seconds until a waiter with `position` callers ahead of it is admitted."""
+        return (position // self.max_concurrent + 1) * self.service_s if position >= 0 else 0.0
+
+    def position(self, ticket: Ticket) -> int:
+        with self._lock:
+            order = self._order()
+            return order.index(ticket) if ticket in order else -1
+
+    @contextmanager
+    def slot(self, kind: str = "chat", on_wait: Optional[Callable[[int, float], None]] = None,
+             block: bool = True) -> Iterator[None]:
+        """Hold one of the concurrent slots for the duration of the block.
+        `on_wait(position, estimated_wait_s)` is called every POLL_S while queued. With block=False
+        (speculative work) Overloaded is raised at once unless a slot is free right now."""
+        ticket = Ticket(PRIORITIES.get(kind, CHAT), next(self._seq))
+        with self._lock:
+            if self.active < self.max_concurrent and not self._waiting:
+                self.active += 1
+                ticket.granted.set()
+            elif not block:
+                raise Overloaded("no free slot")
+            elif len(self._waiting) >= self.max_queue or \
+                    self.estimated_wait(len(self._waiting)) > self.max_wait_s:
+                self.shed += 1
+                raise Overloaded(f"{len(self._waiting)} requests already waiting")
+            else:
+                self._waiting.append(ticket)
+        try:
+            while not ticket.granted.wait(POLL_S):
+                if time.monotonic() - ticket.enqueued > self.max_wait_s:
+                    with self._lock:
+                        if not ticket.granted.is_set():
+                            self._waiting.remove(ticket)
+                            self.shed += 1
+                            raise Overloaded(f"waited more than {self.max_wait_s:.0f}s")
+                    break  # granted while we were giving up
+                if on_wait is not None:
+                    position = self.position(ticket)
+                    on_wait(position, self.estimated_wait(position))
+        except BaseException:
+            with self._lock:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                elif ticket.granted.is_set():
+                    self.active -= 1
+                    self._grant_next()
+            raise
+        started = time.monotonic()
+        with self._lock:
+            self.admitted += 1
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self.service_s = (1 - EWMA_ALPHA) * self.service_s + EWMA_ALPHA * elapsed
+                self.active -= 1
+                self._grant_next()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {"active": self.active, "waiting": len(self._waiting), "admitted": self.admitted,
+                    "shed": self.shed, "service_s": self.service_s}
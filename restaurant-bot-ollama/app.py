@@ -1,20 +1,67 @@
 # Enhanced Streamlit restaurant ordering bot (Ollama local). Save file as UTF-8.
+import functools
+import asyncio
 import json
+import logging
 import os
-import re
+import httpx
 import requests
 import streamlit as st
 import pandas as pd
 import time
-from datetime import datetime
-from typing import Dict, Any, List, Optional, Tuple
+import order_store
+from ollama_client import DEFAULT_POOL_SIZE, DEFAULT_CONNECT_TIMEOUT, DEFAULT_RETRIES
+from menu_index import MenuIndex
+from pricing import calculate_total_from_summary, unresolved_lines
+from order_parser import FAST_PATH_CONFIDENCE
+from cart import Cart
+from response_cache import (DEFAULT_MAX_ENTRIES as DEFAULT_CACHE_ENTRIES,
+                            DEFAULT_TTL_S as DEFAULT_CACHE_TTL_S, ResponseCache)
+from context_window import DEFAULT_KEEP_RECENT, DEFAULT_NUM_CTX, RESERVED_REPLY_TOKENS, cart_summary, fit_context
+from ollama_health import DEFAULT_INTERVAL as DEFAULT_HEALTH_INTERVAL
+from admission import (AdmissionController, Overloaded, DEFAULT_MAX_CONCURRENT, DEFAULT_MAX_QUEUE,
+                       DEFAULT_MAX_WAIT_S)
+from ollama_async import AsyncOllamaClient, BackgroundLoop
+from ollama_router import DEFAULT_FAILURE_THRESHOLD, DEFAULT_RESET_TIMEOUT, OllamaRouter, parse_endpoints
+from order_stats import SalesStats
+from order_analytics import OrderAnalytics
+from menu_service import DEFAULT_RELOAD_INTERVAL, MenuService
+from backend_client import BackendClient, BackendError, RemoteAnalytics, RemoteStats
+from session_store import (DEFAULT_MAX_CACHED as DEFAULT_SESSION_CACHE, DEFAULT_SESSION_DIR,
+                           DEFAULT_TTL_S as DEFAULT_SESSION_TTL_S, SessionStore, new_session_id, valid_session_id)
+from telemetry import Span, Telemetry, configure_json_logs
+from json_extract import JsonObjectScanner
+from order_schema import ORDER_JSON_SCHEMA, order_json, parse_order
+from concurrent.futures import Future
+from typing import Callable, Dict, Any, Iterator, List, Optional, Sequence, Tuple, Union
 
 # ---------- Config ----------
-# Get Ollama URL from Streamlit Secrets
-OLLAMA_URL = st.secrets.get("OLLAMA_URL", "http://localhost:11434")
+def setting(name: str, default: Any) -> Any:
+    # st.secrets raises when no secrets.toml exists at all; treat that as "use the default".
+    try:
+        return st.secrets.get(name, default)
+    except FileNotFoundError:
+        return default
+
+# Get Ollama URL from Streamlit Secrets; OLLAMA_URLS (list or comma-separated) spreads load over several hosts
+OLLAMA_URL = setting("OLLAMA_URL", "http://localhost:11434")
+OLLAMA_URLS = parse_endpoints(setting("OLLAMA_URLS", None) or OLLAMA_URL)
+# With a backend service (backend.py) this app is a thin client: Ollama calls, order writes and stats go there
+BACKEND_URL = setting("BACKEND_URL", None)
 DEFAULT_MODEL = "gemma:2b"  # small model
 MENU_FILE = "menu.json"
-ORDERS_FILE = "orders.csv"
+ORDERS_FILE = order_store.DEFAULT_JOURNAL  # append-only, see order_store.py
+SUMMARY_CONTEXT_TURNS = 8  # max recent messages sent with a cart correction request
+SUMMARY_PREFETCH_WAIT = 120  # seconds Calculate waits for an in-flight prefetched summary
+
+# Prompt-prefix caching: keep the model loaded and the system prompt byte-identical so
+# Ollama can reuse the evaluated prefix (KV cache) instead of re-reading the menu cold.
+DEFAULT_KEEP_ALIVE = "30m"
+# Per call type. Keep num_ctx equal across types: a different num_ctx makes Ollama reload the model.
+DEFAULT_CALL_OPTIONS = {
+    "chat": {"num_ctx": 4096, "num_predict": 256},
+    "summary": {"num_ctx": 4096, "num_predict": 512, "temperature": 0},
+}
 
 # ---------- Custom CSS for styling ----------
 def load_css():
@@ -176,15 +223,19 @@ def render_custom_header():
     </div>
     """, unsafe_allow_html=True)
 
-def render_connection_status(ollama_url):
-    try:
-        response = requests.get(f"{ollama_url}/api/tags", timeout=5)
-        if response.status_code == 200:
-            status_html = '<span class="status-indicator status-online"></span>Ollama Connected'
-        else:
-            status_html = '<span class="status-indicator status-offline"></span>Ollama Disconnected'
-    except Exception as e:
-        status_html = f'<span class="status-indicator status-offline"></span>Connection Error: {str(e)[:50]}'
+def render_connection_status(health: List[Dict[str, Any]]):
+    # Reads the background monitors' cached results; never blocks the rerun on the network.
+    online = [h for h in health if h["online"]]
+    if all(h["online"] is None for h in health):
+        status_html = '<span class="status-indicator status-offline"></span>Checking...'
+    elif online:
+        latency = min(h["latency_ms"] for h in online)
+        backends = f", {len(online)}/{len(health)} backends" if len(health) > 1 else ""
+        status_html = f'<span class="status-indicator status-online"></span>Ollama Connected ({latency:.0f} ms{backends})'
+    elif health[0]["error"]:
+        status_html = f'<span class="status-indicator status-offline"></span>Connection Error: {health[0]["error"][:50]}'
+    else:
+        status_html = '<span class="status-indicator status-offline"></span>Ollama Disconnected'
     
     st.sidebar.markdown(f'**Connection Status:** {status_html}', unsafe_allow_html=True)
 
@@ -196,9 +247,7 @@ def render_menu_card(menu_text):
     """, unsafe_allow_html=True)
     
     if menu_text:
-        # Format menu text with better styling
-        formatted_menu = menu_text.replace("🍕", "🍕").replace("🥓", "🥓").replace("🍟", "🍟").replace("🥤", "🥤")
-        st.markdown(f"```\n{formatted_menu}\n```")
+        st.markdown(f"```\n{menu_text}\n```")
     else:
         st.warning("No menu loaded. Please create menu.json file.")
     
@@ -212,16 +261,99 @@ def render_order_summary_card(total, line_items):
         st.dataframe(df, use_container_width=True)
     st.markdown('</div>', unsafe_allow_html=True)
 
+# ---------- Helpers: backend service ----------
+@st.cache_resource
+def get_backend() -> Optional[BackendClient]:
+    # None runs everything in this process; otherwise one pooled client per process.
+    if not BACKEND_URL: return None
+    return BackendClient(
+        BACKEND_URL,
+        pool_size=int(setting("OLLAMA_POOL_SIZE", DEFAULT_POOL_SIZE)),
+        connect_timeout=float(setting("OLLAMA_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT)),
+    )
+
+def ollama_status(endpoints: Tuple[str, ...]) -> Dict[str, Any]:
+    """Backend health, pulled models, routing snapshot and admission queue stats."""
+    backend = get_backend()
+    if backend: return backend.status()
+    router = get_ollama_router(endpoints)
+    return {"endpoints": list(endpoints), "health": router.health(), "models": router.models(),
+            "backends": router.snapshot(), "queue": get_admission_controller(endpoints).stats()}
+
+# ---------- Helpers: session persistence ----------
+@st.cache_resource
+def get_session_store() -> Optional[SessionStore]:
+    # One per process; UI replicas on one host can share SESSION_DIR so a reconnect may land anywhere.
+    if not bool(setting("SESSION_PERSISTENCE", True)): return None
+    return SessionStore(
+        setting("SESSION_DIR", DEFAULT_SESSION_DIR),
+        ttl_s=float(setting("SESSION_TTL", DEFAULT_SESSION_TTL_S)),
+        max_cached=int(setting("SESSION_CACHE_SIZE", DEFAULT_SESSION_CACHE)),
+    ).start()
+
+def session_id() -> str:
+    """This conversation's id, kept in the page URL (?sid=) so a reload or reconnect finds it again."""
+    sid = st.query_params.get("sid")
+    if not valid_session_id(sid):
+        sid = st.session_state.get("session_id") or new_session_id()
+        st.query_params["sid"] = sid
+    st.session_state.session_id = sid
+    return sid
+
+def persist_session(store: Optional[SessionStore], sid: str, with_cart: bool = True):
+    # Nothing worth resuming until the customer has said something.
+    messages = st.session_state.get("messages") or []
+    if store is None or not any(m.get("role") == "user" for m in messages): return
+    try:
+        store.save(sid, messages, st.session_state.cart.to_state() if with_cart else None)
+    except OSError as e:
+        logging.getLogger("restaurant_bot.telemetry").warning(
+            json.dumps({"event": "session_save_failed", "error": str(e)}))
+
+# ---------- Helpers: order stats ----------
+@st.cache_resource
+def get_sales_stats(orders_file: str) -> SalesStats:
+    # One instance per process: every session and rerun shares the running aggregates.
+    return SalesStats(orders_file)
+
+@st.cache_resource
+def get_order_analytics(orders_file: str) -> OrderAnalytics:
+    # Shared SQLite store; each "View Orders" click ingests only what was appended since the last.
+    return OrderAnalytics(orders_file)
+
+def sales_stats() -> Union[SalesStats, RemoteStats]:
+    backend = get_backend()
+    if not backend: return get_sales_stats(ORDERS_FILE).refresh()
+    try:
+        return backend.stats()
+    except (requests.RequestException, BackendError):
+        return RemoteStats(0, 0.0, [0] * 24, [])  # backend down: the sidebar status already says so
+
+def order_analytics() -> Union[OrderAnalytics, RemoteAnalytics]:
+    backend = get_backend()
+    return backend.analytics if backend else get_order_analytics(ORDERS_FILE)
+
+def save_order(order: Dict[str, Any], lines: List[Dict[str, Any]]) -> str:
+    backend = get_backend()
+    if backend: return backend.append_order(order, lines)
+    with get_telemetry().span("order_write"):
+        order_id = order_store.append_order(order, lines, path=ORDERS_FILE)
+    get_telemetry().metrics.inc("orders_saved_total", help="Orders appended to the journal")
+    return order_id
+
 # ---------- Helpers: menu file ----------
+@st.cache_resource(show_spinner=False)
+def get_menu_service() -> MenuService:
+    # One loader per process: its watcher thread swaps in new menu versions, reruns only read .current.
+    fallback = None if os.path.exists(MENU_FILE) else create_sample_menu()
+    return MenuService(MENU_FILE, menu_to_text, system_prompt, fallback=fallback,
+                       interval=float(setting("MENU_RELOAD_INTERVAL", DEFAULT_RELOAD_INTERVAL))).start()
+
+def load_menu_index() -> MenuIndex:
+    return get_menu_service().current.index
+
 def load_menu() -> Dict[str, Any]:
-    if not os.path.exists(MENU_FILE):
-        return create_sample_menu()
-    try:
-        with open(MENU_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception as e:
-        st.error(f"Failed to load {MENU_FILE}: {e}")
-        return {}
+    return get_menu_service().current.menu
 
 def create_sample_menu():
     """Create a sample menu if none exists"""
@@ -312,80 +444,198 @@ def menu_to_text(menu: Dict[str, Any]) -> str:
 
     return "\n".join(out_lines).strip()
 
-# ---------- Helpers: pricing ----------
-def get_price_for_item(table: Dict[str, Any], name: Optional[str], size: Optional[str] = None) -> float:
-    if not name: return 0.0
-    name_key = name.lower().strip()
-    if not table or name_key not in table: return 0.0
-    entry = table[name_key]
-    if isinstance(entry, dict):
-        if size:
-            size_key = size.upper().strip()
-            val = entry.get(size_key)
-            if val is None:
-                for k, v in entry.items():
-                    if str(k).upper().strip() == size_key:
-                        return float(v)
-                return 0.0
-            return float(val)
-        if "REG" in entry:
-            return float(entry["REG"])
-        for v in entry.values():
-            try: return float(v)
-            except: continue
-        return 0.0
-    try: return float(entry)
-    except: return 0.0
-
-def calculate_total_from_summary(order: Dict[str, Any], menu: Dict[str, Any]) -> Tuple[float, List[Dict[str, Any]]]:
-    line_items: List[Dict[str, Any]] = []
-    total = 0.0
-
-    for p in order.get("pizzas", []):
-        name = p.get("name")
-        size = p.get("size")
-        qty = int(p.get("qty", p.get("quantity", 1)))
-        price = get_price_for_item(menu.get("pizzas", {}), name, size)
-        line_total = round(price * qty, 2)
-        total += line_total
-        line_items.append({"type": "🍕 Pizza", "name": name.title(), "size": size, "qty": qty, "unit_price": f"${price:.2f}", "total": f"${line_total:.2f}"})
-
-    for t in order.get("toppings", []):
-        name = t.get("name")
-        qty = int(t.get("qty", t.get("quantity", 1)))
-        price = get_price_for_item(menu.get("toppings", {}), name, None)
-        line_total = round(price * qty, 2)
-        total += line_total
-        line_items.append({"type": "🥓 Topping", "name": name.title(), "size": "-", "qty": qty, "unit_price": f"${price:.2f}", "total": f"${line_total:.2f}"})
-
-    for d in order.get("drinks", []):
-        name = d.get("name")
-        size = d.get("size")
-        qty = int(d.get("qty", d.get("quantity", 1)))
-        price = get_price_for_item(menu.get("drinks", {}), name, size)
-        line_total = round(price * qty, 2)
-        total += line_total
-        line_items.append({"type": "🥤 Drink", "name": name.title(), "size": size or "-", "qty": qty, "unit_price": f"${price:.2f}", "total": f"${line_total:.2f}"})
-
-    for s in order.get("sides", []):
-        name = s.get("name")
-        size = s.get("size")
-        qty = int(s.get("qty", s.get("quantity", 1)))
-        price = get_price_for_item(menu.get("sides", {}), name, size)
-        line_total = round(price * qty, 2)
-        total += line_total
-        line_items.append({"type": "🍟 Side", "name": name.title(), "size": size or "-", "qty": qty, "unit_price": f"${price:.2f}", "total": f"${line_total:.2f}"})
-
-    return round(total, 2), line_items
 # ---------- Helpers: Ollama communication ----------
-def call_ollama(ollama_url: str, model: str, messages: List[Dict[str, str]], timeout: int = 120) -> str:
-    url = f"{ollama_url}/api/chat"
-    payload = {"model": model, "messages": messages, "stream": False}
+@st.cache_resource
+def get_ollama_router(endpoints: Tuple[str, ...]) -> OllamaRouter:
+    # Shared by every rerun and session so connections stay pooled and breaker state is global.
+    # Each backend gets its own background health monitor (single connection, no retries:
+    # a probe should report failure, not mask it).
+    return OllamaRouter(
+        endpoints,
+        policy=setting("OLLAMA_ROUTING", "least_outstanding"),
+        failure_threshold=int(setting("OLLAMA_FAILURE_THRESHOLD", DEFAULT_FAILURE_THRESHOLD)),
+        reset_timeout=float(setting("OLLAMA_RESET_TIMEOUT", DEFAULT_RESET_TIMEOUT)),
+        client_kwargs={
+            "pool_size": int(setting("OLLAMA_POOL_SIZE", DEFAULT_POOL_SIZE)),
+            "connect_timeout": float(setting("OLLAMA_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT)),
+            # Another backend is a better retry than the same one: only retry in place for a single host.
+            "retries": int(setting("OLLAMA_RETRIES", DEFAULT_RETRIES)) if len(endpoints) == 1 else 0,
+        },
+        health_interval=float(setting("OLLAMA_HEALTH_INTERVAL", DEFAULT_HEALTH_INTERVAL)),
+    )
+
+@st.cache_resource
+def get_telemetry() -> Telemetry:
+    # Process-wide: spans from every session feed the same metrics and debug panel.
+    telemetry = Telemetry()
+    if setting("TRACE_LOG", False):
+        configure_json_logs(setting("TRACE_LOG_FILE", None))
+    port = setting("METRICS_PORT", None)
+    if port:
+        telemetry.serve_metrics(int(port))
+    return telemetry
+
+def render_debug_panel():
+    telemetry = get_telemetry()
+    traces = telemetry.recent_traces(int(setting("DEBUG_PANEL_TRACES", 10)))
+    if not traces: return
+    with st.sidebar.expander("🔍 Recent turn timings"):
+        rates = []
+        for mode in ("schema", "json", "prompt"):
+            ok = telemetry.metrics.value("summary_parse_total", format=mode, outcome="ok")
+            failed = telemetry.metrics.value("summary_parse_total", format=mode, outcome="failed")
+            if ok + failed:
+                rates.append(f"{mode} {ok / (ok + failed):.0%} of {ok + failed:g}")
+        if rates:
+            st.caption("Summaries parsed first try: " + " · ".join(rates))
+        rows = []
+        for t in traces:
+            row = {"kind": t["kind"], "total ms": t["duration_ms"]}
+            for span in t["spans"]:
+                row[f"{span['name']} ms"] = row.get(f"{span['name']} ms", 0.0) + span["duration_ms"]
+                if span["name"] == "ollama_call":
+                    row["tokens"] = span.get("eval_count")
+                    row["backend"] = span.get("backend")
+                if span.get("error"):
+                    row["error"] = span["error"][:60]
+            rows.append(row)
+        st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+
+@st.cache_resource
+def get_admission_controller(endpoints: Tuple[str, ...]) -> AdmissionController:
+    # One queue for every session in this process; the slot count scales with the backends.
+    return AdmissionController(
+        max_concurrent=int(setting("OLLAMA_MAX_CONCURRENT", DEFAULT_MAX_CONCURRENT * len(endpoints))),
+        max_queue=int(setting("OLLAMA_MAX_QUEUE", DEFAULT_MAX_QUEUE)),
+        max_wait_s=float(setting("OLLAMA_MAX_WAIT", DEFAULT_MAX_WAIT_S)),
+    )
+
+BUSY_REPLY = ("⏳ We're very busy right now and the ordering assistant can't take another request. "
+              "Your order so far is saved; please try again in a moment!")
+
+def queue_notifier(placeholder) -> Callable[[int, float], None]:
+    def on_wait(position: int, estimated_wait_s: float):
+        placeholder.info(f"⏳ Lots of orders right now: you're #{position + 1} in line, "
+                         f"about {estimated_wait_s:.0f}s to go.")
+    return on_wait
+
+def model_choices(live_models: List[str]) -> List[str]:
+    # Prefer what the server actually has pulled; fall back to the usual suspects.
+    return live_models or [DEFAULT_MODEL, "llama3", "mistral", "phi3"]
+
+@st.cache_resource
+def get_response_cache() -> ResponseCache:
+    return ResponseCache(
+        max_entries=int(setting("RESPONSE_CACHE_SIZE", DEFAULT_CACHE_ENTRIES)),
+        ttl_s=float(setting("RESPONSE_CACHE_TTL", DEFAULT_CACHE_TTL_S)),
+        disk_path=setting("RESPONSE_CACHE_PATH", None),
+    )
+
+def response_cache_key(kind: str, model: str, messages: List[Dict[str, str]], menu_version: str) -> str:
+    # The whole prompt, cart summary and all: the cache is shared by every session.
+    return ResponseCache.key(model, kind, menu_version, messages)
+
+def call_options(kind: str, prompt_cache: bool = True) -> Dict[str, Any]:
+    """Extra /api/chat fields for a call type ("chat" or "summary")."""
+    if not prompt_cache: return {}
+    options = dict(DEFAULT_CALL_OPTIONS[kind])
+    for key in ("num_ctx", "num_predict"):
+        options[key] = int(setting(f"{kind.upper()}_{key.upper()}", options[key]))
+    return {"keep_alive": setting("OLLAMA_KEEP_ALIVE", DEFAULT_KEEP_ALIVE), "options": options}
+
+# ---------- Helpers: structured summary output ----------
+@st.cache_resource
+def get_summary_formats() -> Dict[Tuple[str, ...], str]:
+    # Endpoint set -> "schema" or "json". Ollama before 0.5 only understands format="json" and
+    # answers a schema with HTTP 400; such servers are asked for plain JSON mode from then on.
+    return {}
+
+def summary_format(endpoints: Tuple[str, ...]) -> Optional[str]:
+    """Output constraint for summary calls: "schema", "json", or None (prompt instruction only)."""
+    if not bool(setting("STRUCTURED_SUMMARY", True)): return None
+    return get_summary_formats().get(endpoints, "schema")
+
+def format_field(mode: Optional[str]) -> Dict[str, Any]:
+    if mode == "schema": return {"format": ORDER_JSON_SCHEMA}
+    if mode == "json": return {"format": "json"}
+    return {}
+
+def schema_rejected(status: int, body: str) -> bool:
+    return status == 400 and "format" in body.lower()
+
+def downgrade_summary_format(formats: Dict[Tuple[str, ...], str], telemetry: Telemetry,
+                             endpoints: Tuple[str, ...], error: str) -> str:
+    # Takes the shared objects as arguments so the background loop can call it too.
+    formats[endpoints] = "json"
+    telemetry.metrics.inc("ollama_format_fallbacks_total", help="Endpoint sets that rejected a JSON schema format")
+    logging.getLogger("restaurant_bot.telemetry").warning(
+        json.dumps({"event": "schema_format_rejected", "endpoints": list(endpoints), "error": error[:200]}))
+    return "json"
+
+def record_summary_parse(telemetry: Telemetry, mode: Optional[str], ok: bool):
+    # One count per generated summary; "failed" means the customer has to ask again.
+    telemetry.metrics.inc("summary_parse_total", help="Generated order summaries by format and parse outcome",
+                          format=mode or "prompt", outcome="ok" if ok else "failed")
+
+def record_ollama_timings(data: Dict[str, Any], metrics: Dict[str, Any]):
+    # Ollama reports durations in nanoseconds on the final (done) response.
+    metrics["eval_count"] = data.get("eval_count")
+    metrics["eval_duration_s"] = (data.get("eval_duration") or 0) / 1e9
+    metrics["prompt_eval_count"] = data.get("prompt_eval_count")
+    metrics["prompt_eval_duration_s"] = (data.get("prompt_eval_duration") or 0) / 1e9
+    metrics["load_duration_s"] = (data.get("load_duration") or 0) / 1e9
+
+def finish_ollama_span(span: Span, kind: str, reply: str, timings: Dict[str, Any]):
+    span.set(**{k: timings.get(k) for k in ("backend", "queue_s", "ttft_s", "eval_count", "eval_duration_s",
+                                           "prompt_eval_count", "prompt_eval_duration_s", "load_duration_s")})
+    outcome = "shed" if reply == BUSY_REPLY else "error" if reply.startswith("ERROR") else "ok"
+    if outcome != "ok":
+        span.fail(reply)
+    get_telemetry().record_ollama(kind, outcome, timings)
+
+def call_ollama(ollama_url: Union[str, Sequence[str]], model: str, messages: List[Dict[str, str]], timeout: int = 120,
+                extra: Optional[Dict[str, Any]] = None, metrics: Optional[Dict[str, Any]] = None,
+                prefer: Optional[str] = None, kind: str = "chat",
+                on_wait: Optional[Callable[[int, float], None]] = None) -> str:
+    """`ollama_url` may name several backends; `prefer` keeps a session on the host it last used.
+    Waits for an admission slot (`kind` sets the priority) and returns BUSY_REPLY if shed."""
+    timings = metrics if metrics is not None else {}
+    with get_telemetry().span("ollama_call", kind=kind, model=model, stream=False) as span:
+        reply = _call_ollama(ollama_url, model, messages, timeout, extra, timings, prefer, kind, on_wait)
+        if reply == BUSY_REPLY or reply.startswith("ERROR"): timings["failed"] = reply
+        finish_ollama_span(span, kind, reply, timings)
+    return reply
+
+def _call_ollama(ollama_url: Union[str, Sequence[str]], model: str, messages: List[Dict[str, str]], timeout: int,
+                 extra: Optional[Dict[str, Any]], metrics: Dict[str, Any], prefer: Optional[str], kind: str,
+                 on_wait: Optional[Callable[[int, float], None]]) -> str:
+    backend = get_backend()
+    if backend:
+        return backend.chat(model, messages, metrics, timeout, extra, prefer, kind, on_wait)
+    endpoints = parse_endpoints(ollama_url)
+    mode = summary_format(endpoints) if kind == "summary" else None
+    queued = time.perf_counter()
     try:
-        r = requests.post(url, json=payload, timeout=timeout)
-        r.raise_for_status()
-        data = r.json()
+        with get_admission_controller(endpoints).slot(kind, on_wait=on_wait):
+            queue_s = time.perf_counter() - queued
+            while True:
+                try:
+                    with get_ollama_router(endpoints).chat(model, messages, read_timeout=timeout, prefer=prefer,
+                                                           **(extra or {}), **format_field(mode)) as r:
+                        data = r.json()
+                    break
+                except requests.exceptions.HTTPError as e:
+                    # Older server: retry once in the same slot with plain JSON mode.
+                    if mode != "schema" or not schema_rejected(e.response.status_code, e.response.text): raise
+                    mode = downgrade_summary_format(get_summary_formats(), get_telemetry(), endpoints,
+                                                    e.response.text)
+        metrics["backend"] = r.backend_url
+        if kind == "summary": metrics["format"] = mode or "prompt"
+        metrics["queue_s"] = queue_s
+        record_ollama_timings(data, metrics)
         return str(data.get("message", {}).get("content", "")).strip()
+    except Overloaded:
+        return BUSY_REPLY
     except requests.exceptions.ConnectionError:
         return "ERROR: Could not connect to Ollama. Is Ollama running? Try: ollama --version"
     except requests.exceptions.HTTPError as e:
@@ -393,26 +643,95 @@ def call_ollama(ollama_url: str, model: str, messages: List[Dict[str, str]], tim
     except Exception as e:
         return f"ERROR: {str(e)}"
 
+def stream_ollama(ollama_url: Union[str, Sequence[str]], model: str, messages: List[Dict[str, str]],
+                  metrics: Dict[str, Any], timeout: int = 120, extra: Optional[Dict[str, Any]] = None,
+                  prefer: Optional[str] = None, kind: str = "chat",
+                  on_wait: Optional[Callable[[int, float], None]] = None) -> Iterator[str]:
+    """Yield reply tokens from Ollama's NDJSON stream, filling `metrics` with per-turn timings.
+    The admission slot is held until the stream ends. A failure, even after some tokens, is
+    yielded as its message and left in metrics["failed"]: the joined text is then not a reply."""
+    with get_telemetry().span("ollama_call", kind=kind, model=model, stream=True) as span:
+        failure = ""
+        for token in _stream_ollama(ollama_url, model, messages, metrics, timeout, extra, prefer, kind, on_wait):
+            if token == BUSY_REPLY or token.startswith("ERROR"):
+                failure = metrics["failed"] = token
+            yield token
+        finish_ollama_span(span, kind, failure, metrics)
+
+def _stream_ollama(ollama_url: Union[str, Sequence[str]], model: str, messages: List[Dict[str, str]],
+                   metrics: Dict[str, Any], timeout: int, extra: Optional[Dict[str, Any]], prefer: Optional[str],
+                   kind: str, on_wait: Optional[Callable[[int, float], None]]) -> Iterator[str]:
+    backend = get_backend()
+    if backend:
+        yield from backend.stream_chat(model, messages, metrics, timeout, extra, prefer, kind, on_wait)
+        return
+    started = time.perf_counter()
+    chunks = 0
+    endpoints = parse_endpoints(ollama_url)
+    try:
+        with get_admission_controller(endpoints).slot(kind, on_wait=on_wait):
+            metrics["queue_s"] = time.perf_counter() - started
+            with get_ollama_router(endpoints).chat(model, messages, stream=True, read_timeout=timeout,
+                                                   prefer=prefer, **(extra or {})) as r:
+                metrics["backend"] = r.backend_url
+                for line in r.iter_lines():
+                    if not line: continue
+                    data = json.loads(line)
+                    if data.get("error"):
+                        yield f"ERROR calling Ollama: {data['error']}"
+                        break
+                    token = data.get("message", {}).get("content", "")
+                    if token:
+                        if chunks == 0:
+                            metrics["ttft_s"] = time.perf_counter() - started
+                        chunks += 1
+                        yield token
+                    if data.get("done"):
+                        record_ollama_timings(data, metrics)
+                        break
+    except Overloaded:
+        yield BUSY_REPLY
+    except requests.exceptions.ConnectionError:
+        yield "ERROR: Could not connect to Ollama. Is Ollama running? Try: ollama --version"
+    except requests.exceptions.HTTPError as e:
+        yield f"ERROR calling Ollama: {e.response.status_code} {e.response.text[:100]}"
+    except Exception as e:
+        yield f"ERROR: {str(e)}"
+    finally:
+        metrics["total_s"] = time.perf_counter() - started
+        tokens = metrics.get("eval_count") or chunks
+        gen_s = metrics.get("eval_duration_s") or (metrics["total_s"] - metrics.get("ttft_s", 0.0))
+        metrics["tokens"] = tokens
+        metrics["tokens_per_s"] = tokens / gen_s if tokens and gen_s > 0 else 0.0
+
+def format_turn_metrics(metrics: Dict[str, Any]) -> str:
+    ttft = metrics.get("ttft_s")
+    ttft_text = f"{ttft:.2f}s" if ttft is not None else "n/a"
+    text = (f"⏱️ first token {ttft_text} · {metrics.get('tokens_per_s', 0.0):.1f} tok/s · "
+            f"{metrics.get('total_s', 0.0):.2f}s total")
+    if "prompt_tokens_est" in metrics:
+        text += f" · ~{metrics['prompt_tokens_est']} prompt tokens"
+    if metrics.get("queue_s", 0.0) >= 0.5:
+        text += f" · queued {metrics['queue_s']:.1f}s"
+    if metrics.get("prompt_eval_count"):
+        text += f" · prompt eval {metrics['prompt_eval_count']} tok in {metrics['prompt_eval_duration_s']:.2f}s"
+    return text
+
 # ---------- Helpers: JSON extraction ----------
 def extract_json_from_text(text: str) -> Optional[str]:
-    if not text: return None
-    fence_match = re.search(r"```(?:json)?\s*(\{.*\})\s*```", text, flags=re.DOTALL|re.IGNORECASE)
-    if fence_match:
-        candidate = fence_match.group(1).strip()
-        try: json.loads(candidate); return candidate
-        except: text = candidate
-    try: json.loads(text); return text
-    except: pass
-    first = text.find("{"); last = text.rfind("}")
-    if first != -1 and last != -1 and last > first:
-        candidate = text[first:last+1]
-        try: json.loads(candidate); return candidate
-        except: pass
-    return None
+    # Single pass over the reply: repairs near-JSON, picks the order-shaped object
+    # when there are several, and returns it normalized to the summary schema.
+    # None for a summary cut off mid-object: it is never priced, cached or saved.
+    return order_json(text)
 
 # ---------- Chat system message ----------
 def system_message(menu_text: str) -> Dict[str, str]:
-    return {"role": "system", "content": (
+    return {"role": "system", "content": system_prompt(menu_text)}
+
+@functools.lru_cache(maxsize=8)
+def system_prompt(menu_text: str) -> str:
+    # Built once per menu text so every turn and session sends a byte-identical prefix.
+    return (
         "You are OrderBot, a friendly AI assistant for Sajid's Pizzeria! 🍕\n"
         "- Greet customers warmly and help them place orders\n"
         "- Be enthusiastic about the food and make recommendations\n"
@@ -423,7 +742,7 @@ def system_message(menu_text: str) -> Dict[str, str]:
         "- Be helpful, friendly, and make the ordering experience enjoyable!\n\n"
         f"🍽️ SAJID'S PIZZERIA MENU:\n{menu_text}\n\n"
         "Remember: Great customer service makes great pizza even better! 😊"
-    )}
+    )
 
 JSON_ORDER_SCHEMA_INSTRUCTION = (
     "Please create a JSON summary of the customer's complete order using this exact format:\n"
@@ -439,6 +758,113 @@ JSON_ORDER_SCHEMA_INSTRUCTION = (
     "Return ONLY the JSON - no other text or commentary."
 )
 
+# ---------- Order finalization ----------
+def finalize_order(order_summary: Dict[str, Any], menu_index: MenuIndex, problems: Sequence[str] = ()):
+    with get_telemetry().span("pricing") as span:
+        total, lines = calculate_total_from_summary(order_summary, menu_index)
+        span.set(lines=len(lines), unresolved=len(unresolved_lines(lines)), dropped=len(problems))
+    
+    render_order_summary_card(total, lines)
+    
+    unclear = [f"❓ {p}" for p in problems] + [l["match"] for l in unresolved_lines(lines)]
+    if unclear:
+        # Includes summary lines the schema had to drop (e.g. a bad qty): never save a silently shortened order.
+        st.warning("⚠️ Please clarify before we save the order:\n\n" +
+                   "\n".join(f"- {u}" for u in unclear))
+    # Save order
+    elif lines:
+        save_order(order_summary, lines)
+        st.success("✅ Order saved successfully!")
+
+def cart_update_instruction(cart: Cart) -> str:
+    return (
+        f"Here is the customer's order so far as JSON:\n{cart.to_json()}\n"
+        "Update it with any changes from the conversation above (additions, removals, sizes, "
+        "quantities, pickup/delivery, address).\n" + JSON_ORDER_SCHEMA_INSTRUCTION
+    )
+
+def summary_prompt(cart: Cart, messages: List[Dict[str, str]], menu_text: str) -> List[Dict[str, str]]:
+    # Ask the model to correct the cart from the turns since its last correction only.
+    prompt = [system_message(menu_text)] + cart.pending_messages(messages, SUMMARY_CONTEXT_TURNS)
+    prompt.append({"role": "user", "content": cart_update_instruction(cart)})
+    return prompt
+
+# ---------- Summary prefetch (background event loop) ----------
+@st.cache_resource
+def get_background_loop() -> BackgroundLoop:
+    return BackgroundLoop()
+
+@st.cache_resource
+def get_async_client(ollama_url: str) -> AsyncOllamaClient:
+    return AsyncOllamaClient(
+        ollama_url,
+        pool_size=int(setting("OLLAMA_POOL_SIZE", DEFAULT_POOL_SIZE)),
+        connect_timeout=float(setting("OLLAMA_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT)),
+    )
+
+async def prefetch_summary(router: OllamaRouter, admission: AdmissionController,
+                           clients: Dict[str, AsyncOllamaClient], cache: ResponseCache, key: str, model: str,
+                           messages: List[Dict[str, str]], extra: Dict[str, Any], prefer: Optional[str] = None,
+                           timeout: int = 120, mode: Optional[str] = None,
+                           on_rejected: Optional[Callable[[str], Any]] = None,
+                           on_parsed: Optional[Callable[[bool], None]] = None) -> Optional[str]:
+    """Generate the order summary ahead of the click and leave it in the response cache.
+    Speculative: only runs on a free admission slot and gives up quietly on any failure."""
+    try:
+        with admission.slot("summary", block=False):
+            backend = router.acquire(prefer=prefer)
+            if backend is None: return None
+            started = time.perf_counter()
+            ok = False
+            try:
+                # Streamed so generation can stop at the summary's closing brace instead of
+                # running on into commentary the model was told not to write.
+                scanner, parts = JsonObjectScanner(), []
+                async for chunk in clients[backend.url].stream_chat(model, messages, read_timeout=timeout,
+                                                                    **extra, **format_field(mode)):
+                    if chunk.get("error"): raise ValueError(chunk["error"])
+                    piece = chunk.get("message", {}).get("content", "")
+                    parts.append(piece)
+                    if any(order_json(c) for c in scanner.feed(piece)): break
+                ok = True
+            finally:
+                router.release(backend, ok=ok, elapsed=time.perf_counter() - started if ok else None)
+    except httpx.HTTPStatusError as e:
+        # Leave the retry to Calculate, but stop sending the schema to a server that rejects it.
+        if mode == "schema" and on_rejected and schema_rejected(e.response.status_code, e.response.text):
+            on_rejected(e.response.text)
+        return None
+    except (Overloaded, httpx.HTTPError, ValueError):
+        return None
+    raw = "".join(parts).strip()
+    ok = extract_json_from_text(raw) is not None
+    if on_parsed: on_parsed(ok)
+    if not ok: return None
+    cache.put(key, raw)
+    return raw
+
+def start_summary_prefetch(endpoints: Tuple[str, ...], model: str, messages: List[Dict[str, str]],
+                           extra: Dict[str, Any], key: str, prefer: Optional[str]) -> Future:
+    backend = get_backend()
+    if backend:
+        # The backend runs the prefetch (and owns the slot); wait for it off the script thread.
+        return get_background_loop().submit(asyncio.to_thread(backend.prefetch_summary, model, messages, extra,
+                                                              key, prefer))
+    # Resolve the shared resources here, in the script thread, and hand them to the loop.
+    formats, telemetry, mode = get_summary_formats(), get_telemetry(), summary_format(endpoints)
+    coro = prefetch_summary(get_ollama_router(endpoints), get_admission_controller(endpoints),
+                            {url: get_async_client(url) for url in endpoints}, get_response_cache(),
+                            key, model, messages, extra, prefer=prefer, mode=mode,
+                            on_rejected=lambda error: downgrade_summary_format(formats, telemetry, endpoints, error),
+                            on_parsed=lambda ok: record_summary_parse(telemetry, mode, ok))
+    return get_background_loop().submit(coro)
+
+def render_cart_panel(cart: Cart, menu_index: MenuIndex):
+    if cart.is_empty(): return
+    total, lines = calculate_total_from_summary(cart.order, menu_index)
+    st.markdown(f"### 🛒 Current Order - ${total:.2f}")
+    st.dataframe(pd.DataFrame(lines), use_container_width=True, hide_index=True)
+
 # ---------- Main Streamlit App ----------
 def main():
     st.set_page_config(
@@ -454,30 +880,65 @@ def main():
     # Custom header
     render_custom_header()
     
-    # Load menu
-    menu = load_menu()
-    menu_text = menu_to_text(menu)
+    # Load menu: the current version from the menu service, precomputed (no file I/O per rerun)
+    menu_service = get_menu_service()
+    menu = menu_service.current
+    menu_index, menu_text = menu.index, menu.text
+    session_store, sid = get_session_store(), session_id()
 
-    # Get Ollama URL from Streamlit Secrets
-    ollama_url = st.secrets.get("OLLAMA_URL", "http://localhost:11434")
+    # Get Ollama URL(s) from Streamlit Secrets
+    ollama_urls = OLLAMA_URLS
+    fast_path_confidence = float(setting("FAST_PATH_CONFIDENCE", FAST_PATH_CONFIDENCE))
+    context_keep_recent = int(setting("CONTEXT_KEEP_RECENT", DEFAULT_KEEP_RECENT))
+    summary_prefetch = bool(setting("SUMMARY_PREFETCH", True))
     
     # Sidebar configuration
     st.sidebar.title("⚙️ Restaurant Settings")
-    render_connection_status(ollama_url)
+    status = ollama_status(ollama_urls)
+    render_connection_status(status["health"])
     
     st.sidebar.markdown("---")
+    model_options = model_choices(status["models"])
     model_choice = st.sidebar.selectbox(
         "🤖 AI Model", 
-        [DEFAULT_MODEL, "llama3", "mistral", "phi3"], 
-        index=0,
+        model_options, 
+        index=model_options.index(DEFAULT_MODEL) if DEFAULT_MODEL in model_options else 0,
         help="Choose the AI model for order processing"
     )
     
-    st.sidebar.info(f"📡 Ollama URL: {ollama_url}")
+    stream_replies = st.sidebar.toggle("⚡ Stream replies", value=True,
+                                       help="Show the reply token by token as the model generates it")
+    prompt_cache = st.sidebar.toggle("🧠 Prompt cache mode", value=bool(setting("PROMPT_CACHE_MODE", True)),
+                                     help="Pin the model in memory (keep_alive) and reuse the evaluated system prompt")
+    # The chat prompt budget is the context actually requested, less the reply it may generate.
+    chat_options = call_options("chat", prompt_cache).get("options", {})
+    context_num_ctx = int(chat_options.get("num_ctx", DEFAULT_NUM_CTX))
+    context_reply_tokens = int(chat_options.get("num_predict", RESERVED_REPLY_TOKENS))
+    cache_stats = get_response_cache().stats()
+    if cache_stats["hits"] + cache_stats["misses"]:
+        st.sidebar.caption(f"Response cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                           f"({cache_stats['hit_rate']:.0%}), {cache_stats['entries']} entries")
+    queue_stats = status["queue"]
+    if queue_stats["waiting"] or queue_stats["shed"]:
+        st.sidebar.caption(f"Ollama queue: {queue_stats['active']} running, {queue_stats['waiting']} waiting, "
+                           f"{queue_stats['shed']} turned away")
+    if st.session_state.get("turn_metrics"):
+        st.sidebar.caption(f"Last reply: {format_turn_metrics(st.session_state.turn_metrics[-1])}")
+
+    render_debug_panel()
+    st.sidebar.info(f"📡 Ollama URL: {', '.join(status['endpoints'] or ollama_urls)}" +
+                    (f" via {BACKEND_URL}" if BACKEND_URL else ""))
+    if len(status["backends"]) > 1:
+        with st.sidebar.expander("🔀 Backends"):
+            st.dataframe(pd.DataFrame(status["backends"]), use_container_width=True)
     st.sidebar.markdown("Make sure Ollama is running before taking orders!")
+    if menu_service.last_error:
+        st.sidebar.warning(f"⚠️ Menu not reloaded, still serving version {menu.version}: {menu_service.last_error}")
     
     if st.sidebar.button("🔄 Reset Chat", use_container_width=True):
+        if session_store: session_store.delete(sid)
         st.session_state.pop("messages", None)
+        st.session_state.pop("cart", None)
         st.rerun()
 
     # Main layout with columns
@@ -487,31 +948,42 @@ def main():
         render_menu_card(menu_text)
     
     with col2:
-        # Order statistics
-        if os.path.exists(ORDERS_FILE):
-            try:
-                orders_df = pd.read_csv(ORDERS_FILE)
-                total_orders = len(orders_df['timestamp'].unique())
-                total_revenue = orders_df['total'].str.replace('$', '').astype(float).sum() if 'total' in orders_df.columns else 0
-                
-                st.markdown("### 📊 Today's Stats")
-                metric_col1, metric_col2 = st.columns(2)
-                with metric_col1:
-                    st.metric("Total Orders", total_orders)
-                with metric_col2:
-                    st.metric("Revenue", f"${total_revenue:.2f}")
-            except:
-                pass
+        # Order statistics (incremental, shared across reruns and sessions)
+        stats = sales_stats()
+        if stats.order_count:
+            st.markdown("### 📊 Today's Stats")
+            metric_col1, metric_col2 = st.columns(2)
+            with metric_col1:
+                st.metric("Total Orders", stats.order_count)
+            with metric_col2:
+                st.metric("Revenue", f"${stats.revenue:.2f}")
+            with st.expander("Breakdown"):
+                st.bar_chart(pd.DataFrame({"orders": stats.orders_by_hour}))
+                st.dataframe(pd.DataFrame(stats.top_items()), use_container_width=True)
+        # Filled at the end of the run, after this turn's message has updated the cart.
+        cart_panel = st.empty()
 
     # Chat interface
     st.markdown('<div class="chat-container"><h3>💬 Order Assistant</h3></div>', unsafe_allow_html=True)
 
-    # Initialize session
+    # Initialize session: a saved conversation (reconnect or restart) resumes as it was, without the model
+    if "messages" not in st.session_state and session_store:
+        restored = session_store.load(sid)
+        if restored is not None and restored.messages:
+            st.session_state.messages = [menu.system_message] + restored.messages
+            st.session_state.cart = Cart.from_state(restored.cart)
+            st.toast("👋 Welcome back! We kept your order where you left it.")
+    if "cart" not in st.session_state:
+        st.session_state.cart = Cart()
     if "messages" not in st.session_state:
         st.session_state.messages = [
-            system_message(menu_text),
+            menu.system_message,
             {"role": "assistant", "content": "🍕 Welcome to Sajid's Pizzeria! I'm your AI ordering assistant. What delicious pizza can I help you with today? Our most popular items are the Supreme Pizza and our famous garlic bread! 😊"}
         ]
+    elif st.session_state.messages[0].get("role") == "system" and \
+            st.session_state.messages[0].get("content") != menu.prompt:
+        # menu.json changed mid-conversation: later turns see the new menu.
+        st.session_state.messages[0] = menu.system_message
 
     # Display chat messages
     for m in st.session_state.messages:
@@ -522,20 +994,74 @@ def main():
     # User input
     user_input = st.chat_input("Tell me what you'd like to order... 🍕")
     if user_input:
-        st.session_state.messages.append({"role": "user", "content": user_input})
-        with st.chat_message("user"):
-            st.markdown(user_input)
+        with get_telemetry().trace("chat_turn", model=model_choice, stream=stream_replies):
+            st.session_state.messages.append({"role": "user", "content": user_input})
+            persist_session(session_store, sid, with_cart=False)  # kept even if the reply never arrives
+            with st.chat_message("user"):
+                st.markdown(user_input)
         
-        with st.chat_message("assistant"):
-            with st.spinner("🤔 Processing your order..."):
-                messages_for_model = st.session_state.messages.copy()
-                if messages_for_model and messages_for_model[0].get("role") != "system":
-                    messages_for_model.insert(0, system_message(menu_text))
-                reply_text = call_ollama(ollama_url, model_choice, messages_for_model)
+            with st.chat_message("assistant"):
+                with get_telemetry().span("prompt_build") as span:
+                    cart = st.session_state.cart.sync(st.session_state.messages, menu_index)
+                    messages_for_model, context_stats = fit_context(
+                        st.session_state.messages, menu.system_message,
+                        summary=cart_summary(cart.to_json()) if not cart.is_empty() else None,
+                        num_ctx=context_num_ctx, reply_tokens=context_reply_tokens, keep_recent=context_keep_recent,
+                    )
+                    span.set(**context_stats)
+                with get_telemetry().span("cache_lookup") as span:
+                    cache_key = response_cache_key("chat", model_choice, messages_for_model, menu.version)
+                    cached_reply = get_response_cache().get(cache_key)
+                    span.set(hit=cached_reply is not None)
+                if cached_reply is not None:
+                    reply_text = cached_reply
+                    st.markdown(reply_text)
+                    st.caption("⚡ Answered from the response cache")
+                elif stream_replies:
+                    metrics: Dict[str, Any] = dict(context_stats)
+                    queue_notice = st.empty()
+                    reply_text = st.write_stream(stream_ollama(ollama_urls, model_choice, messages_for_model, metrics,
+                                                               extra=call_options("chat", prompt_cache),
+                                                               prefer=st.session_state.get("ollama_backend"),
+                                                               on_wait=queue_notifier(queue_notice)))
+                    queue_notice.empty()
+                    reply_text = reply_text if isinstance(reply_text, str) else "".join(map(str, reply_text or []))
+                    st.session_state.setdefault("turn_metrics", []).append(metrics)
+                    st.session_state.ollama_backend = metrics.get("backend")
+                    st.caption(format_turn_metrics(metrics))
+                else:
+                    metrics = {}
+                    queue_notice = st.empty()
+                    with st.spinner("🤔 Processing your order..."):
+                        reply_text = call_ollama(ollama_urls, model_choice, messages_for_model,
+                                                 extra=call_options("chat", prompt_cache), metrics=metrics,
+                                                 prefer=st.session_state.get("ollama_backend"),
+                                                 on_wait=queue_notifier(queue_notice))
+                    queue_notice.empty()
+                    st.session_state.ollama_backend = metrics.get("backend")
+                    st.markdown(reply_text)
+                # A stream can fail after some tokens: the text is then "partial reply + ERROR ...".
+                failed = cached_reply is None and (bool(metrics.get("failed")) or not reply_text)
+                if not failed and cached_reply is None:
+                    get_response_cache().put(cache_key, reply_text)
                 if not reply_text:
                     reply_text = "⚠️ Sorry, I'm having trouble connecting to our ordering system. Please try again!"
-                st.markdown(reply_text)
-                st.session_state.messages.append({"role": "assistant", "content": reply_text})
+                    st.markdown(reply_text)
+                # A failed or shed call is shown once but kept out of the cache and the transcript the model sees.
+                if not failed:
+                    st.session_state.messages.append({"role": "assistant", "content": reply_text})
+            cart = st.session_state.cart.sync(st.session_state.messages, menu_index)
+            persist_session(session_store, sid)
+            # If Calculate would need the model, start on the summary now, while the customer reads the reply.
+            pending = st.session_state.pop("summary_prefetch", None)
+            if pending is not None:
+                pending[1].cancel()  # superseded by this turn
+            if summary_prefetch and not cart.is_empty() and cart.confidence(menu_index) < fast_path_confidence:
+                prompt = summary_prompt(cart, st.session_state.messages, menu_text)
+                key = response_cache_key("summary", model_choice, prompt, menu.version)
+                st.session_state.summary_prefetch = (key, start_summary_prefetch(
+                    ollama_urls, model_choice, prompt, call_options("summary", prompt_cache), key,
+                    prefer=st.session_state.get("ollama_backend")))
 
     st.markdown("---")
 
@@ -544,75 +1070,129 @@ def main():
     
     with button_col1:
         if st.button("🧾 Calculate Order Total", use_container_width=True):
-            messages_for_model = st.session_state.messages.copy()
-            if messages_for_model and messages_for_model[0].get("role") != "system":
-                messages_for_model.insert(0, system_message(menu_text))
-            messages_for_model.append({"role": "user", "content": JSON_ORDER_SCHEMA_INSTRUCTION})
-            
-            with st.spinner("📋 Preparing your order summary..."):
-                raw = call_ollama(ollama_url, model_choice, messages_for_model)
-                if not raw or "ERROR" in raw:
-                    st.error(f"❌ Could not process order: {raw}")
-                else:
-                    extracted = extract_json_from_text(raw)
-                    if not extracted:
-                        st.error("❌ Could not generate order summary. Please try again.")
-                        with st.expander("Debug Info"):
-                            st.code(raw)
+            with get_telemetry().trace("calculate", model=model_choice):
+                # Fast path: the cart is already up to date from the rule-based extractor.
+                with get_telemetry().span("cart_sync") as span:
+                    cart = st.session_state.cart.sync(st.session_state.messages, menu_index)
+                    confidence = cart.confidence(menu_index)
+                    # Nothing said since the model last corrected the cart: asking again can only repeat it.
+                    corrected = not cart.pending_messages(st.session_state.messages, SUMMARY_CONTEXT_TURNS)
+                    span.set(confidence=round(confidence, 3), fast_path=confidence >= fast_path_confidence or corrected)
+                if confidence >= fast_path_confidence or corrected:
+                    if corrected:
+                        st.caption("⚡ Order already summarized; nothing new in the conversation since")
                     else:
-                        try:
-                            order_summary = json.loads(extracted)
-                            total, lines = calculate_total_from_summary(order_summary, menu)
-                            
-                            render_order_summary_card(total, lines)
-                            
-                            # Save order
-                            if lines:
-                                rows = []
-                                ts = int(time.time())
-                                for l in lines:
-                                    row = {
-                                        "timestamp": ts,
-                                        "delivery_method": order_summary.get("delivery_method"),
-                                        "address": order_summary.get("address")
-                                    }
-                                    # Clean the line item data
-                                    clean_line = {k: str(v).replace('$', '') if k in ['unit_price', 'total'] else v 
-                                                for k, v in l.items()}
-                                    row.update(clean_line)
-                                    rows.append(row)
-                                
-                                df_rows = pd.DataFrame(rows)
-                                if os.path.exists(ORDERS_FILE):
-                                    df_prev = pd.read_csv(ORDERS_FILE)
-                                    df_out = pd.concat([df_prev, df_rows], ignore_index=True)
+                        st.caption(f"⚡ Summarized instantly from the conversation (confidence {confidence:.0%})")
+                    try:
+                        finalize_order(cart.order, menu_index)
+                    except Exception as e:
+                        st.error(f"❌ Error processing order summary: {str(e)}")
+                else:
+                    with get_telemetry().span("prompt_build"):
+                        messages_for_model = summary_prompt(cart, st.session_state.messages, menu_text)
+                
+                    queue_notice = st.empty()
+                    with st.spinner("📋 Preparing your order summary..."):
+                        # Same transcript and cart -> same prompt -> never generate the summary twice.
+                        with get_telemetry().span("cache_lookup") as span:
+                            cache_key = response_cache_key("summary", model_choice, messages_for_model, menu.version)
+                            raw = get_response_cache().get(cache_key)
+                            span.set(hit=raw is not None)
+                        prefetch = st.session_state.get("summary_prefetch")
+                        if raw is None and prefetch is not None and prefetch[0] == cache_key:
+                            # Still generating in the background: wait for it rather than asking twice.
+                            with get_telemetry().span("prefetch_wait") as span:
+                                try:
+                                    raw = prefetch[1].result(timeout=SUMMARY_PREFETCH_WAIT)
+                                except Exception:
+                                    raw = None
+                                span.set(hit=raw is not None)
+                        if raw is None:
+                            summary_timings: Dict[str, Any] = {}
+                            raw = call_ollama(ollama_urls, model_choice, messages_for_model,
+                                              extra=call_options("summary", prompt_cache), metrics=summary_timings,
+                                              prefer=st.session_state.get("ollama_backend"),
+                                              kind="summary", on_wait=queue_notifier(queue_notice))
+                            if raw and raw != BUSY_REPLY and "ERROR" not in raw:
+                                parsed = extract_json_from_text(raw) is not None
+                                record_summary_parse(get_telemetry(), summary_timings.get("format"), parsed)
+                                if parsed:
+                                    get_response_cache().put(cache_key, raw)
+                        queue_notice.empty()
+                        if raw == BUSY_REPLY:
+                            st.warning(raw)
+                        elif not raw or "ERROR" in raw:
+                            st.error(f"❌ Could not process order: {raw}")
+                        else:
+                            with get_telemetry().span("json_extract") as span:
+                                parsed = parse_order(raw)
+                                if parsed is None:
+                                    span.fail("no JSON object in the model reply")
+                                elif not parsed.complete:
+                                    span.fail("order summary cut off")
+                            if parsed is None or not parsed.complete:
+                                if parsed is None:
+                                    st.error("❌ Could not generate order summary. Please try again.")
                                 else:
-                                    df_out = df_rows
-                                df_out.to_csv(ORDERS_FILE, index=False)
-                                st.success("✅ Order saved successfully!")
-                        except Exception as e:
-                            st.error(f"❌ Error processing order summary: {str(e)}")
+                                    # Closing it up would price whatever came before the cut: ask again instead.
+                                    st.warning("⚠️ The order summary was cut off before it finished, so nothing "
+                                               "was saved. Please click Calculate again.")
+                                with st.expander("Debug Info"):
+                                    st.code(raw)
+                            else:
+                                try:
+                                    order = parsed.summary.to_dict()
+                                    if not parsed.problems:
+                                        # A summary with dropped lines is not adopted: the next click asks again
+                                        # (answered from the response cache) until the customer clarifies.
+                                        cart.replace(order, len(st.session_state.messages))
+                                        order = cart.order
+                                    finalize_order(order, menu_index, parsed.problems)
+                                except Exception as e:
+                                    st.error(f"❌ Error processing order summary: {str(e)}")
 
     with button_col2:
         if st.button("🧹 New Order", use_container_width=True):
-            sys_msg = system_message(menu_text)
+            sys_msg = menu.system_message
             st.session_state.messages = [
                 sys_msg,
                 {"role": "assistant", "content": "🍕 Welcome to Sajid's Pizzeria! I'm ready to take your next order. What can I get started for you today? 😊"}
             ]
+            st.session_state.cart = Cart()
+            if session_store: session_store.delete(sid)
             st.rerun()
     
     with button_col3:
         if st.button("📊 View Orders", use_container_width=True):
-            if os.path.exists(ORDERS_FILE):
-                try:
-                    df = pd.read_csv(ORDERS_FILE)
-                    st.markdown("### 📋 Recent Orders")
-                    st.dataframe(df.tail(10), use_container_width=True)
-                except Exception as e:
-                    st.error(f"Error loading orders: {e}")
+            try:
+                analytics = order_analytics()
+                analytics.sync()
+                recent = analytics.recent_orders(10)
+                if recent:
+                    revenue, top, split = (analytics.revenue_by_day(30), analytics.top_items(10),
+                                           analytics.delivery_split())
+            except Exception as e:
+                st.error(f"Error loading orders: {e}")
             else:
-                st.info("No orders found yet.")
+                if not recent:
+                    st.info("No orders found yet.")
+                else:
+                    st.markdown("### 📋 Recent Orders")
+                    st.dataframe(pd.DataFrame(recent), use_container_width=True, hide_index=True)
+                    with st.expander("📈 Reports"):
+                        st.markdown("**Revenue by day (30 days)**")
+                        if revenue:
+                            st.bar_chart(pd.DataFrame(revenue).set_index("day")["revenue"])
+                        else:
+                            st.caption("No revenue in the last 30 days.")
+                        st.markdown("**Top items**")
+                        st.dataframe(pd.DataFrame(top), use_container_width=True, hide_index=True)
+                        st.markdown("**Delivery vs pickup**")
+                        st.dataframe(pd.DataFrame(split), use_container_width=True, hide_index=True)
+
+    with cart_panel.container():
+        render_cart_panel(st.session_state.cart, menu_index)
+    persist_session(session_store, sid)  # e.g. a model-corrected cart from Calculate
 
     # Footer
     st.markdown("---")
@@ -0,0 +1,202 @@
+# Backend service: one process that owns Ollama access, order persistence and stats.
+#
+# Run it once and point any number of Streamlit replicas at it with BACKEND_URL;
+# the UIs then keep only rendering and session state. Everything shared lives
+# here, once: the router with its connection pools and circuit breakers, the
+# admission queue (so the slot limit holds across all replicas), the summary
+# format fallback, the order journal writer, the sales stats and the analytics
+# store. Requests are served on threads; model calls block on Ollama, not on CPU.
+#
+# It runs the app's own non-UI core (call_ollama, stream_ollama, the summary
+# prefetch, finalize's journal append) outside any Streamlit session, the same
+# way benchmarks/bench_load.py does, so both modes behave identically.
+#
+# API (JSON; /chat answers with NDJSON events):
+#   GET  /health                 liveness
+#   GET  /status                 Ollama health, models, routing snapshot, queue stats
+#   POST /chat                   {model, messages, kind, stream, extra, prefer, timeout}
+#                                -> {"queued", "wait_s"}* then {"token"}* (stream) or {"reply"}, then {"done", "metrics"}
+#   POST /prefetch               {model, messages, extra, key, prefer} -> {"reply": str | null}
+#   POST /orders                 {order, lines} -> {"order_id"}
+#   GET  /stats                  running sales aggregates
+#   POST /analytics/sync         ingest new journal rows -> {"rows"}
+#   GET  /analytics/<report>     recent_orders?n= | revenue_by_day?days= | top_items?n=&days= | delivery_split?days=
+#   GET  /metrics                Prometheus text
+#
+#   python backend.py [--host 127.0.0.1] [--port 8600] [--ollama-urls http://localhost:11434,...]
+#                     [--orders orders_journal.csv]
+import argparse
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import app
+import order_store
+from ollama_router import parse_endpoints
+
+DEFAULT_PORT = 8600
+PREFETCH_TIMEOUT_S = 120
+
+for _name in list(logging.root.manager.loggerDict):
+    if _name.startswith("streamlit"):
+        logging.getLogger(_name).setLevel(logging.ERROR)  # bare-mode "missing ScriptRunContext" noise
+
+# This process is the backend: never forward to another one.
+app.BACKEND_URL = None
+
+ANALYTICS_REPORTS = {"recent_orders": ("n",), "revenue_by_day": ("days",), "top_items": ("n", "days"),
+                     "delivery_split": ("days",)}
+
+class Backend:
+    def __init__(self, endpoints: Tuple[str, ...], orders_file: str = app.ORDERS_FILE):
+        self.endpoints = endpoints
+        self.orders_file = orders_file
+        self._write_lock = threading.Lock()
+
+    # ---------- Ollama ----------
+    def status(self) -> Dict[str, Any]:
+        return app.ollama_status(self.endpoints)
+
+    def prefetch(self, req: Dict[str, Any]) -> Optional[str]:
+        future = app.start_summary_prefetch(self.endpoints, req["model"], req["messages"], req.get("extra") or {},
+                                            req["key"], prefer=req.get("prefer"))
+        try:
+            return future.result(timeout=PREFETCH_TIMEOUT_S)
+        except Exception:
+            return None
+
+    # ---------- Orders ----------
+    def append_order(self, order: Dict[str, Any], lines: List[Dict[str, Any]]) -> str:
+        # The journal's file lock already makes appends safe; this keeps one writer per process.
+        with self._write_lock, app.get_telemetry().span("order_write"):
+            order_id = order_store.append_order(order, lines, path=self.orders_file)
+        app.get_telemetry().metrics.inc("orders_saved_total", help="Orders appended to the journal")
+        return order_id
+
+    def stats(self) -> Dict[str, Any]:
+        stats = app.get_sales_stats(self.orders_file).refresh()
+        return {"order_count": stats.order_count, "revenue": float(stats.revenue),
+                "orders_by_hour": stats.orders_by_hour, "top_items": stats.top_items(10)}
+
+    def analytics(self, report: str, query: Dict[str, List[str]]) -> List[Dict[str, Any]]:
+        args = {name: int(query[name][0]) for name in ANALYTICS_REPORTS[report] if query.get(name)}
+        return getattr(app.get_order_analytics(self.orders_file), report)(**args)
+
+def make_handler(backend: Backend):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, obj: Any, code: int = 200):
+            body = json.dumps(obj).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _chunk(self, obj: Dict[str, Any]):
+            line = (json.dumps(obj) + "\n").encode("utf-8")
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+            self.wfile.flush()
+
+        def _read_json(self) -> Dict[str, Any]:
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            try:
+                if url.path == "/health":
+                    self._send_json({"ok": True})
+                elif url.path == "/status":
+                    self._send_json(backend.status())
+                elif url.path == "/stats":
+                    self._send_json(backend.stats())
+                elif url.path.startswith("/analytics/") and url.path[11:] in ANALYTICS_REPORTS:
+                    self._send_json(backend.analytics(url.path[11:], parse_qs(url.query)))
+                elif url.path == "/metrics":
+                    body = app.get_telemetry().metrics.render().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                else:
+                    self._send_json({"error": "not found"}, 404)
+            except Exception as e:
+                self._send_json({"error": str(e)}, 500)
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            try:
+                req = self._read_json()
+                if url.path == "/chat":
+                    self._chat(req)
+                elif url.path == "/prefetch":
+                    self._send_json({"reply": backend.prefetch(req)})
+                elif url.path == "/orders":
+                    self._send_json({"order_id": backend.append_order(req["order"], req["lines"])})
+                elif url.path == "/analytics/sync":
+                    self._send_json({"rows": app.get_order_analytics(backend.orders_file).sync()})
+                else:
+                    self._send_json({"error": "not found"}, 404)
+            except (KeyError, ValueError) as e:
+                self._send_json({"error": f"bad request: {e}"}, 400)
+            except Exception as e:
+                self._send_json({"error": str(e)}, 500)
+
+        def _chat(self, req: Dict[str, Any]):
+            model, messages = req["model"], req["messages"]
+            kind, timeout = req.get("kind", "chat"), int(req.get("timeout", 120))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            metrics: Dict[str, Any] = {}
+            # The admission queue reports its position on this thread, before the model call starts.
+            on_wait = lambda position, wait_s: self._chunk({"queued": position, "wait_s": wait_s})
+            if req.get("stream", True):
+                for token in app.stream_ollama(backend.endpoints, model, messages, metrics, timeout=timeout,
+                                               extra=req.get("extra"), prefer=req.get("prefer"), kind=kind,
+                                               on_wait=on_wait):
+                    self._chunk({"token": token})
+            else:
+                reply = app.call_ollama(backend.endpoints, model, messages, timeout=timeout, extra=req.get("extra"),
+                                        metrics=metrics, prefer=req.get("prefer"), kind=kind, on_wait=on_wait)
+                self._chunk({"reply": reply})
+            self._chunk({"done": True, "metrics": metrics})
+            self.wfile.write(b"0\r\n\r\n")
+    return Handler
+
+def serve(backend: Backend, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Start the backend on a daemon thread; port 0 picks a free port (see server.server_port)."""
+    server = ThreadingHTTPServer((host, port), make_handler(backend))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="backend", daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Restaurant bot backend service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--ollama-urls", default=None, help="comma-separated Ollama URLs (default: app settings)")
+    parser.add_argument("--orders", default=app.ORDERS_FILE, help="order journal to write and report on")
+    args = parser.parse_args()
+    endpoints = parse_endpoints(args.ollama_urls) if args.ollama_urls else app.OLLAMA_URLS
+    backend = Backend(endpoints, orders_file=args.orders)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(backend))
+    server.daemon_threads = True
+    print(f"Backend listening on http://{args.host}:{server.server_port} (Ollama: {', '.join(endpoints)})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
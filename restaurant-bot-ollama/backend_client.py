@@ -0,0 +1,159 @@
+# Client for the backend service (backend.py), used by the app when BACKEND_URL is set.
+#
+# Mirrors the in-process objects the app would otherwise use, so the UI code is
+# the same in both modes: chat()/stream_chat() behave like call_ollama and
+# stream_ollama (errors come back as "ERROR ..." replies, queue positions go to
+# on_wait), stats() looks like a refreshed SalesStats and .analytics like an
+# OrderAnalytics. Status is cached for a second so a rerun costs one round trip.
+import json
+import threading
+import time
+from typing import Callable, Dict, Any, Iterator, List, NamedTuple, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ollama_client import DEFAULT_CONNECT_TIMEOUT, DEFAULT_POOL_SIZE
+
+DEFAULT_STATUS_TTL_S = 1.0
+
+class BackendError(RuntimeError):
+    pass
+
+class RemoteStats(NamedTuple):
+    order_count: int
+    revenue: float
+    orders_by_hour: List[int]
+    items: List[Dict[str, Any]]
+
+    def top_items(self, n: int = 5) -> List[Dict[str, Any]]:
+        return self.items[:n]
+
+class RemoteAnalytics:
+    def __init__(self, client: "BackendClient"):
+        self.client = client
+
+    def sync(self) -> int:
+        return self.client.post("/analytics/sync", {})["rows"]
+
+    def recent_orders(self, n: int = 10) -> List[Dict[str, Any]]:
+        return self.client.get("/analytics/recent_orders", n=n)
+
+    def revenue_by_day(self, days: int = 30) -> List[Dict[str, Any]]:
+        return self.client.get("/analytics/revenue_by_day", days=days)
+
+    def top_items(self, n: int = 10, days: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self.client.get("/analytics/top_items", n=n, days=days)
+
+    def delivery_split(self, days: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self.client.get("/analytics/delivery_split", days=days)
+
+class BackendClient:
+    def __init__(self, base_url: str, pool_size: int = DEFAULT_POOL_SIZE,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT, status_ttl_s: float = DEFAULT_STATUS_TTL_S):
+        self.base_url = base_url.rstrip("/")
+        self.connect_timeout = connect_timeout
+        self.status_ttl_s = status_ttl_s
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=False)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.analytics = RemoteAnalytics(self)
+        self._status: Optional[Dict[str, Any]] = None
+        self._status_at = 0.0
+        self._lock = threading.Lock()
+
+    def _check(self, r: requests.Response) -> Any:
+        if r.status_code >= 400:
+            try:
+                error = r.json().get("error")
+            except ValueError:
+                error = r.text[:200]
+            raise BackendError(f"backend {r.status_code}: {error}")
+        return r.json()
+
+    def get(self, path: str, read_timeout: float = 30, **params) -> Any:
+        params = {k: v for k, v in params.items() if v is not None}
+        return self._check(self.session.get(f"{self.base_url}{path}", params=params,
+                                            timeout=(self.connect_timeout, read_timeout)))
+
+    def post(self, path: str, payload: Dict[str, Any], read_timeout: float = 30) -> Any:
+        return self._check(self.session.post(f"{self.base_url}{path}", json=payload,
+                                             timeout=(self.connect_timeout, read_timeout)))
+
+    # ---------- Ollama ----------
+    def status(self) -> Dict[str, Any]:
+        """Health, models, routing and queue state; an offline placeholder if the backend is unreachable."""
+        with self._lock:
+            if self._status is not None and time.monotonic() - self._status_at < self.status_ttl_s:
+                return self._status
+        try:
+            status = self.get("/status", read_timeout=5)
+        except (requests.RequestException, BackendError) as e:
+            status = {"endpoints": [], "models": [], "backends": [],
+                      "health": [{"url": self.base_url, "online": False, "error": f"backend: {e}"}],
+                      "queue": {"active": 0, "waiting": 0, "admitted": 0, "shed": 0, "service_s": 0.0}}
+        with self._lock:
+            self._status, self._status_at = status, time.monotonic()
+        return status
+
+    def _events(self, payload: Dict[str, Any], timeout: int) -> Iterator[Dict[str, Any]]:
+        # The read timeout covers the admission queue as well as generation.
+        with self.session.post(f"{self.base_url}/chat", json=payload, stream=True,
+                               timeout=(self.connect_timeout, timeout * 2)) as r:
+            if r.status_code >= 400:
+                self._check(r)
+            for line in r.iter_lines():
+                if line: yield json.loads(line)
+
+    def stream_chat(self, model: str, messages: List[Dict[str, str]], metrics: Dict[str, Any], timeout: int = 120,
+                    extra: Optional[Dict[str, Any]] = None, prefer: Optional[str] = None, kind: str = "chat",
+                    on_wait: Optional[Callable[[int, float], None]] = None) -> Iterator[str]:
+        payload = {"model": model, "messages": messages, "kind": kind, "stream": True, "extra": extra,
+                   "prefer": prefer, "timeout": timeout}
+        try:
+            for event in self._events(payload, timeout):
+                if "token" in event: yield event["token"]
+                elif "queued" in event and on_wait: on_wait(event["queued"], event["wait_s"])
+                elif event.get("done"): metrics.update(event.get("metrics") or {})
+        except requests.exceptions.ConnectionError:
+            yield f"ERROR: Could not connect to the backend at {self.base_url}. Is backend.py running?"
+        except (requests.RequestException, BackendError) as e:
+            yield f"ERROR: {e}"
+
+    def chat(self, model: str, messages: List[Dict[str, str]], metrics: Dict[str, Any], timeout: int = 120,
+             extra: Optional[Dict[str, Any]] = None, prefer: Optional[str] = None, kind: str = "chat",
+             on_wait: Optional[Callable[[int, float], None]] = None) -> str:
+        payload = {"model": model, "messages": messages, "kind": kind, "stream": False, "extra": extra,
+                   "prefer": prefer, "timeout": timeout}
+        reply = ""
+        try:
+            for event in self._events(payload, timeout):
+                if "reply" in event: reply = event["reply"]
+                elif "queued" in event and on_wait: on_wait(event["queued"], event["wait_s"])
+                elif event.get("done"): metrics.update(event.get("metrics") or {})
+        except requests.exceptions.ConnectionError:
+            return f"ERROR: Could not connect to the backend at {self.base_url}. Is backend.py running?"
+        except (requests.RequestException, BackendError) as e:
+            return f"ERROR: {e}"
+        return reply
+
+    def prefetch_summary(self, model: str, messages: List[Dict[str, str]], extra: Dict[str, Any], key: str,
+                         prefer: Optional[str] = None, timeout: int = 120) -> Optional[str]:
+        """Speculative summary generated by the backend; None if it was skipped or failed."""
+        try:
+            return self.post("/prefetch", {"model": model, "messages": messages, "extra": extra, "key": key,
+                                           "prefer": prefer}, read_timeout=timeout)["reply"]
+        except (requests.RequestException, BackendError):
+            return None
+
+    # ---------- Orders ----------
+    def append_order(self, order: Dict[str, Any], lines: List[Dict[str, Any]]) -> str:
+        return self.post("/orders", {"order": order, "lines": lines})["order_id"]
+
+    def stats(self) -> RemoteStats:
+        s = self.get("/stats")
+        return RemoteStats(s["order_count"], s["revenue"], s["orders_by_hour"], s["top_items"])
+
+    def close(self):
+        self.session.close()
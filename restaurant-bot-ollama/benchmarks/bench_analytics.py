@@ -0,0 +1,108 @@
+# Benchmark: order reports from the SQLite analytics store vs. pandas over the journal.
+#
+# Writes a synthetic order journal (random menu items, timestamps spread over
+# the last --days days), ingests it with OrderAnalytics.sync(), then times each
+# report against the equivalent pandas code reading the whole CSV, which is what
+# the "View Orders" button used to do. Checks that both agree on revenue.
+#
+#   python benchmarks/bench_analytics.py [--orders 300000] [--days 90] [--repeat 20] [--json]
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HERE)
+from order_analytics import OrderAnalytics  # noqa: E402
+from order_store import HEADER_LINE, encode_order  # noqa: E402
+
+ITEMS = [("pizza", "Pepperoni", "L", "12.95"), ("pizza", "Margherita", "M", "9.50"), ("pizza", "Supreme", "S", "8.00"),
+         ("drink", "Coke", "M", "2.00"), ("drink", "Bottled Water", "", "1.50"), ("side", "Fries", "", "3.50"),
+         ("side", "Garlic Bread", "", "4.00"), ("topping", "Extra Cheese", "", "1.00")]
+
+def write_journal(path: str, orders: int, days: int, rng: random.Random) -> int:
+    now = int(time.time())
+    lines = 0
+    with open(path, "wb") as f:
+        f.write(HEADER_LINE.encode("utf-8"))
+        for _ in range(orders):
+            picked = rng.sample(ITEMS, rng.randint(1, 4))
+            items = []
+            for kind, name, size, price in picked:
+                qty = rng.randint(1, 3)
+                items.append({"type": kind, "name": name, "size": size or "-", "qty": qty, "unit_price": price,
+                              "total": f"{float(price) * qty:.2f}"})
+            order = {"delivery_method": rng.choice(["pickup", "delivery"]), "address": None, "notes": None}
+            f.write(encode_order(order, items, timestamp=now - rng.randint(0, days * 86400)))
+            lines += len(items)
+    return lines
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return round(statistics.median(samples) * 1000, 2)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the order analytics store")
+    parser.add_argument("--orders", type=int, default=300_000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--repeat", type=int, default=20, help="runs per store query (pandas runs once)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results only")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = os.path.join(tmp, "orders_journal.csv")
+        lines = write_journal(journal, args.orders, args.days, random.Random(args.seed))
+        analytics = OrderAnalytics(journal)
+        started = time.perf_counter()
+        analytics.sync()
+        ingest_s = time.perf_counter() - started
+
+        store_ms = {
+            "recent_orders": timed(lambda: analytics.recent_orders(10), args.repeat),
+            "revenue_by_day": timed(lambda: analytics.revenue_by_day(args.days), args.repeat),
+            "top_items": timed(lambda: analytics.top_items(10), args.repeat),
+            "delivery_split": timed(lambda: analytics.delivery_split(), args.repeat),
+            "sync_no_change": timed(analytics.sync, args.repeat),
+        }
+
+        def pandas_reports():
+            df = pd.read_csv(journal)
+            df.tail(10)
+            first = df[df["line_no"] == 1]
+            day = pd.to_datetime(first["timestamp"], unit="s").dt.date
+            first.groupby(day)["order_total"].sum()
+            df.groupby("name")["qty"].sum().nlargest(10)
+            return first.groupby("delivery_method")["order_total"].agg(["count", "sum"])
+        started = time.perf_counter()
+        split = pandas_reports()
+        pandas_ms = round((time.perf_counter() - started) * 1000, 2)
+
+        store_revenue = round(sum(r["revenue"] for r in analytics.delivery_split()), 2)
+        pandas_revenue = round(float(split["sum"].sum()), 2)
+        report = {
+            "orders": args.orders, "lines": lines, "journal_mb": round(os.path.getsize(journal) / 1e6, 1),
+            "ingest_s": round(ingest_s, 2), "ingest_lines_per_s": int(lines / ingest_s),
+            "store_query_ms": store_ms, "pandas_all_reports_ms": pandas_ms,
+            "revenue_matches": store_revenue == pandas_revenue, "revenue": store_revenue,
+        }
+        analytics.close()
+
+    if args.json:
+        print(json.dumps(report))
+    else:
+        for key, value in report.items():
+            print(f"{key:>22}: {value}")
+
+if __name__ == "__main__":
+    main()
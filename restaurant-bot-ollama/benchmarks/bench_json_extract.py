@@ -0,0 +1,144 @@
+# Benchmark: order-summary extraction from malformed model output.
+#
+# Runs the previous regex/slice extractor and the single-pass extractor
+# (json_extract + order_schema) over
+#   corpus - benchmarks/json_corpus.jsonl, hand-collected model replies with the
+#            defects seen in practice, each with the order it should yield;
+#   fuzz   - the corpus orders re-damaged at random: mock_ollama's malformations,
+#            truncation at any byte, prose with stray braces, duplicated objects.
+# Reports recovery rate (any order found), exact rate (the intended order) and
+# time per reply, and checks that feeding the same reply as a token stream finds
+# the same objects as a single call.
+#
+#   python benchmarks/bench_json_extract.py [--fuzz 2000] [--seed 1] [--json]
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HERE)
+from json_extract import JsonObjectScanner, extract_objects  # noqa: E402
+from mock_ollama import MALFORMATIONS, malform  # noqa: E402
+from order_schema import OrderSchemaError, order_json, validate_order  # noqa: E402
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "json_corpus.jsonl")
+PROSE = ["Sure! Here is your order:", "Got it {name}! Summary below.", "```json", "```",
+         "Let me know if you need anything else :}", "Total will be shown at checkout."]
+
+def legacy_extract(text: str) -> Optional[str]:
+    # The extractor app.py used before json_extract, kept here as the baseline.
+    if not text: return None
+    fence_match = re.search(r"```(?:json)?\s*(\{.*\})\s*```", text, flags=re.DOTALL|re.IGNORECASE)
+    if fence_match:
+        candidate = fence_match.group(1).strip()
+        try: json.loads(candidate); return candidate
+        except: text = candidate
+    try: json.loads(text); return text
+    except: pass
+    first = text.find("{"); last = text.rfind("}")
+    if first != -1 and last != -1 and last > first:
+        candidate = text[first:last+1]
+        try: json.loads(candidate); return candidate
+        except: pass
+    return None
+
+def normalized(raw: Optional[str]) -> Optional[Dict[str, Any]]:
+    if raw is None: return None
+    try:
+        return validate_order(json.loads(raw))[0].to_dict()
+    except (ValueError, OrderSchemaError):
+        return None
+
+def load_corpus(path: str) -> List[Tuple[str, str, Optional[Dict[str, Any]]]]:
+    with open(path, "r", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return [(r["defect"], r["text"], normalized(json.dumps(r["expect"])) if r["expect"] else None) for r in rows]
+
+def fuzz_cases(orders: List[Dict[str, Any]], n: int, rng: random.Random) -> List[Tuple[str, str, Optional[Dict[str, Any]]]]:
+    cases = []
+    for _ in range(n):
+        order = rng.choice(orders)
+        text = json.dumps(order, indent=rng.choice([None, 1, 2]))
+        kind = rng.choice(MALFORMATIONS + ("cut", "noise", "twice"))
+        expect: Optional[Dict[str, Any]] = order
+        if kind == "cut":
+            text, expect = text[:rng.randint(1, len(text))], None   # a cut-off order must not be recovered
+        elif kind == "noise":
+            text = f"{rng.choice(PROSE)}\n{text}\n{rng.choice(PROSE)}"
+        elif kind == "twice":
+            text = f'Example: {{"name": "pizza_name", "qty": 1}}\n{text}'
+        else:
+            text = malform(text, kind)
+            if kind == "truncate": expect = None
+        cases.append((kind, text, expect))
+    return cases
+
+def score(extract: Callable[[str], Optional[str]], cases) -> Dict[str, Any]:
+    recovered = exact = checked = 0
+    started = time.perf_counter()
+    results = [extract(text) for _, text, _ in cases]
+    elapsed = time.perf_counter() - started
+    for (_, _, expect), raw in zip(cases, results):
+        got = normalized(raw)
+        recovered += got is not None
+        if expect is not None:
+            checked += 1
+            exact += got == expect
+    return {"recovered": round(recovered / len(cases), 4), "exact": round(exact / checked, 4) if checked else None,
+            "us_per_reply": round(elapsed / len(cases) * 1e6, 1)}
+
+def per_defect(extract: Callable[[str], Optional[str]], cases) -> Dict[str, bool]:
+    return {defect: normalized(extract(text)) == expect for defect, text, expect in cases}
+
+def stream_agrees(cases, rng: random.Random) -> float:
+    same = 0
+    for _, text, _ in cases:
+        scanner, found = JsonObjectScanner(), []
+        i = 0
+        while i < len(text):
+            step = rng.randint(1, 8)   # token-sized chunks
+            found += scanner.feed(text[i:i + step])
+            i += step
+        tail = scanner.pending()
+        one_shot = JsonObjectScanner()
+        whole = one_shot.feed(text)
+        same += found == whole and tail == one_shot.pending()
+    return round(same / len(cases), 4)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark order-summary JSON extraction")
+    parser.add_argument("--corpus", default=CORPUS)
+    parser.add_argument("--fuzz", type=int, default=2000, help="number of randomly damaged replies")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results only")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = load_corpus(args.corpus)
+    orders = [expect for _, _, expect in corpus if expect is not None]
+    fuzz = fuzz_cases(orders, args.fuzz, rng)
+    report = {
+        "corpus_size": len(corpus),
+        "fuzz_size": len(fuzz),
+        "corpus": {"legacy": score(legacy_extract, corpus), "single_pass": score(order_json, corpus)},
+        "fuzz": {"legacy": score(legacy_extract, fuzz), "single_pass": score(order_json, fuzz)},
+        "stream_matches_one_shot": stream_agrees(corpus + fuzz, rng),
+        "objects_in_corpus": sum(len(extract_objects(text)) for _, text, _ in corpus),
+    }
+    if args.json:
+        print(json.dumps(report))
+        return
+    for key, value in report.items():
+        print(f"{key:>24}: {value}")
+    legacy, single = per_defect(legacy_extract, corpus), per_defect(order_json, corpus)
+    print("\n" + f"{'defect':<32}{'legacy':>8}{'single':>8}")
+    for defect in legacy:
+        print(f"{defect:<32}{'ok' if legacy[defect] else '-':>8}{'ok' if single[defect] else '-':>8}")
+
+if __name__ == "__main__":
+    main()
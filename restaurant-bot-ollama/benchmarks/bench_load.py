@@ -0,0 +1,217 @@
+# Load test: scripted customer conversations through the bot's non-UI core.
+#
+# Each virtual customer replays one scripted conversation: every turn goes
+# through app.call_ollama (admission queue and router included), then the order
+# summary is requested (with the app's structured `format`), parsed with
+# extract_json_from_text, priced with calculate_total_from_summary and appended
+# to a scratch order journal. Scripts only order items on the shipped menu.json,
+# and each priced order is checked against the lines its script asked for: an
+# order that does not match is counted as mismatched and not persisted.
+# By default a mock Ollama (mock_ollama.py) is started in-process with the given
+# latency and token rate; pass --url to load a real server instead.
+# Reports p50/p95/p99 turn and summary latency, throughput, first-try JSON
+# success rate, the share of orders that matched their script and orders
+# persisted per second.
+#
+#   python benchmarks/bench_load.py [--customers 50] [--concurrency 8] [--ttft 0.2] [--tokens-per-s 40]
+#                                   [--url http://localhost:11434] [--json] [--out results.json]
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HERE)
+import app  # noqa: E402
+import order_store  # noqa: E402
+from cart import Cart  # noqa: E402
+from menu_index import build_menu_index  # noqa: E402
+from mock_ollama import FORMAT_SUPPORT, MockOllama, serve  # noqa: E402
+from ollama_router import parse_endpoints  # noqa: E402
+
+for _name in list(logging.root.manager.loggerDict):
+    if _name.startswith("streamlit"):
+        logging.getLogger(_name).setLevel(logging.ERROR)  # bare-mode "missing ScriptRunContext" noise
+
+# (customer turns, expected priced lines as (category, menu item, size, qty)); single-size items carry no size.
+CONVERSATIONS: List[Tuple[List[str], List[Tuple[str, str, Optional[str], int]]]] = [
+    (["Hi! What pizzas do you have?", "I'd like a large pepperoni please.", "And a medium coke.",
+      "That's for pickup."],
+     [("pizzas", "Pepperoni", "L", 1), ("drinks", "Coke", "M", 1)]),
+    (["Two small cheese pizzas and a large fries", "Add extra cheese", "Deliver to 12 Baker Street please."],
+     [("pizzas", "Cheese", "S", 2), ("sides", "Fries", "L", 1), ("toppings", "Extra Cheese", None, 1)]),
+    (["Can I get an eggplant pizza?", "Medium, please", "Plus two bottled water", "Pickup, thanks"],
+     [("pizzas", "Eggplant", "M", 1), ("drinks", "Bottled Water", None, 2)]),
+    (["What sides do you have?", "One small fries and one greek salad", "And a large sprite",
+      "I'll pick it up."],
+     [("sides", "Fries", "S", 1), ("sides", "Greek Salad", None, 1), ("drinks", "Sprite", "L", 1)]),
+]
+
+def check_scripts(menu_index):
+    """Fail fast if a script orders something the menu can't price."""
+    for _, expected in CONVERSATIONS:
+        for category, name, size, _ in expected:
+            if menu_index.resolve(category, name.lower(), size) is None:
+                raise SystemExit(f"bench_load: scripted {category} line {name!r} ({size}) is not on the menu")
+
+def line_key(line: Dict[str, Any]) -> Tuple[str, str, int]:
+    return line["name"], line["size"], int(line["qty"])
+
+def expected_lines(expected: List[Tuple[str, str, Optional[str], int]]) -> Counter:
+    return Counter((name, size or "-", qty) for _, name, size, qty in expected)
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values: return {"count": 0}
+    ordered = sorted(values)
+    def pick(p): return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))]
+    return {"count": len(ordered), "p50_ms": round(pick(50) * 1000, 1), "p95_ms": round(pick(95) * 1000, 1),
+            "p99_ms": round(pick(99) * 1000, 1), "max_ms": round(ordered[-1] * 1000, 1),
+            "mean_ms": round(sum(ordered) / len(ordered) * 1000, 1)}
+
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.turns: List[float] = []
+        self.summaries: List[float] = []
+        self.persists: List[float] = []
+        self.json_ok = self.json_failed = self.errors = self.shed = self.unresolved = self.mismatched = 0
+
+    def add(self, **counts):
+        with self.lock:
+            for key, value in counts.items():
+                if isinstance(value, list): getattr(self, key).extend(value)
+                else: setattr(self, key, getattr(self, key) + value)
+
+def run_customer(n: int, url: str, model: str, menu_text: str, menu_index, journal: str, results: Results):
+    script, expected = CONVERSATIONS[n % len(CONVERSATIONS)]
+    messages = [app.system_message(menu_text)]
+    turns: List[float] = []
+    for text in script:
+        messages.append({"role": "user", "content": text})
+        started = time.perf_counter()
+        reply = app.call_ollama(url, model, messages, extra=app.call_options("chat"))
+        turns.append(time.perf_counter() - started)
+        if reply == app.BUSY_REPLY:
+            results.add(turns=turns, shed=1)
+            return
+        if reply.startswith("ERROR"):
+            results.add(turns=turns, errors=1)
+            return
+        messages.append({"role": "assistant", "content": reply})
+
+    cart = Cart().sync(messages, menu_index)
+    started = time.perf_counter()
+    timings: Dict[str, Any] = {}
+    raw = app.call_ollama(url, model, app.summary_prompt(cart, messages, menu_text),
+                          extra=app.call_options("summary"), metrics=timings, kind="summary")
+    summary_s = time.perf_counter() - started
+    extracted = app.extract_json_from_text(raw)
+    if raw != app.BUSY_REPLY and not raw.startswith("ERROR"):
+        app.record_summary_parse(app.get_telemetry(), timings.get("format"), extracted is not None)
+    if not extracted:
+        results.add(turns=turns, summaries=[summary_s], json_failed=1, shed=int(raw == app.BUSY_REPLY))
+        return
+    order = json.loads(extracted)
+    _, lines = app.calculate_total_from_summary(order, menu_index)
+    if app.unresolved_lines(lines) or not lines:
+        results.add(turns=turns, summaries=[summary_s], json_ok=1, unresolved=1)
+        return
+    if Counter(line_key(l) for l in lines) != expected_lines(expected):
+        results.add(turns=turns, summaries=[summary_s], json_ok=1, mismatched=1)
+        return
+    started = time.perf_counter()
+    order_store.append_order(order, lines, path=journal)
+    results.add(turns=turns, summaries=[summary_s], persists=[time.perf_counter() - started], json_ok=1)
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the ordering bot")
+    parser.add_argument("--customers", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--url", default=None, help="Ollama to load (default: an in-process mock)")
+    parser.add_argument("--model", default=app.DEFAULT_MODEL)
+    parser.add_argument("--ttft", type=float, default=0.2, help="mock: seconds to first token")
+    parser.add_argument("--tokens-per-s", type=float, default=40.0, help="mock: generation rate")
+    parser.add_argument("--reply-tokens", type=int, default=30, help="mock: chat reply length")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="mock: fraction of HTTP 500 answers")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="mock: fraction of damaged JSON summaries")
+    parser.add_argument("--seed", type=int, default=1, help="mock: seed for injected failures")
+    parser.add_argument("--format-support", choices=FORMAT_SUPPORT, default="schema",
+                        help="mock: emulate a server without JSON schema (json) or `format` (none) support")
+    parser.add_argument("--max-concurrent", type=int, default=None,
+                        help="admission slots (default: --concurrency, i.e. no queueing)")
+    parser.add_argument("--menu", default=os.path.join(HERE, "menu.json"))
+    parser.add_argument("--json", action="store_true", help="print machine-readable results only")
+    parser.add_argument("--out", default=None, help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    url, mock = args.url, None
+    if url is None:
+        mock = MockOllama(ttft_s=args.ttft, tokens_per_s=args.tokens_per_s, reply_tokens=args.reply_tokens,
+                          menu_file=args.menu, error_rate=args.error_rate, malformed_rate=args.malformed_rate,
+                          seed=args.seed, format_support=args.format_support)
+        url = f"http://127.0.0.1:{serve(mock).server_port}"
+    endpoints = parse_endpoints(url)
+    admission = app.get_admission_controller(endpoints)
+    admission.max_concurrent = args.max_concurrent or args.concurrency
+
+    with open(args.menu, "r", encoding="utf-8") as f:
+        menu = json.load(f)
+    menu_index = build_menu_index(menu)
+    check_scripts(menu_index)
+    menu_text = app.menu_to_text(menu)
+    results = Results()
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = os.path.join(tmp, "orders_journal.csv")
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            for f in [pool.submit(run_customer, n, url, args.model, menu_text, menu_index, journal, results)
+                      for n in range(args.customers)]:
+                f.result()
+        wall_s = time.perf_counter() - started
+        persisted = len({row["order_id"] for row in order_store.iter_rows(journal)})
+
+    attempts = results.json_ok + results.json_failed
+    # What the app asked for, after any downgrade; a server without `format` support ignores it
+    # silently, which only the mock can tell us.
+    requested = app.summary_format(endpoints) or "prompt"
+    applied = "prompt" if mock is not None and mock.snapshot()["format_ignored"] else requested
+    report = {
+        "config": {"customers": args.customers, "concurrency": args.concurrency, "url": args.url or "mock",
+                   "model": args.model, "ttft_s": args.ttft, "tokens_per_s": args.tokens_per_s,
+                   "error_rate": args.error_rate, "malformed_rate": args.malformed_rate,
+                   "max_concurrent": admission.max_concurrent, "format_support": args.format_support},
+        "wall_s": round(wall_s, 3),
+        "turn_latency": percentiles(results.turns),
+        "summary_latency": percentiles(results.summaries),
+        "persist_latency": percentiles(results.persists),
+        "turns_per_s": round(len(results.turns) / wall_s, 2),
+        "conversations_per_s": round(args.customers / wall_s, 2),
+        "json_success_rate": round(results.json_ok / attempts, 4) if attempts else 0.0,
+        "summary_format": applied,
+        "summary_format_requested": requested,
+        "orders_persisted": persisted,
+        "orders_per_s": round(persisted / wall_s, 2),
+        "errors": results.errors,
+        "shed": results.shed,
+        "unresolved": results.unresolved,
+        "mismatched": results.mismatched,
+        "order_match_rate": round(persisted / attempts, 4) if attempts else 0.0,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report))
+    else:
+        for key, value in report.items():
+            print(f"{key:>20}: {value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# Benchmark: fuzzy menu matching over a corpus of noisy item names.
+#
+# Generates typo/plural/extra-word variants of every menu item (seeded, so runs
+# are comparable), adds the junk names seen in real orders.csv rows, and reports
+# accuracy, clarification rate and per-lookup latency (cold and memoized).
+#
+#   python benchmarks/bench_menu_match.py [--menu menu.json] [--variants 50] [--json]
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from menu_index import CATEGORIES, build_menu_index  # noqa: E402
+from menu_match import MenuMatcher  # noqa: E402
+
+# Names the model actually produced (see orders.csv); none of them should be priced.
+REAL_JUNK = [("pizzas", ""), ("pizzas", "large"), ("pizzas", "Pizza"), ("pizzas", "small"), ("drinks", "drink")]
+
+def _typo(word: str, rng: random.Random) -> str:
+    if len(word) < 4: return word
+    i = rng.randrange(1, len(word) - 1)
+    op = rng.choice("dtsi")
+    if op == "d": return word[:i] + word[i + 1:]
+    if op == "t": return word[:i - 1] + word[i] + word[i - 1] + word[i + 1:]
+    if op == "s": return word[:i] + rng.choice(string.ascii_lowercase) + word[i + 1:]
+    return word[:i] + rng.choice(string.ascii_lowercase) + word[i:]
+
+def noisy_corpus(menu, variants: int, seed: int = 7):
+    rng = random.Random(seed)
+    corpus = []
+    for category in CATEGORIES:
+        for name in (menu.get(category) or {}):
+            for _ in range(variants):
+                noisy = name
+                kind = rng.choice(["typo", "case", "plural", "size", "noun", "clean"])
+                if kind == "typo": noisy = " ".join(_typo(w, rng) for w in name.split())
+                elif kind == "case": noisy = name.upper() if rng.random() < 0.5 else name.lower()
+                elif kind == "plural": noisy = name + "s"
+                elif kind == "size": noisy = f"{rng.choice(['large', 'small', 'medium'])} {name}"
+                elif kind == "noun": noisy = f"{name} {category[:-1]}"
+                corpus.append((category, noisy, name))
+    corpus += [(c, n, None) for c, n in REAL_JUNK]
+    return corpus
+
+def run(menu_path: str, variants: int):
+    with open(menu_path, "r", encoding="utf-8") as f:
+        menu = json.load(f)
+    index = build_menu_index(menu)
+    corpus = noisy_corpus(menu, variants)
+
+    t0 = time.perf_counter()
+    matcher = MenuMatcher(index)
+    build_s = time.perf_counter() - t0
+
+    correct = wrong = clarify = junk_priced = 0
+    t0 = time.perf_counter()
+    for category, noisy, expected in corpus:
+        m = matcher.match(category, noisy)
+        if expected is None:
+            junk_priced += m.confident
+        elif not m.confident:
+            clarify += 1
+        elif m.item.name == expected:
+            correct += 1
+        else:
+            wrong += 1
+    cold_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for category, noisy, _ in corpus:
+        matcher.match(category, noisy)
+    warm_s = time.perf_counter() - t0
+
+    n = len(corpus)
+    labelled = n - len(REAL_JUNK)
+    return {
+        "names": n,
+        "index_build_ms": round(build_s * 1000, 3),
+        "accuracy": round(correct / labelled, 4),
+        "wrong_rate": round(wrong / labelled, 4),
+        "clarification_rate": round(clarify / labelled, 4),
+        "junk_priced": junk_priced,
+        "cold_us_per_lookup": round(cold_s / n * 1e6, 2),
+        "memoized_us_per_lookup": round(warm_s / n * 1e6, 2),
+    }
+
+def main():
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Benchmark fuzzy menu matching over noisy item names")
+    parser.add_argument("--menu", default=os.path.join(here, "menu.json"))
+    parser.add_argument("--variants", type=int, default=50, help="noisy variants per menu item")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results only")
+    args = parser.parse_args()
+    result = run(args.menu, args.variants)
+    if args.json:
+        print(json.dumps(result))
+    else:
+        for k, v in result.items():
+            print(f"{k:>24}: {v}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# Benchmark: batch pricing (pricing.price_orders) vs. one calculate_total_from_summary per order.
+#
+# Generates --orders synthetic summaries against menu.json: exact names, aliases,
+# size words and category nouns in the name, typos, off-menu items, missing or
+# unknown sizes, and quantities as ints or strings. Each run prices them with a
+# fresh menu index (so neither side starts with a warm matcher cache) and checks
+# that both give identical totals and line items.
+#
+#   python benchmarks/bench_pricing.py [--orders 100000] [--repeat 3] [--json]
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Dict, Any, List
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HERE)
+from menu_index import build_menu_index  # noqa: E402
+from pricing import LINE_TYPES, calculate_total_from_summary, price_orders  # noqa: E402
+
+NOUNS = {"pizzas": "pizza", "toppings": "", "drinks": "", "sides": ""}
+OFF_MENU = {"pizzas": ["Hawaiian", "BBQ Chicken"], "toppings": ["Anchovies"], "drinks": ["Fanta"], "sides": ["Onion Rings"]}
+
+def typo(name: str, rng: random.Random) -> str:
+    i = rng.randrange(len(name))
+    return name[:i] + name[i + 1:] if rng.random() < 0.5 else name[:i] + name[i] + name[i:]
+
+def generate(menu: Dict[str, Any], count: int, rng: random.Random) -> List[Dict[str, Any]]:
+    aliases = list((menu.get("aliases") or {}).keys())
+    orders = []
+    for _ in range(count):
+        order: Dict[str, Any] = {"delivery_method": rng.choice(["pickup", "delivery"]), "address": None, "notes": None}
+        for category, _ in LINE_TYPES:
+            entries = []
+            for _ in range(rng.choice([0, 0, 1, 1, 2, 3])):
+                name, sizes = rng.choice(list(menu[category].items()))
+                roll = rng.random()
+                if roll < 0.08: name = rng.choice(aliases)
+                elif roll < 0.16: name = typo(name, rng)
+                elif roll < 0.20: name = rng.choice(OFF_MENU[category])
+                elif roll < 0.26: name = f"large {name.lower()} {NOUNS[category]}".strip()
+                elif roll < 0.30: name = name.upper()
+                size = rng.choice(list(sizes) + [None]) if isinstance(sizes, dict) else None
+                if rng.random() < 0.03: size = "XL"
+                qty: Any = rng.choice([1, 1, 1, 2, 3, 12])
+                if rng.random() < 0.1: qty = str(qty)
+                entry = {"name": name, "size": size, "qty": qty}
+                if category == "toppings": entry = {"name": name, "qty": qty, "applies_to": "all"}
+                entries.append(entry)
+            order[category] = entries
+        orders.append(order)
+    return orders
+
+def timed(fn, repeat: int):
+    samples, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - started)
+    return round(statistics.median(samples), 3), result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch order pricing")
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results only")
+    args = parser.parse_args()
+
+    with open(os.path.join(HERE, "menu.json"), "r", encoding="utf-8") as f:
+        menu = json.load(f)
+    orders = generate(menu, args.orders, random.Random(args.seed))
+
+    def loop():
+        index = build_menu_index(menu)
+        return [calculate_total_from_summary(o, index) for o in orders]
+
+    loop_s, expected = timed(loop, args.repeat)
+    batch_s, got = timed(lambda: price_orders(orders, build_menu_index(menu)), args.repeat)
+
+    lines = sum(len(items) for _, items in expected)
+    report = {
+        "orders": args.orders, "lines": lines,
+        "unresolved_lines": sum(1 for _, items in expected for l in items if l["unit_price"] == "?"),
+        "loop_s": loop_s, "batch_s": batch_s, "speedup": round(loop_s / batch_s, 1),
+        "batch_orders_per_s": int(args.orders / batch_s),
+        "totals_match": [t for t, _ in got] == [t for t, _ in expected],
+        "line_items_match": got == expected,
+        "revenue": round(sum(t for t, _ in got), 2),
+    }
+    if args.json:
+        print(json.dumps(report))
+    else:
+        for key, value in report.items():
+            print(f"{key:>20}: {value}")
+    if not (report["totals_match"] and report["line_items_match"]):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# Benchmark: prompt-eval time with and without prompt-cache mode.
+#
+# Replays a scripted ordering conversation against a live Ollama twice:
+#   cache - system prompt byte-identical every turn, model pinned with keep_alive,
+#           fixed num_ctx (the app's default "prompt cache mode");
+#   cold  - keep_alive=0, so the model is unloaded after every request and the
+#           whole prompt, menu included, is evaluated from scratch each turn.
+# Reports Ollama's own prompt_eval_duration / load_duration per turn.
+#
+#   python benchmarks/bench_prompt_cache.py [--url http://localhost:11434] [--model gemma:2b] [--json]
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HERE)
+import app  # noqa: E402
+from ollama_client import OllamaClient  # noqa: E402
+
+SCRIPT = [
+    "Hi! What pizzas do you have?",
+    "I'd like a large pepperoni please.",
+    "Can I add extra cheese to that?",
+    "And two small fries and a medium coke.",
+    "That's for pickup. What's my total?",
+]
+
+def run_mode(client: OllamaClient, model: str, system, extra) -> list:
+    messages = [system]
+    turns = []
+    for text in SCRIPT:
+        messages.append({"role": "user", "content": text})
+        started = time.perf_counter()
+        data = client.chat(model, messages, **extra).json()
+        elapsed = time.perf_counter() - started
+        metrics = {}
+        app.record_ollama_timings(data, metrics)
+        metrics["total_s"] = elapsed
+        turns.append(metrics)
+        messages.append({"role": "assistant", "content": data.get("message", {}).get("content", "")})
+    return turns
+
+def summarize(turns: list) -> dict:
+    def col(key): return [t.get(key) or 0.0 for t in turns]
+    return {
+        "turns": len(turns),
+        "prompt_eval_s_mean": round(statistics.mean(col("prompt_eval_duration_s")), 4),
+        "prompt_eval_s_median": round(statistics.median(col("prompt_eval_duration_s")), 4),
+        "prompt_eval_tokens_mean": round(statistics.mean(col("prompt_eval_count")), 1),
+        "load_s_mean": round(statistics.mean(col("load_duration_s")), 4),
+        "turn_latency_s_mean": round(statistics.mean(col("total_s")), 4),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark prompt-eval time with and without prompt-cache mode")
+    parser.add_argument("--url", default=os.environ.get("OLLAMA_URL", "http://localhost:11434"))
+    parser.add_argument("--model", default=app.DEFAULT_MODEL)
+    parser.add_argument("--menu", default=os.path.join(HERE, "menu.json"))
+    parser.add_argument("--json", action="store_true", help="print machine-readable results only")
+    args = parser.parse_args()
+
+    with open(args.menu, "r", encoding="utf-8") as f:
+        system = app.system_message(app.menu_to_text(json.load(f)))
+    client = OllamaClient(args.url)
+    cache_extra = app.call_options("chat", prompt_cache=True)
+    results = {
+        # Warm-up turn pins the model so the cache run measures steady state.
+        "cache": summarize(run_mode(client, args.model, system, cache_extra)[1:]),
+        "cold": summarize(run_mode(client, args.model, system, {"keep_alive": 0})),
+    }
+    if args.json:
+        print(json.dumps(results))
+    else:
+        for mode, summary in results.items():
+            print(mode)
+            for k, v in summary.items():
+                print(f"  {k:>24}: {v}")
+
+if __name__ == "__main__":
+    main()
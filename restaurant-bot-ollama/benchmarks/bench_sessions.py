@@ -0,0 +1,120 @@
+# Benchmark: session persistence (session_store.py) with thousands of concurrent conversations.
+#
+# Interleaves --sessions conversations turn by turn (as live customers would),
+# saving after every message like the app does, with an LRU smaller than the
+# number of sessions so evictions happen. Then resumes every session from disk,
+# checks transcript and cart round-trip exactly, and sweeps half of them as
+# expired. Compared with rewriting the whole session as one JSON file per save,
+# which is what a naive snapshot store does.
+#
+#   python benchmarks/bench_sessions.py [--sessions 5000] [--turns 12] [--cache 1000] [--json]
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Dict, Any, List
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HERE)
+from session_store import SessionStore, new_session_id  # noqa: E402
+
+SYSTEM = {"role": "system", "content": "You are OrderBot. " + "menu line " * 300}
+USER = ["a large pepperoni please", "and a medium coke", "add fries", "make the coke large",
+        "actually two pizzas", "for delivery", "to 12 Baker Street", "that's all, thanks"]
+
+def cart_state(turn: int) -> Dict[str, Any]:
+    return {"order": {"pizzas": [{"name": "Pepperoni", "size": "L", "qty": 1 + turn // 4}], "toppings": [],
+                      "drinks": [{"name": "Coke", "size": "M", "qty": 1}] if turn > 1 else [], "sides": [],
+                      "delivery_method": "delivery" if turn > 5 else None, "address": None, "notes": None},
+            "penalty": 0.0, "seen": 2 * turn + 2, "model_synced": 0}
+
+def store_memory(store: SessionStore) -> int:
+    """Bytes held by the store's LRU: the dict plus each entry and its hashes (session ids belong to the caller)."""
+    entries = store._entries
+    return sys.getsizeof(entries) + sum(sys.getsizeof(e) + sys.getsizeof(e.last) + sys.getsizeof(e.cart)
+                                        for e in entries.values())
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000, 3)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the session store")
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--turns", type=int, default=12, help="customer messages per session")
+    parser.add_argument("--cache", type=int, default=1000, help="store LRU size")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results only")
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionStore(os.path.join(tmp, "sessions"), max_cached=args.cache, sweep_interval=0)
+        naive_dir = os.path.join(tmp, "naive")
+        os.makedirs(naive_dir)
+        sids = [new_session_id() for _ in range(args.sessions)]
+        transcripts: Dict[str, List[Dict[str, str]]] = {sid: [SYSTEM] for sid in sids}
+        save_s: List[float] = []
+        naive_s: List[float] = []
+        naive_bytes = 0
+
+        for turn in range(args.turns):
+            order = sids[:]
+            rng.shuffle(order)
+            for sid in order:
+                messages = transcripts[sid]
+                messages.append({"role": "user", "content": rng.choice(USER)})
+                messages.append({"role": "assistant", "content": "Sure! " + "Anything else? " * rng.randint(1, 8)})
+                cart = cart_state(turn)
+                started = time.perf_counter()
+                store.save(sid, messages, cart)
+                save_s.append(time.perf_counter() - started)
+
+                started = time.perf_counter()
+                payload = json.dumps({"messages": messages[1:], "cart": cart}).encode("utf-8")
+                with open(os.path.join(naive_dir, sid), "wb") as f:
+                    f.write(payload)
+                naive_s.append(time.perf_counter() - started)
+                naive_bytes += len(payload)
+        cached = store.stats()["cached"]
+        store_kb = store_memory(store) / 1024
+
+        disk_bytes = sum(os.path.getsize(os.path.join(store.directory, n)) for n in os.listdir(store.directory))
+        resume_s: List[float] = []
+        exact = 0
+        for sid in sids:
+            started = time.perf_counter()
+            state = store.load(sid)
+            resume_s.append(time.perf_counter() - started)
+            exact += state is not None and state.messages == transcripts[sid][1:] and state.cart == cart_state(
+                args.turns - 1)
+
+        for sid in sids[::2]:
+            old = time.time() - store.ttl_s - 60
+            os.utime(store._path(sid), (old, old))
+        started = time.perf_counter()
+        swept = store.sweep()
+        sweep_s = time.perf_counter() - started
+
+        report = {
+            "sessions": args.sessions, "saves": len(save_s), "cache_entries": cached,
+            "store_memory_kb": round(store_kb, 1),
+            "save_p50_ms": percentile(save_s, 50), "save_p99_ms": percentile(save_s, 99),
+            "naive_rewrite_p50_ms": percentile(naive_s, 50), "naive_rewrite_p99_ms": percentile(naive_s, 99),
+            "bytes_written_per_save": int(disk_bytes / len(save_s)), "naive_bytes_per_save": int(naive_bytes / len(naive_s)),
+            "resume_p50_ms": percentile(resume_s, 50), "resume_p99_ms": percentile(resume_s, 99),
+            "resumed_exactly": f"{exact}/{args.sessions}", "rewrites": store.stats()["rewrites"],
+            "swept": swept, "sweep_ms": round(sweep_s * 1000, 1),
+        }
+
+    if args.json:
+        print(json.dumps(report))
+    else:
+        for key, value in report.items():
+            print(f"{key:>24}: {value}")
+
+if __name__ == "__main__":
+    main()
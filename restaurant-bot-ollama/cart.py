@@ -0,0 +1,76 @@
+# Structured cart kept in session state and updated turn by turn.
+#
+# The cart folds each new customer message into an order dict with the
+# rule-based extractor, so the running total is always available without a
+# model call. When the extractor is unsure, the model is asked to correct the
+# cart from only the turns since its last correction, which keeps the summary
+# prompt bounded no matter how long the conversation runs.
+import copy
+import json
+from typing import Dict, Any, List, Optional
+
+from menu_index import MenuIndex
+from order_parser import apply_message, empty_order, order_confidence, parse_message, phrase_table_for
+
+ORDER_KEYS = ("pizzas", "toppings", "drinks", "sides", "delivery_method", "address", "notes")
+
+class Cart:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.order: Dict[str, Any] = empty_order()
+        self.penalty = 0.0    # confidence lost since the last model correction
+        self.seen = 0         # messages already folded into the cart
+        self.model_synced = 0 # message count at the last model correction
+
+    def sync(self, messages: List[Dict[str, str]], index: MenuIndex) -> "Cart":
+        """Fold messages appended since the last call. Cheap to call on every rerun."""
+        if len(messages) < self.seen:  # transcript was reset
+            self.reset()
+        table = phrase_table_for(index)
+        for m in messages[self.seen:]:
+            if m.get("role") == "user":
+                parsed = parse_message(m.get("content") or "", table)
+                apply_message(self.order, parsed)
+                self.penalty += parsed.penalty
+        self.seen = len(messages)
+        return self
+
+    def confidence(self, index: MenuIndex) -> float:
+        return order_confidence(self.order, index, self.penalty)
+
+    def is_empty(self) -> bool:
+        return not any(self.order[c] for c in ("pizzas", "toppings", "drinks", "sides"))
+
+    def replace(self, order: Dict[str, Any], message_count: int):
+        """Adopt a model-corrected order covering the first `message_count` messages."""
+        fresh = empty_order()
+        fresh.update({k: copy.deepcopy(order.get(k, fresh[k])) for k in ORDER_KEYS})
+        for k in ("pizzas", "toppings", "drinks", "sides"):
+            if not isinstance(fresh[k], list): fresh[k] = []
+        self.order = fresh
+        self.penalty = 0.0
+        self.seen = max(self.seen, message_count)
+        self.model_synced = message_count
+
+    def pending_messages(self, messages: List[Dict[str, str]], max_turns: int) -> List[Dict[str, str]]:
+        """Non-system messages since the last model correction, capped to the newest `max_turns`."""
+        recent = [m for m in messages[self.model_synced:] if m.get("role") != "system"]
+        return recent[-max_turns:]
+
+    def to_json(self) -> str:
+        return json.dumps(self.order, ensure_ascii=False)
+
+    def to_state(self) -> Dict[str, Any]:
+        """Everything needed to resume this cart later (see session_store.py)."""
+        return {"order": self.order, "penalty": self.penalty, "seen": self.seen, "model_synced": self.model_synced}
+
+    @classmethod
+    def from_state(cls, state: Optional[Dict[str, Any]]) -> "Cart":
+        cart = cls()
+        if state:
+            cart.replace(state.get("order") or {}, int(state.get("model_synced", 0)))
+            cart.penalty = float(state.get("penalty", 0.0))
+            cart.seen = int(state.get("seen", 0))
+        return cart
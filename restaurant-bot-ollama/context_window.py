@@ -0,0 +1,58 @@
+# Prompt budget management for chat turns.
+#
+# fit_context() builds the message list sent to the model for a chat turn:
+#   - the system prompt is pinned first (and kept byte-identical between turns);
+#   - the newest `keep_recent` messages are kept verbatim while they fit the budget;
+#   - everything older is folded into one short summary message (the cart state),
+# so per-turn prompt size stays flat however long the conversation gets.
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_NUM_CTX = 2048        # Ollama's num_ctx when the request sets none
+DEFAULT_KEEP_RECENT = 8
+RESERVED_REPLY_TOKENS = 384   # room left for the model's answer when num_predict is not set
+MESSAGE_OVERHEAD_TOKENS = 4   # role markers / separators per message
+
+@lru_cache(maxsize=4096)
+def estimate_tokens(text: str) -> int:
+    """Cheap tokenizer-free estimate: ~4 characters per token for English, at least one per word."""
+    if not text: return 0
+    return max(len(text) // 4 + 1, len(text.split()))
+
+def message_tokens(message: Dict[str, str]) -> int:
+    return estimate_tokens(message.get("content") or "") + MESSAGE_OVERHEAD_TOKENS
+
+def fit_context(messages: List[Dict[str, str]], system: Dict[str, str], summary: Optional[str] = None,
+                num_ctx: int = DEFAULT_NUM_CTX, reply_tokens: int = RESERVED_REPLY_TOKENS,
+                keep_recent: int = DEFAULT_KEEP_RECENT) -> Tuple[List[Dict[str, str]], Dict[str, int]]:
+    """Return (messages for the model, stats) within `num_ctx` minus `reply_tokens` kept for the answer."""
+    available = num_ctx - reply_tokens - message_tokens(system)
+    history = [m for m in messages if m.get("role") != "system"]
+    recent = history[-keep_recent:] if keep_recent > 0 else []
+
+    summary_msg = {"role": "system", "content": summary} if summary else None
+    if summary_msg:
+        available -= message_tokens(summary_msg)  # reserved in case anything gets folded
+
+    # Drop the oldest of the recent turns until they fit, but always keep the newest message.
+    kept: List[Dict[str, str]] = []
+    used = 0
+    for m in reversed(recent):
+        cost = message_tokens(m)
+        if kept and used + cost > available: break
+        kept.append(m)
+        used += cost
+    kept.reverse()
+
+    folded = len(history) - len(kept)
+    out = [system] + ([summary_msg] if summary_msg and folded else []) + kept
+    stats = {
+        "prompt_tokens_est": sum(message_tokens(m) for m in out),
+        "messages_kept": len(kept),
+        "messages_folded": folded,
+    }
+    return out, stats
+
+def cart_summary(cart_json: str) -> str:
+    return ("Earlier messages of this conversation were omitted for length. The customer's order so far, "
+            f"still current unless they change it: {cart_json}")
@@ -0,0 +1,220 @@
+# Single-pass JSON extraction from model output.
+#
+# JsonObjectScanner walks text once, tracking string/escape state and bracket
+# depth, and emits every balanced top-level {...} as soon as its closing brace
+# arrives, so it works on a token stream as well as on a finished reply. Prose
+# around the objects (including braces in trailing commentary) is ignored.
+# Candidates that are not strict JSON go through repair_json(), which fixes the
+# defects small models produce: single quotes, unquoted keys and bare-word
+# values, trailing commas, Python literals, comments, and truncated output.
+# An object the text ends inside of (a reply cut off mid-stream) is still closed
+# up and parsed, but reported as incomplete: it shows that an order was coming,
+# not what it was, so callers must never price or save it.
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_LITERALS = {"true": "true", "false": "false", "null": "null", "True": "true", "False": "false",
+             "None": "null", "none": "null", "NULL": "null"}
+_NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?")
+_WORD = re.compile(r"[A-Za-z_$][\w$-]*")
+_STRUCTURAL = re.compile(r"[\"'{}\[\]]")
+_IN_DOUBLE = re.compile(r'[\\"]')
+_IN_SINGLE = re.compile(r"[\\']")
+
+class JsonObjectScanner:
+    """Incremental scanner for balanced top-level JSON objects in arbitrary text."""
+    def __init__(self):
+        self._parts: List[str] = []
+        self._depth = 0
+        self._quote: Optional[str] = None
+        self._escape = False
+        self._last = " "    # last character of the previous chunk
+
+    def feed(self, chunk: str) -> List[str]:
+        """Consume more text; return the objects completed by it, in order."""
+        done: List[str] = []
+        start = 0 if self._depth else None
+        i, n = 0, len(chunk)
+        while i < n:
+            if self._depth == 0:
+                j = chunk.find("{", i)
+                if j == -1: break
+                self._depth, start, i = 1, j, j + 1
+                continue
+            if self._escape:
+                self._escape, i = False, i + 1
+                continue
+            if self._quote:
+                m = (_IN_DOUBLE if self._quote == '"' else _IN_SINGLE).search(chunk, i)
+                if m is None: break
+                if m.group() == "\\": self._escape = True
+                else: self._quote = None
+                i = m.end()
+                continue
+            m = _STRUCTURAL.search(chunk, i)
+            if m is None: break
+            j, c = m.start(), m.group()
+            if c == '"':
+                self._quote = c
+            elif c == "'":
+                # single quotes open a string only where one can start, not in "Joe's"
+                if (chunk[j - 1] if j else self._last) in "{[,: \t\r\n": self._quote = c
+            elif c in "{[":
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    done.append("".join(self._parts) + chunk[start:j + 1])
+                    self._parts, start = [], None
+            i = j + 1
+        if self._depth and start is not None:
+            self._parts.append(chunk[start:])
+        if chunk: self._last = chunk[-1]
+        return done
+
+    def pending(self) -> Optional[str]:
+        """The unfinished object at the end of the text, if any (e.g. a truncated reply)."""
+        return "".join(self._parts) if self._depth > 0 else None
+
+def _string(text: str, i: int, quote: str) -> Tuple[str, int]:
+    """Read a quoted string starting at text[i] == quote; return (JSON string, index after it)."""
+    out: List[str] = []
+    i += 1
+    while i < len(text):
+        c = text[i]
+        if c == "\\" and i + 1 < len(text):
+            nxt = text[i + 1]
+            if nxt == "'": out.append("'")
+            elif nxt in '"\\/bfnrtu': out.append(c + nxt)
+            else: out.append("\\\\" + nxt)
+            i += 2
+            continue
+        if c == quote: return '"' + "".join(out) + '"', i + 1
+        if c == '"': out.append('\\"')
+        elif c == "\n": out.append("\\n")
+        elif c == "\t": out.append("\\t")
+        else: out.append(c)
+        i += 1
+    return '"' + "".join(out) + '"', i  # unterminated: close it
+
+def repair_json(text: str) -> str:
+    """Rewrite near-JSON into JSON in one pass; closes anything left open at the end."""
+    out: List[str] = []
+    stack: List[str] = []
+    i, n = 0, len(text)
+
+    def drop_trailing_comma():
+        while out and out[-1].isspace(): out.pop()
+        if out and out[-1] == ",": out.pop()
+
+    while i < n:
+        c = text[i]
+        if c in "\"'":
+            s, i = _string(text, i, c)
+            out.append(s)
+            continue
+        if c == "/" and text.startswith("//", i):
+            end = text.find("\n", i)
+            i = n if end == -1 else end
+            continue
+        if c == "/" and text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = n if end == -1 else end + 2
+            continue
+        if c in "{[":
+            stack.append("}" if c == "{" else "]")
+            out.append(c)
+        elif c in "}]":
+            drop_trailing_comma()
+            if stack: out.append(stack.pop())
+        elif c in ",:":
+            if c == "," and out and out[-1] in ",[{": pass  # doubled or leading comma
+            else: out.append(c)
+        elif c.isspace():
+            out.append(c)
+        elif c == "-" or c.isdigit():
+            m = _NUMBER.match(text, i)
+            if m:
+                out.append(m.group(0))
+                i = m.end()
+                continue
+        elif c.isalpha() or c in "_$":
+            m = _WORD.match(text, i)
+            word = m.group(0)
+            out.append(_LITERALS.get(word, json.dumps(word)))
+            i = m.end()
+            continue
+        # anything else (stray prose characters) is dropped
+        i += 1
+
+    # Truncated output: finish the dangling member, then close every open bracket.
+    while out and out[-1].isspace(): out.pop()
+    if out and out[-1] == ":": out.append("null")
+    drop_trailing_comma()
+    if out and stack and stack[-1] == "}" and out[-1].startswith('"'):
+        # a lone key with no value yet: `{"a": 1, "b"` -> give it one
+        j = len(out) - 2
+        while j >= 0 and out[j].isspace(): j -= 1
+        if j >= 0 and out[j] in ",{": out.append(": null")
+    out.extend(reversed(stack))
+    return "".join(out)
+
+def parse_candidate(candidate: str) -> Optional[Any]:
+    try:
+        return json.loads(candidate)
+    except ValueError:
+        pass
+    try:
+        return json.loads(repair_json(candidate))
+    except ValueError:
+        return None
+
+def iter_candidates(chunks: Iterable[str]) -> Iterable[Tuple[Any, bool]]:
+    """Yield (object, complete) from a stream of text chunks as soon as each object completes;
+    an object cut off by the end of the stream comes last, closed up, with complete=False."""
+    scanner = JsonObjectScanner()
+    for chunk in chunks:
+        for candidate in scanner.feed(chunk):
+            obj = parse_candidate(candidate)
+            if obj is not None: yield obj, True
+    tail = scanner.pending()
+    if tail is not None:
+        obj = parse_candidate(tail)
+        if obj is not None: yield obj, False
+
+def iter_objects(chunks: Iterable[str]) -> Iterable[Any]:
+    """Yield the complete objects from a stream of text chunks as soon as each one completes."""
+    for obj, complete in iter_candidates(chunks):
+        if complete: yield obj
+
+def extract_candidates(text: str) -> List[Tuple[Any, bool]]:
+    """Every top-level object in `text`, repaired where needed, with whether it was complete."""
+    if not text: return []
+    stripped = text.strip()
+    if stripped.startswith("{") and stripped.endswith("}"):
+        try:
+            return [(json.loads(stripped), True)]   # the reply is exactly one clean object: skip the scan
+        except ValueError:
+            pass
+    return list(iter_candidates([text]))
+
+def extract_objects(text: str) -> List[Any]:
+    """Every complete top-level object in `text`, repaired where needed."""
+    return [obj for obj, complete in extract_candidates(text) if complete]
+
+def extract_json(text: str, preferred_keys: Iterable[str] = ()) -> Optional[Any]:
+    """The best complete object in `text`: the one with the most `preferred_keys` (the last one on a tie)."""
+    return best_object(extract_objects(text), preferred_keys)
+
+def best_object(objects: Iterable[Any], preferred_keys: Iterable[str] = ()) -> Optional[Any]:
+    objects = [o for o in objects if isinstance(o, dict)]
+    if not objects: return None
+    keys = set(preferred_keys)
+    best: Tuple[int, int] = (-1, -1)
+    chosen: Dict[str, Any] = objects[0]
+    for pos, obj in enumerate(objects):
+        score = (len(keys & set(obj)), pos)
+        if score > best:
+            best, chosen = score, obj
+    return chosen
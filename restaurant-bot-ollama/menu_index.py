@@ -0,0 +1,133 @@
+# Compiled menu index for O(1) pricing lookups.
+#
+# build_menu_index() turns the raw menu.json dict into flat lookup tables keyed
+# by normalized (category, name, size), so pricing a line item is a single dict
+# hit regardless of capitalization, plurals, size spelling ("large" vs "L") or
+# aliases. Prices are kept as Decimal to avoid float drift in totals.
+#
+# menu.json may carry an optional top-level "aliases" section mapping extra
+# names to menu items, e.g. {"aliases": {"coca cola": "Coke"}}.
+import re
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Any, List, Optional, Tuple
+
+CATEGORIES = ["pizzas", "toppings", "drinks", "sides"]
+DEFAULT_SIZE = "REG"
+
+# Spellings the model and customers use for sizes -> canonical size key.
+SIZE_ALIASES = {
+    "SMALL": "S", "SM": "S", "SML": "S",
+    "MEDIUM": "M", "MED": "M", "MD": "M",
+    "LARGE": "L", "LG": "L", "LRG": "L",
+    "EXTRA LARGE": "XL", "X-LARGE": "XL", "XLARGE": "XL",
+    "REGULAR": DEFAULT_SIZE, "STANDARD": DEFAULT_SIZE, "ONE SIZE": DEFAULT_SIZE, "NORMAL": DEFAULT_SIZE,
+}
+_PIECES = re.compile(r"^(\d+)\s*(?:PC|PCS|PIECE|PIECES)$")
+_NON_WORD = re.compile(r"[^a-z0-9&+ ]+")
+# Words that may follow an item name without changing what it is ("pepperoni pizza").
+CATEGORY_NOUNS = {"pizzas": "pizza", "drinks": "drink", "sides": "side", "toppings": "topping"}
+
+def singularize(word: str) -> str:
+    if len(word) <= 3 or word.endswith("ss"): return word
+    if word.endswith("ies"): return word[:-3] + "y"
+    if word.endswith(("ches", "shes", "xes", "oes")): return word[:-2]
+    if word.endswith("s"): return word[:-1]
+    return word
+
+def normalize_name(name: Any) -> str:
+    words = _NON_WORD.sub(" ", str(name or "").lower().replace("-", " ")).split()
+    return " ".join(singularize(w) for w in words)
+
+def normalize_size(size: Any) -> Optional[str]:
+    if size is None: return None
+    key = " ".join(str(size).upper().replace("_", " ").split())
+    if not key or key == "-": return None
+    key = SIZE_ALIASES.get(key, key)
+    m = _PIECES.match(key)
+    return f"{m.group(1)}PC" if m else key
+
+def to_decimal(value: Any) -> Optional[Decimal]:
+    try:
+        return Decimal(str(value).replace("$", "").strip())
+    except (InvalidOperation, ValueError):
+        return None
+
+class MenuItem:
+    __slots__ = ("category", "name", "key", "prices", "default_price")
+
+    def __init__(self, category: str, name: str, prices: Dict[Optional[str], Decimal]):
+        self.category = category
+        self.name = name
+        self.key = normalize_name(name)
+        self.prices = prices  # size key -> price; unsized items use the single key None
+        if None in prices:
+            self.default_price = prices[None]
+        elif DEFAULT_SIZE in prices:
+            self.default_price = prices[DEFAULT_SIZE]
+        else:
+            self.default_price = next(iter(prices.values()), Decimal("0"))
+
+    @property
+    def sized(self) -> bool:
+        return None not in self.prices
+
+class MenuIndex:
+    def __init__(self, menu: Dict[str, Any]):
+        self.menu = menu
+        self.items: Dict[Tuple[str, str], MenuItem] = {}
+        # (category, name key, size key) -> (item, price); size key None = "no size given".
+        self.prices: Dict[Tuple[str, str, Optional[str]], Tuple[MenuItem, Decimal]] = {}
+        self._build()
+
+    def _add(self, key: str, item: MenuItem):
+        if not key or (item.category, key) in self.items: return
+        self.items[(item.category, key)] = item
+        self.prices[(item.category, key, None)] = (item, item.default_price)
+        for size, price in item.prices.items():
+            if size is not None:
+                self.prices[(item.category, key, size)] = (item, price)
+
+    def _build(self):
+        all_items: List[MenuItem] = []
+        for category in CATEGORIES:
+            for name, entry in (self.menu.get(category) or {}).items():
+                if isinstance(entry, dict):
+                    prices = {normalize_size(sz): to_decimal(p) for sz, p in entry.items()}
+                else:
+                    prices = {None: to_decimal(entry)}
+                prices = {sz: p for sz, p in prices.items() if p is not None}
+                if not prices: continue
+                item = MenuItem(category, name, prices)
+                all_items.append(item)
+                self._add(item.key, item)
+        for item in all_items:
+            word = CATEGORY_NOUNS[item.category]
+            self._add(f"{item.key} {word}", item)
+        by_key = {item.key: item for item in all_items}
+        for alias, target in (self.menu.get("aliases") or {}).items():
+            item = by_key.get(normalize_name(target))
+            if item is not None:
+                self._add(normalize_name(alias), item)
+
+    def lookup(self, category: str, name: Any) -> Optional[MenuItem]:
+        return self.items.get((category, normalize_name(name)))
+
+    def resolve(self, category: str, name: Any, size: Any = None) -> Optional[Tuple[MenuItem, Decimal]]:
+        """Return (item, unit price) for a line item, or None if it is not on the menu."""
+        key = normalize_name(name)
+        size_key = normalize_size(size)
+        hit = self.prices.get((category, key, size_key))
+        if hit is not None: return hit
+        item = self.items.get((category, key))
+        if item is None: return None
+        # Unsized items ignore the size; single-size items accept any size.
+        if not item.sized or len(item.prices) == 1:
+            return item, item.default_price
+        return None
+
+    def price(self, category: str, name: Any, size: Any = None) -> Decimal:
+        hit = self.resolve(category, name, size)
+        return hit[1] if hit else Decimal("0")
+
+def build_menu_index(menu: Dict[str, Any]) -> MenuIndex:
+    return MenuIndex(menu or {})
@@ -0,0 +1,134 @@
+# Fuzzy item matching over the compiled menu index.
+#
+# LLM-produced order JSON often names items loosely: typos ("peperoni"),
+# extra words ("large pepperoni pizza"), or a size used as a name ("large").
+# MenuMatcher resolves such names per category in two stages:
+#   1. candidate generation from a precomputed character-trigram inverted index;
+#   2. rescoring of the best candidates with a normalized edit-distance similarity.
+# Results are memoized, so repeated names cost a single dict hit.
+import threading
+import weakref
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from menu_index import CATEGORIES, MenuIndex, MenuItem, SIZE_ALIASES, CATEGORY_NOUNS, normalize_name
+
+ACCEPT_SCORE = 0.82   # at or above: price the line automatically
+SUGGEST_SCORE = 0.55  # at or above: ask the customer "did you mean ...?"
+MAX_CANDIDATES = 8
+_SIZE_WORDS = {w.lower() for w in SIZE_ALIASES} | {"s", "m", "l", "xl", "small", "medium", "large"}
+
+class Match(NamedTuple):
+    item: Optional[MenuItem]
+    score: float
+    method: str  # exact | token | fuzzy | none
+    alternatives: Tuple[str, ...] = ()
+
+    @property
+    def confident(self) -> bool:
+        return self.item is not None and self.score >= ACCEPT_SCORE
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def edit_distance(a: str, b: str) -> int:
+    """Optimal string alignment distance (Levenshtein plus adjacent transpositions)."""
+    if a == b: return 0
+    if not a: return len(b)
+    if not b: return len(a)
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            cost = 0 if ca == cb else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        prev2, prev = prev, cur
+    return prev[-1]
+
+def similarity(a: str, b: str) -> float:
+    if not a or not b: return 0.0
+    return 1.0 - edit_distance(a, b) / max(len(a), len(b))
+
+class MenuMatcher:
+    def __init__(self, index: MenuIndex):
+        self.index = index
+        # Per category: candidate keys, their trigram sets and trigram -> candidate ids.
+        self._keys: Dict[str, List[str]] = {c: [] for c in CATEGORIES}
+        self._grams: Dict[str, List[Set[str]]] = {c: [] for c in CATEGORIES}
+        self._postings: Dict[str, Dict[str, List[int]]] = {c: {} for c in CATEGORIES}
+        for (category, key), _item in index.items.items():
+            i = len(self._keys[category])
+            grams = trigrams(key)
+            self._keys[category].append(key)
+            self._grams[category].append(grams)
+            for g in grams:
+                self._postings[category].setdefault(g, []).append(i)
+        self._cache: Dict[Tuple[str, str], Match] = {}
+
+    def candidates(self, category: str, key: str, limit: int = MAX_CANDIDATES) -> List[Tuple[str, float]]:
+        """Top candidate keys by trigram Dice coefficient."""
+        grams = trigrams(key)
+        overlap: Counter = Counter()
+        postings = self._postings.get(category, {})
+        for g in grams:
+            for i in postings.get(g, ()):
+                overlap[i] += 1
+        keys, key_grams = self._keys[category], self._grams[category]
+        scored = [(keys[i], 2.0 * n / (len(grams) + len(key_grams[i]))) for i, n in overlap.items()]
+        scored.sort(key=lambda kv: kv[1], reverse=True)
+        return scored[:limit]
+
+    def match(self, category: str, name: Optional[str]) -> Match:
+        key = normalize_name(name)
+        cached = self._cache.get((category, key))
+        if cached is not None: return cached
+        result = self._match(category, key)
+        if len(self._cache) < 50_000:
+            self._cache[(category, key)] = result
+        return result
+
+    def _match(self, category: str, key: str) -> Match:
+        if not key: return Match(None, 0.0, "none")
+        item = self.index.items.get((category, key))
+        if item is not None: return Match(item, 1.0, "exact")
+
+        # Drop size words and the category noun ("large pepperoni pizza" -> "pepperoni").
+        noun = CATEGORY_NOUNS.get(category)
+        words = [w for w in key.split() if w not in _SIZE_WORDS and w != noun]
+        core = " ".join(words)
+        if not core: return Match(None, 0.0, "none")
+        if core != key:
+            item = self.index.items.get((category, core))
+            if item is not None: return Match(item, 0.95, "token")
+
+        best: Dict[str, Tuple[float, MenuItem]] = {}
+        for cand, dice in self.candidates(category, core):
+            score = max(similarity(core, cand), dice)
+            # A whole menu name contained in the query is a strong signal.
+            if f" {cand} " in f" {core} ":
+                score = max(score, 0.9)
+            item = self.index.items[(category, cand)]
+            if score > best.get(item.name, (0.0, item))[0]:
+                best[item.name] = (score, item)
+        if not best: return Match(None, 0.0, "none")
+        ranked = sorted(best.values(), key=lambda si: si[0], reverse=True)
+        top_score, top_item = ranked[0]
+        alternatives = tuple(it.name for sc, it in ranked[:3] if sc >= SUGGEST_SCORE)
+        if top_score < SUGGEST_SCORE:
+            return Match(None, top_score, "none", alternatives)
+        return Match(top_item, top_score, "fuzzy", alternatives)
+
+_matchers: "weakref.WeakKeyDictionary[MenuIndex, MenuMatcher]" = weakref.WeakKeyDictionary()
+_matchers_lock = threading.Lock()
+
+def matcher_for(index: MenuIndex) -> MenuMatcher:
+    """Matcher for a menu index, built once per index (i.e. once per menu version)."""
+    with _matchers_lock:
+        matcher = _matchers.get(index)
+        if matcher is None:
+            matcher = _matchers[index] = MenuMatcher(index)
+        return matcher
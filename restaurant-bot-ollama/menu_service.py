@@ -0,0 +1,99 @@
+# Menu loaded once per process and hot-reloaded when menu.json changes.
+#
+# A daemon thread stats the file on an interval (mtime and size; the stdlib has
+# no portable inotify) and, when it changed, parses it and builds everything a
+# rerun needs from the menu: the pricing index with its matcher and phrase
+# table, the menu text, the system prompt and a version hash. The finished
+# MenuVersion replaces the current one in a single assignment, so a rerun sees
+# either the old menu or the new one, never a mix, and does no file I/O itself.
+# A file that fails to parse (e.g. caught half-written) keeps the old version.
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Any, Callable, NamedTuple, Optional, Tuple
+
+from menu_index import MenuIndex, build_menu_index
+from menu_match import matcher_for
+from order_parser import phrase_table_for
+
+DEFAULT_RELOAD_INTERVAL = 2.0
+
+class MenuVersion(NamedTuple):
+    index: MenuIndex
+    text: str                      # menu_to_text() output, shown in the menu card and the prompt
+    prompt: str                    # full system prompt for this menu
+    version: str                   # short hash of the parsed menu and its text; part of every response cache key
+    loaded_at: float
+
+    @property
+    def menu(self) -> Dict[str, Any]:
+        return self.index.menu
+
+    @property
+    def system_message(self) -> Dict[str, str]:
+        return {"role": "system", "content": self.prompt}
+
+def menu_version(menu: Dict[str, Any], text: str) -> str:
+    # The whole parsed menu, not just the text: aliases change matching without changing the text.
+    canonical = json.dumps(menu, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(f"{canonical}\n{text}".encode("utf-8")).hexdigest()[:12]
+
+class MenuService:
+    def __init__(self, path: str, render_text: Callable[[Dict[str, Any]], str], build_prompt: Callable[[str], str],
+                 interval: float = DEFAULT_RELOAD_INTERVAL, fallback: Optional[Dict[str, Any]] = None):
+        self.path = path
+        self.render_text = render_text
+        self.build_prompt = build_prompt
+        self.interval = interval
+        self.last_error: Optional[str] = None
+        self.reloads = 0
+        self._signature: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.current = self._build(fallback or {})
+        self.reload()
+        self.reloads = 0   # counts hot reloads only
+
+    def _build(self, menu: Dict[str, Any]) -> MenuVersion:
+        index = build_menu_index(menu)
+        matcher_for(index)       # warm the per-index caches before the version goes live
+        phrase_table_for(index)
+        text = self.render_text(menu)
+        return MenuVersion(index, text, self.build_prompt(text), menu_version(menu, text), time.time())
+
+    def reload(self) -> bool:
+        """Load the file if it changed since the last attempt; True if a new version went live."""
+        with self._lock:
+            try:
+                st = os.stat(self.path)
+            except OSError as e:
+                self.last_error = f"{self.path}: {e.strerror}"
+                return False
+            signature = (st.st_mtime_ns, st.st_size)
+            if signature == self._signature: return False
+            self._signature = signature
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    version = self._build(json.load(f))
+            except Exception as e:
+                self.last_error = f"{self.path}: {e}"
+                return False
+            self.last_error = None
+            if version.version == self.current.version: return False
+            self.current = version
+            self.reloads += 1
+            return True
+
+    def start(self) -> "MenuService":
+        with self._lock:
+            if self.interval > 0 and (self._thread is None or not self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name="menu-watch", daemon=True)
+                self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.reload()
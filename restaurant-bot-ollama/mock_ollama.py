@@ -0,0 +1,325 @@
+# Stand-in for an Ollama server, for benchmarks, CI and offline runs.
+#
+# Implements GET /api/tags, /api/version and POST /api/chat (streaming NDJSON and
+# plain JSON) with a tunable time-to-first-token and generation rate, and reports
+# the same timing fields Ollama does. Replies come from, in order:
+#   - replayed exchanges recorded earlier (--replay, see --record),
+#   - scripted rules: the first regex matching the last message wins (--script),
+#   - the built-in default: the rule-based extraction of the conversation
+#     (order_parser) when a JSON summary is asked for, else a fixed-length reply.
+# Failures can be injected at given rates: HTTP 500s, errors in the middle of a
+# stream, and malformed JSON summaries. A `format` field (JSON mode or a schema)
+# is honoured the way Ollama does it, as decoding that cannot produce malformed
+# JSON; --format-support json/none emulates servers before 0.5 (schema answered
+# with HTTP 400) or before JSON mode (field ignored). All randomness is seeded
+# (--seed), so a run is reproducible.
+#
+#   python mock_ollama.py [--port 11435] [--ttft 0.2] [--tokens-per-s 40] [--script rules.json]
+#                         [--replay exchanges.jsonl] [--error-rate 0.05] [--malformed-rate 0.1] [--seed 1]
+#   python mock_ollama.py --record exchanges.jsonl --upstream http://localhost:11434
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional
+
+import requests
+
+DEFAULT_PORT = 11435
+DEFAULT_TTFT_S = 0.2
+DEFAULT_TOKENS_PER_S = 40.0
+DEFAULT_REPLY_TOKENS = 30
+DEFAULT_MODELS = ("gemma:2b", "llama3:latest")
+FORMAT_SUPPORT = ("schema", "json", "none")
+MALFORMATIONS = ("truncate", "trailing_comma", "single_quotes", "prose", "unquoted_keys")
+
+CHAT_WORDS = ("Sure! I can help with that. Our pizzas are made fresh to order, and the Supreme is a "
+              "customer favourite. Would you like a size, any extra toppings, a drink or a side with it? "
+              "Let me know if it is for pickup or delivery.").split()
+
+def exchange_key(model: Optional[str], messages: List[Dict[str, str]]) -> str:
+    """Identity of a request for replay: model plus every role/content pair."""
+    payload = [model] + [[m.get("role"), m.get("content")] for m in messages]
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def malform(text: str, kind: str) -> str:
+    """Damage a JSON reply the way small models do."""
+    if kind == "truncate": return text[:max(1, int(len(text) * 0.7))]
+    if kind == "trailing_comma": return re.sub(r"\}\s*$", ",}", re.sub(r"\]", ",]", text, count=1))
+    if kind == "single_quotes": return text.replace('"', "'")
+    if kind == "prose": return f"Sure! Here is the order summary:\n{text}\nLet me know if anything is wrong."
+    if kind == "unquoted_keys": return re.sub(r'"(\w+)":', r"\1:", text)
+    return text
+
+class MockOllama:
+    def __init__(self, ttft_s: float = DEFAULT_TTFT_S, tokens_per_s: float = DEFAULT_TOKENS_PER_S,
+                 reply_tokens: int = DEFAULT_REPLY_TOKENS, models=DEFAULT_MODELS, menu_file: Optional[str] = None,
+                 jitter: float = 0.0, script: Optional[List[Dict[str, str]]] = None,
+                 replay: Optional[Dict[str, str]] = None, error_rate: float = 0.0, stream_error_rate: float = 0.0,
+                 malformed_rate: float = 0.0, seed: Optional[int] = None,
+                 upstream: Optional[str] = None, record_file: Optional[str] = None, format_support: str = "schema"):
+        self.ttft_s = ttft_s
+        self.tokens_per_s = tokens_per_s
+        self.reply_tokens = reply_tokens
+        self.models = list(models)
+        self.menu_file = menu_file or os.path.join(os.path.dirname(os.path.abspath(__file__)), "menu.json")
+        self.jitter = jitter
+        self.script = [(re.compile(rule["match"], re.IGNORECASE), rule["reply"]) for rule in (script or [])]
+        self.replay = dict(replay or {})
+        self.error_rate = error_rate
+        self.stream_error_rate = stream_error_rate
+        self.malformed_rate = malformed_rate
+        self.upstream = upstream.rstrip("/") if upstream else None
+        self.record_file = record_file
+        if format_support not in FORMAT_SUPPORT: raise ValueError(f"format_support must be one of {FORMAT_SUPPORT}")
+        self.format_support = format_support
+        self._rng = random.Random(seed)
+        self._index = None
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "replayed": 0, "scripted": 0, "recorded": 0, "errors_injected": 0,
+                      "stream_errors_injected": 0, "malformed_injected": 0, "constrained": 0, "format_rejected": 0,
+                      "format_ignored": 0}
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
+
+    def count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def chance(self, rate: float) -> bool:
+        if rate <= 0: return False
+        with self._lock:
+            return self._rng.random() < rate
+
+    def _menu_index(self):
+        with self._lock:
+            if self._index is None:
+                from menu_index import build_menu_index
+                with open(self.menu_file, "r", encoding="utf-8") as f:
+                    self._index = build_menu_index(json.load(f))
+            return self._index
+
+    # ---------- Replies ----------
+    def reply_text(self, model: Optional[str], messages: List[Dict[str, str]]) -> str:
+        last = (messages[-1].get("content") or "") if messages else ""
+        replayed = self.replay.get(exchange_key(model, messages))
+        if replayed is not None:
+            self.count("replayed")
+            return replayed
+        for pattern, reply in self.script:
+            if pattern.search(last):
+                self.count("scripted")
+                return reply
+        if self.upstream:
+            return self._record(model, messages)
+        if "JSON" in last:
+            from order_parser import extract_order
+            order, _ = extract_order(messages, self._menu_index())
+            return json.dumps(order)
+        words = [CHAT_WORDS[i % len(CHAT_WORDS)] for i in range(self.reply_tokens)]
+        return " ".join(words)
+
+    def _record(self, model: Optional[str], messages: List[Dict[str, str]]) -> str:
+        r = requests.post(f"{self.upstream}/api/chat", json={"model": model, "messages": messages, "stream": False},
+                          timeout=(3.05, 300))
+        r.raise_for_status()
+        reply = str(r.json().get("message", {}).get("content", ""))
+        with self._lock:
+            self.replay[exchange_key(model, messages)] = reply
+            self.stats["recorded"] += 1
+            if self.record_file:
+                with open(self.record_file, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"model": model, "messages": messages, "reply": reply},
+                                       ensure_ascii=False) + "\n")
+        return reply
+
+    def maybe_malform(self, text: str, messages: List[Dict[str, str]]) -> str:
+        asked_json = bool(messages) and "JSON" in (messages[-1].get("content") or "")
+        if not asked_json or not self.chance(self.malformed_rate): return text
+        with self._lock:
+            kind = self._rng.choice(MALFORMATIONS)
+        self.count("malformed_injected")
+        return malform(text, kind)
+
+    def chunks(self, text: str) -> List[str]:
+        """Split a reply into the pieces a stream would carry (roughly one token each)."""
+        if text.lstrip().startswith("{"):
+            return [text[i:i + 8] for i in range(0, len(text), 8)] or [""]
+        words = text.split(" ")
+        return [w + " " for w in words[:-1]] + words[-1:]
+
+    # ---------- Timing ----------
+    def _jittered(self, seconds: float) -> float:
+        if self.jitter <= 0 or seconds <= 0: return seconds
+        with self._lock:
+            return max(0.0, seconds * (1 + self._rng.uniform(-self.jitter, self.jitter)))
+
+    def ttft(self) -> float:
+        return self._jittered(self.ttft_s)
+
+    def token_delay(self) -> float:
+        return self._jittered(1.0 / self.tokens_per_s) if self.tokens_per_s > 0 else 0.0
+
+    def timings(self, messages: List[Dict[str, str]], tokens: int, ttft_s: float) -> Dict[str, Any]:
+        prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4 + 1
+        eval_ns = int(tokens / self.tokens_per_s * 1e9) if self.tokens_per_s > 0 else 0
+        ttft_ns = int(ttft_s * 1e9)
+        return {"total_duration": ttft_ns + eval_ns, "load_duration": 0, "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": ttft_ns, "eval_count": tokens, "eval_duration": eval_ns}
+
+def make_handler(mock: MockOllama):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, obj: Dict[str, Any], code: int = 200):
+            body = json.dumps(obj).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _chunk(self, obj: Dict[str, Any]):
+            line = (json.dumps(obj) + "\n").encode("utf-8")
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+            self.wfile.flush()
+
+        def do_GET(self):
+            if self.path.startswith("/api/tags"):
+                self._send_json({"models": [{"name": m, "model": m} for m in mock.models]})
+            elif self.path.startswith("/api/version"):
+                self._send_json({"version": "0.0.0-mock"})
+            elif self.path.startswith("/mock/stats"):
+                self._send_json(mock.snapshot())
+            else:
+                self._send_json({"error": "not found"}, 404)
+
+        def do_POST(self):
+            if not self.path.startswith("/api/chat"):
+                self._send_json({"error": "not found"}, 404)
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            req = json.loads(self.rfile.read(length) or b"{}")
+            model, messages = req.get("model"), req.get("messages") or []
+            mock.count("requests")
+            if model not in mock.models:
+                self._send_json({"error": f"model '{model}' not found, try pulling it first"}, 404)
+                return
+            if mock.chance(mock.error_rate):
+                mock.count("errors_injected")
+                self._send_json({"error": "mock: injected server error"}, 500)
+                return
+            fmt = req.get("format") if mock.format_support != "none" else None
+            if req.get("format") and fmt is None: mock.count("format_ignored")  # pre-JSON-mode server
+            if isinstance(fmt, dict) and mock.format_support == "json":
+                mock.count("format_rejected")
+                self._send_json({"error": "json: cannot unmarshal object into Go struct field "
+                                          "ChatRequest.format of type string"}, 400)
+                return
+            try:
+                text = mock.reply_text(model, messages)
+                if fmt: mock.count("constrained")  # constrained decoding: always well-formed
+                else: text = mock.maybe_malform(text, messages)
+            except requests.RequestException as e:
+                self._send_json({"error": f"mock: upstream failed: {e}"}, 502)
+                return
+            tokens = mock.chunks(text)
+            ttft_s = mock.ttft()
+            timings = mock.timings(messages, len(tokens), ttft_s)
+            base = {"model": model, "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+            time.sleep(ttft_s)
+            if req.get("stream", True):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                fail_at = len(tokens) // 2 if mock.chance(mock.stream_error_rate) else None
+                for i, token in enumerate(tokens):
+                    if i == fail_at:
+                        mock.count("stream_errors_injected")
+                        self._chunk({"error": "mock: injected error mid-stream"})
+                        break
+                    self._chunk(dict(base, message={"role": "assistant", "content": token}, done=False))
+                    time.sleep(mock.token_delay())
+                else:
+                    self._chunk(dict(base, message={"role": "assistant", "content": ""}, done=True,
+                                     done_reason="stop", **timings))
+                self.wfile.write(b"0\r\n\r\n")
+            else:
+                time.sleep(sum(mock.token_delay() for _ in tokens))
+                self._send_json(dict(base, message={"role": "assistant", "content": text}, done=True,
+                                     done_reason="stop", **timings))
+    return Handler
+
+def serve(mock: MockOllama, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Start the mock on a daemon thread; port 0 picks a free port (see server.server_port)."""
+    server = ThreadingHTTPServer((host, port), make_handler(mock))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-ollama", daemon=True).start()
+    return server
+
+def load_script(path: str) -> List[Dict[str, str]]:
+    """Rules file: a JSON list of {"match": "<regex on the last message>", "reply": "<text>"}."""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def load_replay(path: str) -> Dict[str, str]:
+    """Exchanges file (JSONL) as written by --record: {"model", "messages", "reply"} per line."""
+    exchanges: Dict[str, str] = {}
+    if not os.path.exists(path): return exchanges
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip(): continue
+            item = json.loads(line)
+            exchanges[exchange_key(item.get("model"), item.get("messages") or [])] = item.get("reply", "")
+    return exchanges
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Ollama server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--ttft", type=float, default=DEFAULT_TTFT_S, help="seconds before the first token")
+    parser.add_argument("--tokens-per-s", type=float, default=DEFAULT_TOKENS_PER_S)
+    parser.add_argument("--jitter", type=float, default=0.0, help="± fraction applied to every delay")
+    parser.add_argument("--reply-tokens", type=int, default=DEFAULT_REPLY_TOKENS)
+    parser.add_argument("--models", default=",".join(DEFAULT_MODELS), help="comma-separated model names")
+    parser.add_argument("--script", default=None, help="JSON rules file of {match, reply}")
+    parser.add_argument("--replay", default=None, help="JSONL exchanges to replay (see --record)")
+    parser.add_argument("--record", default=None, help="append exchanges answered by --upstream to this JSONL")
+    parser.add_argument("--upstream", default=None, help="real Ollama to forward unmatched requests to")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of chats answered with HTTP 500")
+    parser.add_argument("--stream-error-rate", type=float, default=0.0,
+                        help="fraction of streams that fail half-way with an error chunk")
+    parser.add_argument("--malformed-rate", type=float, default=0.0,
+                        help="fraction of JSON summaries returned damaged")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--format-support", choices=FORMAT_SUPPORT, default="schema",
+                        help="emulate servers without schema (json) or without any `format` support (none)")
+    args = parser.parse_args()
+    mock = MockOllama(
+        ttft_s=args.ttft, tokens_per_s=args.tokens_per_s, reply_tokens=args.reply_tokens,
+        models=[m.strip() for m in args.models.split(",") if m.strip()], jitter=args.jitter,
+        script=load_script(args.script) if args.script else None,
+        replay=load_replay(args.replay or args.record) if (args.replay or args.record) else None,
+        error_rate=args.error_rate, stream_error_rate=args.stream_error_rate, malformed_rate=args.malformed_rate,
+        seed=args.seed, upstream=args.upstream, record_file=args.record, format_support=args.format_support,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(mock))
+    print(f"Mock Ollama listening on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
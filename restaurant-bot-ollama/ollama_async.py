@@ -0,0 +1,80 @@
+# Asyncio Ollama client and a background event loop to drive it from Streamlit.
+#
+# Streamlit runs each rerun synchronously in its script thread, so a model call
+# there blocks the page. BackgroundLoop owns one event loop on a daemon thread;
+# script code submits coroutines to it and gets a concurrent.futures.Future back,
+# which lets work such as the order-summary extraction run while the customer is
+# still reading or typing, and be collected later (or abandoned) by a rerun.
+import asyncio
+import json
+import threading
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Optional
+
+import httpx
+
+from ollama_client import DEFAULT_CONNECT_TIMEOUT, DEFAULT_POOL_SIZE, DEFAULT_READ_TIMEOUT
+
+class AsyncOllamaClient:
+    def __init__(self, base_url: str, pool_size: int = DEFAULT_POOL_SIZE,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT, read_timeout: float = DEFAULT_READ_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        # Keep-alive pool like OllamaClient; the client binds to the loop that first uses it.
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        )
+
+    def _timeout(self, read_timeout: Optional[float]) -> httpx.Timeout:
+        return httpx.Timeout(self.read_timeout if read_timeout is None else read_timeout, connect=self.connect_timeout)
+
+    async def tags(self, read_timeout: Optional[float] = 5) -> Dict[str, Any]:
+        r = await self.client.get("/api/tags", timeout=self._timeout(read_timeout))
+        r.raise_for_status()
+        return r.json()
+
+    async def chat(self, model: str, messages: List[Dict[str, str]], read_timeout: Optional[float] = None,
+                   **extra) -> Dict[str, Any]:
+        """POST /api/chat without streaming; returns the decoded final response."""
+        payload = {"model": model, "messages": messages, "stream": False, **extra}
+        r = await self.client.post("/api/chat", json=payload, timeout=self._timeout(read_timeout))
+        r.raise_for_status()
+        return r.json()
+
+    async def stream_chat(self, model: str, messages: List[Dict[str, str]], read_timeout: Optional[float] = None,
+                          **extra) -> AsyncIterator[Dict[str, Any]]:
+        """POST /api/chat with streaming; yields each NDJSON chunk until the done chunk."""
+        payload = {"model": model, "messages": messages, "stream": True, **extra}
+        async with self.client.stream("POST", "/api/chat", json=payload, timeout=self._timeout(read_timeout)) as r:
+            if r.is_error:
+                await r.aread()  # so the caller can read the error body off the exception
+            r.raise_for_status()
+            async for line in r.aiter_lines():
+                if not line: continue
+                data = json.loads(line)
+                yield data
+                if data.get("done") or data.get("error"): break
+
+    async def aclose(self):
+        await self.client.aclose()
+
+class BackgroundLoop:
+    def __init__(self, name: str = "ollama-async"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro: Awaitable[Any]) -> Future:
+        """Schedule a coroutine on the loop; safe to call from any thread."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the loop and block the calling thread for its result."""
+        return self.submit(coro).result(timeout)
@@ -0,0 +1,61 @@
+# Shared, pooled HTTP client for all Ollama traffic.
+#
+# One OllamaClient wraps a requests.Session with a sized urllib3 connection pool,
+# so chat turns, health checks and scripts reuse keep-alive connections to the
+# Ollama host instead of opening a fresh TCP (and TLS) connection per request.
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_READ_TIMEOUT = 120.0
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+
+Timeout = Union[float, Tuple[float, float]]
+
+class OllamaClient:
+    def __init__(self, base_url: str, pool_size: int = DEFAULT_POOL_SIZE,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT, read_timeout: float = DEFAULT_READ_TIMEOUT,
+                 retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_BACKOFF):
+        self.base_url = base_url.rstrip("/")
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        # Only retry failures to connect: the request never reached Ollama, so
+        # replaying a POST cannot start a second generation.
+        retry = Retry(total=retries, connect=retries, read=0, status=0, other=0,
+                      backoff_factor=backoff, allowed_methods=None, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry, pool_block=False)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _timeout(self, read_timeout: Optional[float]) -> Tuple[float, float]:
+        return (self.connect_timeout, self.read_timeout if read_timeout is None else read_timeout)
+
+    def get(self, path: str, read_timeout: Optional[float] = None, **kwargs) -> requests.Response:
+        return self.session.get(f"{self.base_url}{path}", timeout=self._timeout(read_timeout), **kwargs)
+
+    def post(self, path: str, payload: Dict[str, Any], read_timeout: Optional[float] = None,
+             stream: bool = False, **kwargs) -> requests.Response:
+        return self.session.post(f"{self.base_url}{path}", json=payload, timeout=self._timeout(read_timeout),
+                                 stream=stream, **kwargs)
+
+    def tags(self, read_timeout: Optional[float] = 5) -> Dict[str, Any]:
+        r = self.get("/api/tags", read_timeout=read_timeout)
+        r.raise_for_status()
+        return r.json()
+
+    def chat(self, model: str, messages: List[Dict[str, str]], stream: bool = False,
+             read_timeout: Optional[float] = None, **extra) -> requests.Response:
+        """POST /api/chat. With stream=True the caller must consume/close the response."""
+        payload = {"model": model, "messages": messages, "stream": stream, **extra}
+        r = self.post("/api/chat", payload, read_timeout=read_timeout, stream=stream)
+        r.raise_for_status()
+        return r
+
+    def close(self):
+        self.session.close()
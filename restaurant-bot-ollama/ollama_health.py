@@ -0,0 +1,66 @@
+# Background Ollama health monitor.
+#
+# A daemon thread probes GET /api/tags on an interval and caches the outcome,
+# so UI code reads the last known status, model list and latency instantly
+# instead of blocking a Streamlit rerun on a network call.
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+from ollama_client import OllamaClient
+
+DEFAULT_INTERVAL = 10.0
+PROBE_TIMEOUT = 5.0
+
+class HealthMonitor:
+    def __init__(self, client: OllamaClient, interval: float = DEFAULT_INTERVAL):
+        self.client = client
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._status: Dict[str, Any] = {"online": None, "models": [], "latency_ms": None,
+                                        "status_code": None, "error": None, "checked_at": None}
+
+    def start(self) -> "HealthMonitor":
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="ollama-health", daemon=True)
+                self._thread.start()
+        return self
+
+    def probe_now(self):
+        """Ask the background thread to probe immediately (non-blocking)."""
+        self._wake.set()
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._status)
+
+    def models(self) -> List[str]:
+        with self._lock:
+            return list(self._status["models"])
+
+    def _run(self):
+        while True:
+            self._probe()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def _probe(self):
+        started = time.perf_counter()
+        status: Dict[str, Any] = {"checked_at": time.time()}
+        try:
+            r = self.client.get("/api/tags", read_timeout=PROBE_TIMEOUT)
+            status["latency_ms"] = (time.perf_counter() - started) * 1000
+            status["online"] = r.status_code == 200
+            status["status_code"] = r.status_code
+            status["error"] = None
+            if status["online"]:
+                status["models"] = [m.get("name") for m in r.json().get("models", []) if m.get("name")]
+        except Exception as e:
+            status.update(online=False, latency_ms=None, status_code=None, error=str(e))
+        with self._lock:
+            if "models" not in status:
+                status["models"] = self._status["models"]  # keep the last known list while offline
+            self._status = status
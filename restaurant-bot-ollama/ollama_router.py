@@ -0,0 +1,171 @@
+# Multi-backend routing for Ollama chat calls.
+#
+# OllamaRouter spreads requests over several Ollama hosts. Each request goes to
+# the healthy backend with the fewest outstanding requests (ties broken by recent
+# failures, then an EWMA of observed latency) or, with policy="latency", the lowest
+# latency * (outstanding + 1). A per-backend circuit breaker ejects a host after
+# consecutive failures and lets a single trial request through once its cool-down
+# has passed or its background health probe succeeds. Connection failures,
+# timeouts and 5xx/404 answers fail over to the next backend before any bytes
+# have reached the caller.
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List, Optional, Sequence, Tuple, Union
+
+import requests
+
+from ollama_client import OllamaClient
+from ollama_health import HealthMonitor
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_RESET_TIMEOUT = 30.0
+EWMA_ALPHA = 0.3
+FAILOVER_STATUS = {404, 500, 502, 503, 504}
+
+def parse_endpoints(value: Union[str, Sequence[str], None]) -> Tuple[str, ...]:
+    """Accept a list of URLs or a comma-separated string; drop blanks and duplicates."""
+    items = value.split(",") if isinstance(value, str) else list(value or [])
+    seen: List[str] = []
+    for url in (str(u).strip().rstrip("/") for u in items):
+        if url and url not in seen: seen.append(url)
+    return tuple(seen)
+
+class Backend:
+    def __init__(self, url: str, client: OllamaClient, monitor: Optional[HealthMonitor]):
+        self.url = url
+        self.client = client
+        self.monitor = monitor
+        self.outstanding = 0
+        self.latency_s: Optional[float] = None  # EWMA of successful request latency
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.requests = 0
+        self.errors = 0
+
+    def available(self, now: float, reset_timeout: float) -> bool:
+        if self.state == CLOSED: return True
+        if self.state == OPEN:
+            probe = self.monitor.status() if self.monitor else {}
+            recovered = probe.get("online") and (probe.get("checked_at") or 0) > self.opened_at
+            if now - self.opened_at >= reset_timeout or recovered:
+                self.state = HALF_OPEN
+                self.trial_in_flight = False
+            else:
+                return False
+        return not self.trial_in_flight  # half-open: one trial request at a time
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"url": self.url, "state": self.state, "outstanding": self.outstanding,
+                "latency_ms": None if self.latency_s is None else self.latency_s * 1000,
+                "requests": self.requests, "errors": self.errors}
+
+class OllamaRouter:
+    def __init__(self, urls: Sequence[str], policy: str = "least_outstanding",
+                 failure_threshold: int = DEFAULT_FAILURE_THRESHOLD, reset_timeout: float = DEFAULT_RESET_TIMEOUT,
+                 client_kwargs: Optional[Dict[str, Any]] = None, health_interval: Optional[float] = None):
+        if not urls: raise ValueError("OllamaRouter needs at least one endpoint")
+        self.policy = policy
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.backends: List[Backend] = []
+        for url in urls:
+            monitor = None
+            if health_interval:
+                monitor = HealthMonitor(OllamaClient(url, pool_size=1, retries=0), interval=health_interval).start()
+            self.backends.append(Backend(url, OllamaClient(url, **(client_kwargs or {})), monitor))
+
+    # ---------- Selection ----------
+    def _score(self, b: Backend) -> Tuple[float, ...]:
+        latency = b.latency_s if b.latency_s is not None else 0.0
+        if self.policy == "latency":
+            return (latency * (b.outstanding + 1), b.failures)
+        return (b.outstanding, b.failures, latency)
+
+    def acquire(self, exclude: Sequence[Backend] = (), prefer: Optional[str] = None) -> Optional[Backend]:
+        """Reserve the best available backend (None if all are ejected); pair with release()."""
+        now = time.time()
+        with self._lock:
+            candidates = [b for b in self.backends if b not in exclude and b.available(now, self.reset_timeout)]
+            if not candidates: return None
+            best = min(candidates, key=self._score)
+            # Stick to the session's previous backend (warm KV cache) unless it is clearly busier.
+            preferred = next((b for b in candidates if b.url == prefer), None)
+            if preferred is not None and preferred.outstanding <= best.outstanding + 1:
+                best = preferred
+            best.outstanding += 1
+            best.requests += 1
+            if best.state == HALF_OPEN: best.trial_in_flight = True
+            return best
+
+    def release(self, b: Backend, ok: bool, elapsed: Optional[float]):
+        with self._lock:
+            b.outstanding -= 1
+            b.trial_in_flight = False
+            if ok:
+                b.state, b.failures = CLOSED, 0
+                if elapsed is not None:
+                    b.latency_s = elapsed if b.latency_s is None else (1 - EWMA_ALPHA) * b.latency_s + EWMA_ALPHA * elapsed
+            else:
+                b.errors += 1
+                b.failures += 1
+                if b.state == HALF_OPEN or b.failures >= self.failure_threshold:
+                    b.state, b.opened_at = OPEN, time.time()
+
+    # ---------- Requests ----------
+    @contextmanager
+    def chat(self, model: str, messages: List[Dict[str, str]], stream: bool = False,
+             read_timeout: Optional[float] = None, prefer: Optional[str] = None, **extra) -> Iterator[requests.Response]:
+        """POST /api/chat on the best backend, failing over until one answers. Yields the response;
+        `response.backend_url` tells which host served it."""
+        tried: List[Backend] = []
+        last_error: Optional[Exception] = None
+        while True:
+            backend = self.acquire(tried, prefer)
+            if backend is None:
+                if last_error is not None: raise last_error
+                raise requests.exceptions.ConnectionError("All Ollama backends are unavailable (circuit open)")
+            tried.append(backend)
+            started = time.perf_counter()
+            try:
+                r = backend.client.chat(model, messages, stream=stream, read_timeout=read_timeout, **extra)
+            except requests.exceptions.HTTPError as e:
+                status = e.response.status_code if e.response is not None else 0
+                self.release(backend, ok=status < 500, elapsed=None)
+                if status in FAILOVER_STATUS:
+                    last_error = e
+                    continue
+                raise
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self.release(backend, ok=False, elapsed=None)
+                last_error = e
+                continue
+            break
+        r.backend_url = backend.url
+        ok = False
+        try:
+            with r:
+                yield r
+            ok = True
+        finally:
+            self.release(backend, ok=ok, elapsed=time.perf_counter() - started if ok else None)
+
+    # ---------- Introspection ----------
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [b.snapshot() for b in self.backends]
+
+    def models(self) -> List[str]:
+        names: List[str] = []
+        for b in self.backends:
+            for name in (b.monitor.models() if b.monitor else []):
+                if name not in names: names.append(name)
+        return names
+
+    def health(self) -> List[Dict[str, Any]]:
+        return [dict(b.monitor.status(), url=b.url) if b.monitor else {"url": b.url, "online": None}
+                for b in self.backends]
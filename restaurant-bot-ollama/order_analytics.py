@@ -0,0 +1,271 @@
+# Typed SQLite store for order reporting, fed from the order journal.
+#
+# The journal (order_store.py) stays the source of truth; this is a derived,
+# rebuildable copy with proper column types (epoch ints, integer cents) and the
+# indexes and daily rollups the reports need. OrderAnalytics.sync() tails the
+# journal like SalesStats does, only reading bytes appended since the last
+# sync, and is idempotent per order line, so a compacted or re-read journal
+# does not double count. Reports read the rollups (one row per day and item, or per day
+# and delivery method), so they stay in the milliseconds at millions of lines.
+#
+#   python order_analytics.py sync    [journal]          # ingest new journal rows
+#   python order_analytics.py migrate <legacy.csv> [journal]   # one-shot import of the old orders.csv
+#   python order_analytics.py report  [journal]          # print every report as JSON
+import csv
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+import order_store
+from order_store import DEFAULT_JOURNAL, ORDER_COLUMNS, SCHEMA_VERSION
+
+READ_CHUNK = 8 * 1024 * 1024   # journal bytes parsed per transaction
+_COL = {name: i for i, name in enumerate(ORDER_COLUMNS)}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS orders (
+    order_id TEXT PRIMARY KEY,
+    ts INTEGER NOT NULL,
+    day TEXT NOT NULL,                 -- local YYYY-MM-DD of ts
+    delivery_method TEXT NOT NULL,
+    address TEXT NOT NULL,
+    notes TEXT NOT NULL,
+    total_cents INTEGER NOT NULL,
+    lines INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS orders_ts ON orders (ts);
+CREATE TABLE IF NOT EXISTS order_lines (
+    order_id TEXT NOT NULL,
+    line_no INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size TEXT NOT NULL,
+    qty INTEGER NOT NULL,
+    unit_cents INTEGER NOT NULL,
+    line_cents INTEGER NOT NULL,
+    PRIMARY KEY (order_id, line_no)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS order_lines_name ON order_lines (name);
+CREATE TABLE IF NOT EXISTS daily_sales (
+    day TEXT NOT NULL,
+    delivery_method TEXT NOT NULL,
+    orders INTEGER NOT NULL,
+    revenue_cents INTEGER NOT NULL,
+    PRIMARY KEY (day, delivery_method)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS daily_items (
+    day TEXT NOT NULL,
+    type TEXT NOT NULL,
+    name TEXT NOT NULL,
+    qty INTEGER NOT NULL,
+    revenue_cents INTEGER NOT NULL,
+    PRIMARY KEY (day, type, name)
+) WITHOUT ROWID;
+"""
+
+def _cents(value: str) -> int:
+    whole, _, frac = value.partition(".")
+    if len(frac) == 2 and frac.isdigit() and whole.lstrip("-").isdigit():
+        return int(whole + frac)  # the journal's own "12.95" format
+    try:
+        return int((Decimal(value) * 100).to_integral_value())
+    except (InvalidOperation, ValueError):
+        return 0
+
+def _day(ts: int) -> str:
+    return time.strftime("%Y-%m-%d", time.localtime(ts))
+
+class OrderAnalytics:
+    def __init__(self, journal_path: str = DEFAULT_JOURNAL, db_path: Optional[str] = None):
+        self.journal_path = journal_path
+        self.db_path = db_path or f"{journal_path}.analytics.sqlite3"
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        self._db.execute("INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                         (key, value))
+
+    # ---------- Ingest ----------
+    def sync(self) -> int:
+        """Ingest journal rows appended since the last sync. Returns the number of new orders."""
+        with self._lock:
+            try:
+                st = os.stat(self.journal_path)
+            except FileNotFoundError:
+                return 0
+            ident = f"{st.st_dev}:{st.st_ino}"
+            offset = int(self._meta("offset") or 0)
+            if ident != self._meta("ident") or st.st_size < offset:
+                offset = 0  # rotated or compacted: re-read; orders already stored are skipped
+            added = 0
+            with open(self.journal_path, "rb") as f:
+                f.seek(offset)
+                while offset < st.st_size:
+                    chunk = f.read(min(READ_CHUNK, st.st_size - offset))
+                    end = chunk.rfind(b"\n") + 1  # never consume a half-written row
+                    if end == 0: break
+                    f.seek(offset + end)
+                    rows = csv.reader(chunk[:end].decode("utf-8", errors="replace").splitlines())
+                    self._db.execute("BEGIN")
+                    try:
+                        added += self._ingest(rows)
+                        offset += end
+                        self._set_meta("offset", str(offset))
+                        self._set_meta("ident", ident)
+                        self._db.execute("COMMIT")
+                    except BaseException:
+                        self._db.execute("ROLLBACK")
+                        raise
+            return added
+
+    def _select_in(self, sql: str, keys: List[str], batch: int = 500) -> Iterator[Any]:
+        for i in range(0, len(keys), batch):
+            part = keys[i:i + batch]
+            for row in self._db.execute(sql.format(",".join("?" * len(part))), part):
+                yield row[0] if len(row) == 1 else row
+
+    def _ingest(self, rows: Iterable[List[str]]) -> int:
+        # A chunk can end inside an order's block, so dedupe per line, not per order:
+        # the rest of that order arrives with the next chunk and is added to it.
+        orders: Dict[str, Tuple[Any, ...]] = {}
+        lines: Dict[Tuple[str, int], Tuple[Any, ...]] = {}
+        for row in rows:
+            if len(row) != len(ORDER_COLUMNS) or row[0] != str(SCHEMA_VERSION): continue  # header or torn row
+            try:
+                order_id, ts, line_no, qty = row[_COL["order_id"]], int(row[_COL["timestamp"]]), \
+                    int(row[_COL["line_no"]]), int(row[_COL["qty"]])
+            except ValueError:
+                continue
+            if order_id not in orders:
+                orders[order_id] = (order_id, ts, _day(ts), row[_COL["delivery_method"]].lower(),
+                                    row[_COL["address"]], row[_COL["notes"]], _cents(row[_COL["order_total"]]))
+            lines[(order_id, line_no)] = (order_id, line_no, row[_COL["type"]], row[_COL["name"]], row[_COL["size"]],
+                                          qty, _cents(row[_COL["unit_price"]]), _cents(row[_COL["line_total"]]))
+        if not orders: return 0
+        ids = list(orders)
+        known = set(self._select_in("SELECT order_id FROM orders WHERE order_id IN ({})", ids))
+        stored = set(self._select_in("SELECT order_id, line_no FROM order_lines WHERE order_id IN ({})", list(known)))
+        new_lines = [l for key, l in lines.items() if key not in stored]
+        counts: Dict[str, int] = {}
+        for l in new_lines: counts[l[0]] = counts.get(l[0], 0) + 1
+        new_orders = [orders[i] + (counts.get(i, 0),) for i in ids if i not in known]
+        self._db.executemany("INSERT INTO orders VALUES (?, ?, ?, ?, ?, ?, ?, ?)", new_orders)
+        self._db.executemany("INSERT INTO order_lines VALUES (?, ?, ?, ?, ?, ?, ?, ?)", new_lines)
+        self._db.executemany("UPDATE orders SET lines = lines + ? WHERE order_id = ?",
+                             [(counts[i], i) for i in known if counts.get(i)])
+
+        sales: Dict[Tuple[str, str], List[int]] = {}
+        for o in new_orders:
+            s = sales.setdefault((o[2], o[3]), [0, 0])
+            s[0] += 1
+            s[1] += o[6]
+        items: Dict[Tuple[str, str, str], List[int]] = {}
+        for l in new_lines:
+            i = items.setdefault((orders[l[0]][2], l[2], l[3]), [0, 0])
+            i[0] += l[5]
+            i[1] += l[7]
+        self._db.executemany(
+            "INSERT INTO daily_sales VALUES (?, ?, ?, ?) ON CONFLICT(day, delivery_method) DO UPDATE SET "
+            "orders = orders + excluded.orders, revenue_cents = revenue_cents + excluded.revenue_cents",
+            [(day, method, n, cents) for (day, method), (n, cents) in sales.items()])
+        self._db.executemany(
+            "INSERT INTO daily_items VALUES (?, ?, ?, ?, ?) ON CONFLICT(day, type, name) DO UPDATE SET "
+            "qty = qty + excluded.qty, revenue_cents = revenue_cents + excluded.revenue_cents",
+            [(day, kind, name, qty, cents) for (day, kind, name), (qty, cents) in items.items()])
+        return len(new_orders)
+
+    # ---------- Reports ----------
+    def _query(self, sql: str, params: Tuple[Any, ...] = ()) -> List[Dict[str, Any]]:
+        with self._lock:
+            cur = self._db.execute(sql, params)
+            names = [d[0] for d in cur.description]
+            return [dict(zip(names, row)) for row in cur.fetchall()]
+
+    def recent_orders(self, n: int = 10) -> List[Dict[str, Any]]:
+        """Newest orders first, one row per order with its items joined into a single column."""
+        return self._query(
+            "SELECT o.order_id, datetime(o.ts, 'unixepoch', 'localtime') AS time, o.delivery_method, "
+            "(SELECT group_concat(l.qty || '× ' || l.name || CASE WHEN l.size != '' THEN ' (' || l.size || ')' "
+            "ELSE '' END, ', ') FROM order_lines l WHERE l.order_id = o.order_id) AS items, "
+            "o.total_cents / 100.0 AS total, o.address, o.notes "
+            "FROM (SELECT * FROM orders ORDER BY ts DESC LIMIT ?) o ORDER BY o.ts DESC", (n,))
+
+    def revenue_by_day(self, days: int = 30) -> List[Dict[str, Any]]:
+        return self._query(
+            "SELECT day, SUM(orders) AS orders, SUM(revenue_cents) / 100.0 AS revenue FROM daily_sales "
+            "WHERE day >= date('now', 'localtime', ?) GROUP BY day ORDER BY day", (f"-{int(days) - 1} days",))
+
+    def top_items(self, n: int = 10, days: Optional[int] = None) -> List[Dict[str, Any]]:
+        where, params = ("WHERE day >= date('now', 'localtime', ?)", (f"-{int(days) - 1} days",)) if days else ("", ())
+        return self._query(
+            f"SELECT type, name AS item, SUM(qty) AS qty, SUM(revenue_cents) / 100.0 AS revenue FROM daily_items "
+            f"{where} GROUP BY type, name ORDER BY qty DESC, revenue DESC LIMIT ?", params + (n,))
+
+    def delivery_split(self, days: Optional[int] = None) -> List[Dict[str, Any]]:
+        where, params = ("WHERE day >= date('now', 'localtime', ?)", (f"-{int(days) - 1} days",)) if days else ("", ())
+        return self._query(
+            f"SELECT CASE WHEN delivery_method = '' THEN 'unknown' ELSE delivery_method END AS delivery_method, "
+            f"SUM(orders) AS orders, SUM(revenue_cents) / 100.0 AS revenue FROM daily_sales {where} "
+            f"GROUP BY 1 ORDER BY orders DESC", params)
+
+    def counts(self) -> Dict[str, int]:
+        row = self._query("SELECT (SELECT COUNT(*) FROM orders) AS orders, (SELECT COUNT(*) FROM order_lines) AS lines")
+        return row[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+# ---------- Migration ----------
+def migrate(legacy_path: str, journal_path: str = DEFAULT_JOURNAL) -> Dict[str, Any]:
+    """One-shot import of the old free-form orders.csv (mixed epoch/ISO timestamps, "$" prices):
+    normalized into the journal by order_store.migrate_legacy, then ingested. Safe to run twice:
+    migrate_legacy skips orders the journal already has."""
+    analytics = OrderAnalytics(journal_path)
+    try:
+        imported = order_store.migrate_legacy(legacy_path, journal_path)
+        analytics.sync()
+        return {"imported_orders": imported, **analytics.counts()}
+    finally:
+        analytics.close()
+
+# ---------- CLI ----------
+def _main(argv: List[str]) -> int:
+    if not argv or argv[0] not in ("sync", "migrate", "report"):
+        print("usage: python order_analytics.py sync [journal] | migrate <legacy.csv> [journal] | report [journal]")
+        return 2
+    cmd, args = argv[0], argv[1:]
+    if cmd == "migrate":
+        if not args:
+            print("migrate needs the legacy CSV path")
+            return 2
+        print(json.dumps(migrate(args[0], *(args[1:2] or [DEFAULT_JOURNAL]))))
+        return 0
+    analytics = OrderAnalytics(*(args[:1] or [DEFAULT_JOURNAL]))
+    started = time.perf_counter()
+    added = analytics.sync()
+    if cmd == "sync":
+        print(json.dumps({"new_orders": added, "seconds": round(time.perf_counter() - started, 3), **analytics.counts()}))
+    else:
+        print(json.dumps({"recent_orders": analytics.recent_orders(), "revenue_by_day": analytics.revenue_by_day(),
+                          "top_items": analytics.top_items(), "delivery_split": analytics.delivery_split()},
+                         indent=2, default=str))
+    analytics.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
@@ -0,0 +1,207 @@
+# Deterministic, rule-based order extraction from the chat transcript.
+#
+# Scans customer messages for menu vocabulary (names, aliases, plurals from the
+# compiled MenuIndex), quantities and sizes, and folds them into the same order
+# dict shape JSON_ORDER_SCHEMA_INSTRUCTION asks the model for. Each result comes
+# with a confidence score; callers only fall back to the LLM when it is low.
+import re
+import threading
+import weakref
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+
+from menu_index import CATEGORIES, CATEGORY_NOUNS, MenuIndex, MenuItem, normalize_name, normalize_size
+from menu_match import SUGGEST_SCORE, matcher_for
+
+FAST_PATH_CONFIDENCE = 0.8
+MAX_LINE_QTY = 99
+
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "single": 1, "two": 2, "couple": 2, "pair": 2, "three": 3, "four": 4,
+    "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "dozen": 12,
+}
+SIZE_WORDS = {"small": "S", "medium": "M", "large": "L", "regular": "REG", "xl": "XL"}
+REMOVE_WORDS = {"no", "not", "dont", "remove", "cancel", "forget", "without", "drop", "minus", "skip"}
+MORE_WORDS = {"more", "another"}    # "one more pepperoni", "another coke": add to the line
+TOPPING_CUES = {"extra", "add", "with", "topping", "toppings", "plus", "and"}
+CHANGE_WORDS = {"instead", "change", "actually", "swap", "replace", "half", "make"}
+STOP_WORDS = {
+    "i", "id", "im", "want", "would", "like", "to", "order", "get", "have", "please", "and", "the", "of", "for",
+    "me", "can", "could", "also", "with", "some", "too", "yes", "yeah", "ok", "okay", "that", "it", "is", "be",
+    "will", "thanks", "thank", "you", "hi", "hello", "hey", "size", "pickup", "pick", "up", "delivery", "deliver",
+    "my", "address", "in", "on", "at", "a", "an", "just", "all", "thats", "order", "total", "much", "how",
+    "what", "do", "does", "are", "there", "any", "your", "menu", "great", "good", "sounds", "perfect", "sure",
+}
+_WORD = re.compile(r"[a-z0-9]+")
+_ADDRESS = re.compile(r"(?:address is|deliver(?:ed)? to|delivery to|send (?:it )?to)\s*:?\s*(.+?)(?:[.!?]\s|$)",
+                      re.IGNORECASE)
+# Category preference when a phrase names items in several categories.
+_PRIORITY = ["pizzas", "sides", "drinks", "toppings"]
+
+class Mention(NamedTuple):
+    category: str
+    item: MenuItem
+    qty: int
+    size: Optional[str]
+    remove: bool
+    more: bool                        # add qty to a matching line instead of setting it
+
+class ParsedMessage(NamedTuple):
+    mentions: List[Mention]
+    size_only: Optional[str]          # message was just a size answer ("large please")
+    delivery_method: Optional[str]
+    address: Optional[str]
+    penalty: float                    # confidence lost to things we could not interpret
+
+class PhraseTable:
+    """Normalized menu phrases -> {category: MenuItem}, longest phrase first."""
+    def __init__(self, index: MenuIndex):
+        self.index = index
+        self.phrases: Dict[Tuple[str, ...], Dict[str, MenuItem]] = {}
+        for (category, key), item in index.items.items():
+            self.phrases.setdefault(tuple(key.split()), {})[category] = item
+        self.max_len = max((len(p) for p in self.phrases), default=1)
+
+    def longest(self, words: List[str], start: int) -> Tuple[int, Optional[Dict[str, MenuItem]]]:
+        for n in range(min(self.max_len, len(words) - start), 0, -1):
+            hit = self.phrases.get(tuple(words[start:start + n]))
+            if hit: return n, hit
+        return 0, None
+
+_tables: "weakref.WeakKeyDictionary[MenuIndex, PhraseTable]" = weakref.WeakKeyDictionary()
+_tables_lock = threading.Lock()
+
+def phrase_table_for(index: MenuIndex) -> PhraseTable:
+    with _tables_lock:
+        table = _tables.get(index)
+        if table is None:
+            table = _tables[index] = PhraseTable(index)
+        return table
+
+def _quantity(word: str) -> Optional[int]:
+    if word.isdigit() and 0 < int(word) < 100: return int(word)
+    return NUMBER_WORDS.get(word)
+
+def parse_message(text: str, table: PhraseTable) -> ParsedMessage:
+    raw = _WORD.findall(text.lower().replace("'", "").replace("’", ""))
+    words = [normalize_name(w) or w for w in raw]
+    mentions: List[Mention] = []
+    penalty = 0.0
+    consumed = [False] * len(words)
+    i = 0
+    while i < len(words):
+        n, hit = table.longest(words, i)
+        if not hit:
+            i += 1
+            continue
+        before = words[max(0, i - 4):i]
+        # Quantity and size may precede the name in any order: "2 large", "a large", "large 2".
+        qty, size, more = None, None, False
+        used = 0  # words of `before` read as quantity, size or "more"
+        for w in reversed(before):
+            if size is None and w in SIZE_WORDS: size = SIZE_WORDS[w]; used += 1; continue
+            if not more and w in MORE_WORDS: more = True; used += 1; continue
+            if qty is None and _quantity(w) is not None: qty = _quantity(w); used += 1; continue
+            break
+        after = words[i + n:i + n + 1]
+        trailing_size = size is None and bool(after) and after[0] in SIZE_WORDS
+        if trailing_size:
+            size = SIZE_WORDS[after[0]]
+        remove = any(w in REMOVE_WORDS for w in words[max(0, i - 3):i])
+        if "toppings" in hit and (len(hit) == 1 or any(w in TOPPING_CUES for w in before[-2:])) \
+                and not (len(hit) > 1 and qty and qty > 1):
+            category = "toppings"
+        else:
+            category = next(c for c in _PRIORITY if c in hit)
+        mentions.append(Mention(category, hit[category], qty or 1, size, remove, more))
+        # Only what this mention used: leftover typos and unknown nouns must still cost confidence.
+        for j in range(i - used, i + n + trailing_size):
+            consumed[j] = True
+        i += n
+
+    leftovers = [raw[j] for j, w in enumerate(words) if not consumed[j] and w not in STOP_WORDS
+                 and w not in TOPPING_CUES and w not in REMOVE_WORDS
+                 and _quantity(w) is None and w not in SIZE_WORDS and len(w) > 2]
+    if any(w in CHANGE_WORDS for w in words):
+        penalty += 0.5  # edits like "actually make that a medium" need real understanding
+    if any(w in CATEGORY_NOUNS.values() for w in leftovers):
+        penalty += 0.3  # "a bacon pizza": a pizza we could not name
+    m = _ADDRESS.search(text)
+    address = m.group(1).strip() if m else None
+    address_words = set(_WORD.findall(address.lower())) if address else set()
+    if any(not consumed[j] and w not in ("a", "an") and w not in address_words and _quantity(w) is not None
+           for j, w in enumerate(words)):
+        penalty += 0.3  # a count no item took: "a large pepperoni, 10 of them"
+    matcher = matcher_for(table.index)
+    for w in leftovers:
+        # An unconsumed word that almost matches a menu item is probably a typo we can't trust.
+        if any(SUGGEST_SCORE <= matcher.match(c, w).score < 1.0 for c in CATEGORIES):
+            penalty += 0.3
+
+    size_only = None
+    if not mentions:
+        sizes = [SIZE_WORDS[w] for w in words if w in SIZE_WORDS]
+        if len(sizes) == 1: size_only = sizes[0]
+
+    delivery = None
+    if re.search(r"\bdeliver(y|ed)?\b", text, re.IGNORECASE): delivery = "delivery"
+    if re.search(r"\b(pick ?up|pickup|collect|take ?away|carry ?out)\b", text, re.IGNORECASE): delivery = "pickup"
+    if address: delivery = "delivery"
+    return ParsedMessage(mentions, size_only, delivery, address, penalty)
+
+def empty_order() -> Dict[str, Any]:
+    return {"pizzas": [], "toppings": [], "drinks": [], "sides": [],
+            "delivery_method": None, "address": None, "notes": None}
+
+def apply_message(order: Dict[str, Any], parsed: ParsedMessage) -> None:
+    """Fold one parsed customer message into an order dict, in place."""
+    for m in parsed.mentions:
+        lines = order[m.category]
+        size = normalize_size(m.size) if m.size else None
+        same = [l for l in lines if normalize_name(l.get("name")) == m.item.key
+                and (size is None or normalize_size(l.get("size")) == size)]
+        if m.remove:
+            for l in same: lines.remove(l)
+            continue
+        if same:
+            # A repeated mention restates the line ("yes, 2 large pepperoni"); only "more" adds to it.
+            same[-1]["qty"] = min(MAX_LINE_QTY, same[-1]["qty"] + m.qty) if m.more else max(same[-1]["qty"], m.qty)
+            continue
+        line: Dict[str, Any] = {"name": m.item.name, "qty": m.qty}
+        if m.category == "toppings":
+            line["applies_to"] = "all"
+        else:
+            line["size"] = size
+        lines.append(line)
+    if parsed.size_only:
+        # Answer to "what size?": applies to the most recent sized line still missing one.
+        for category in ("pizzas", "drinks", "sides"):
+            pending = [l for l in order[category] if l.get("size") is None]
+            if pending:
+                pending[-1]["size"] = parsed.size_only
+                break
+    if parsed.delivery_method: order["delivery_method"] = parsed.delivery_method
+    if parsed.address: order["address"] = parsed.address
+
+def order_confidence(order: Dict[str, Any], index: MenuIndex, penalty: float) -> float:
+    if not any(order[c] for c in CATEGORIES): return 0.0
+    confidence = 1.0 - penalty
+    for category in ("pizzas", "drinks", "sides"):
+        for l in order[category]:
+            item = index.items.get((category, normalize_name(l["name"])))
+            if item is not None and item.sized and len(item.prices) > 1 and not l.get("size"):
+                confidence -= 0.3  # the model may have settled the size in its own reply
+    if order["delivery_method"] is None: confidence -= 0.1
+    if order["delivery_method"] == "delivery" and not order["address"]: confidence -= 0.3
+    return max(0.0, min(1.0, confidence))
+
+def extract_order(messages: List[Dict[str, str]], index: MenuIndex) -> Tuple[Dict[str, Any], float]:
+    """Build an order from the customer's messages. Returns (order, confidence in [0, 1])."""
+    table = phrase_table_for(index)
+    order = empty_order()
+    penalty = 0.0
+    for m in messages:
+        if m.get("role") != "user": continue
+        parsed = parse_message(m.get("content") or "", table)
+        apply_message(order, parsed)
+        penalty += parsed.penalty
+    return order, order_confidence(order, index, penalty)
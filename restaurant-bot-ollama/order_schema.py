@@ -0,0 +1,153 @@
+# Typed validation of the order summary the model returns.
+#
+# The shape is the one JSON_ORDER_SCHEMA_INSTRUCTION asks for. Model output is
+# close to it but rarely exact: quantities as strings or words, a single line
+# given as an object instead of a list, "quantity" for "qty", "Pickup" for
+# "pickup". validate_order() coerces what it can into OrderSummary and reports
+# what it had to drop; it only rejects objects that are not an order at all.
+# parse_order() hands those problems to the caller together with whether the
+# summary was complete: a reply cut off mid-object must not be priced or saved.
+# ORDER_JSON_SCHEMA is the same shape for servers that can enforce it.
+import json
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+
+from cart import ORDER_KEYS
+from json_extract import best_object, extract_candidates
+from order_parser import NUMBER_WORDS
+
+LINE_CATEGORIES = ("pizzas", "toppings", "drinks", "sides")
+MAX_QTY = 99
+
+def _line_schema(*fields: str) -> Dict[str, Any]:
+    types = {"name": {"type": "string"}, "size": {"type": ["string", "null"]},
+             "qty": {"type": "integer", "minimum": 1, "maximum": MAX_QTY}, "applies_to": {"type": "string"}}
+    return {"type": "array", "items": {"type": "object", "properties": {f: types[f] for f in fields},
+                                       "required": list(fields)}}
+
+# The same shape as JSON_ORDER_SCHEMA_INSTRUCTION, as a JSON Schema for Ollama's `format`
+# field: the server then constrains decoding to it instead of the model merely being asked.
+ORDER_JSON_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "pizzas": _line_schema("name", "size", "qty"),
+        "toppings": _line_schema("name", "qty", "applies_to"),
+        "drinks": _line_schema("name", "size", "qty"),
+        "sides": _line_schema("name", "size", "qty"),
+        "delivery_method": {"type": ["string", "null"], "enum": ["pickup", "delivery", None]},
+        "address": {"type": ["string", "null"]},
+        "notes": {"type": ["string", "null"]},
+    },
+    "required": list(ORDER_KEYS),
+}
+
+class OrderSchemaError(ValueError):
+    pass
+
+class OrderLine(NamedTuple):
+    name: str
+    qty: int
+    size: Optional[str] = None
+    applies_to: Optional[str] = None   # toppings only
+
+    def to_dict(self, category: str) -> Dict[str, Any]:
+        if category == "toppings":
+            return {"name": self.name, "qty": self.qty, "applies_to": self.applies_to or "all"}
+        return {"name": self.name, "size": self.size, "qty": self.qty}
+
+class OrderSummary(NamedTuple):
+    pizzas: List[OrderLine]
+    toppings: List[OrderLine]
+    drinks: List[OrderLine]
+    sides: List[OrderLine]
+    delivery_method: Optional[str]
+    address: Optional[str]
+    notes: Optional[str]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The plain dict the cart, pricing and the order journal work with."""
+        order: Dict[str, Any] = {c: [l.to_dict(c) for l in getattr(self, c)] for c in LINE_CATEGORIES}
+        order.update(delivery_method=self.delivery_method, address=self.address, notes=self.notes)
+        return order
+
+def _text(value: Any) -> Optional[str]:
+    if value is None or isinstance(value, (dict, list)): return None
+    text = str(value).strip()
+    return text if text and text.lower() not in ("null", "none", "n/a", "-") else None
+
+def _qty(value: Any) -> Optional[int]:
+    if value is None: return 1
+    if isinstance(value, bool): return None
+    if isinstance(value, (int, float)):
+        qty = int(value)
+    else:
+        text = str(value).strip().lower()
+        if text in NUMBER_WORDS: qty = NUMBER_WORDS[text]
+        else:
+            try: qty = int(float(text))
+            except ValueError: return None
+    return qty if 1 <= qty <= MAX_QTY else None
+
+def _lines(category: str, value: Any, problems: List[str]) -> List[OrderLine]:
+    if value is None: return []
+    if isinstance(value, dict): value = [value]
+    if not isinstance(value, list):
+        problems.append(f"{category}: expected a list, got {type(value).__name__}")
+        return []
+    lines: List[OrderLine] = []
+    for i, entry in enumerate(value):
+        if isinstance(entry, str): entry = {"name": entry}
+        if not isinstance(entry, dict):
+            problems.append(f"{category}[{i}]: not an object")
+            continue
+        name = _text(entry.get("name") or entry.get("item"))
+        if name is None:
+            problems.append(f"{category}[{i}]: missing name")
+            continue
+        qty = _qty(entry.get("qty", entry.get("quantity")))
+        if qty is None:
+            problems.append(f"{category}[{i}]: bad qty {entry.get('qty', entry.get('quantity'))!r}")
+            continue
+        lines.append(OrderLine(name, qty, _text(entry.get("size")),
+                               _text(entry.get("applies_to")) if category == "toppings" else None))
+    return lines
+
+def validate_order(obj: Any) -> Tuple[OrderSummary, List[str]]:
+    """Coerce a decoded summary into an OrderSummary; returns it with the list of problems fixed or dropped."""
+    if not isinstance(obj, dict):
+        raise OrderSchemaError(f"order summary must be an object, got {type(obj).__name__}")
+    if not set(obj) & set(ORDER_KEYS):
+        raise OrderSchemaError("object has none of the order summary fields")
+    problems: List[str] = []
+    lines = {c: _lines(c, obj.get(c), problems) for c in LINE_CATEGORIES}
+    method = (_text(obj.get("delivery_method")) or "").lower()
+    if method.startswith("deliver"): method = "delivery"
+    elif method in ("pickup", "pick up", "pick-up", "collection", "takeaway"): method = "pickup"
+    elif method:
+        problems.append(f"delivery_method: unknown {obj.get('delivery_method')!r}")
+        method = ""
+    return OrderSummary(delivery_method=method or None, address=_text(obj.get("address")),
+                        notes=_text(obj.get("notes")), **lines), problems
+
+class ParsedOrder(NamedTuple):
+    summary: OrderSummary
+    problems: List[str]     # lines or fields validate_order had to drop
+    complete: bool          # False: the reply ended inside the object, so the order is cut short
+
+def parse_order(text: str) -> Optional[ParsedOrder]:
+    """Find, repair and validate the order summary in a model reply; None if there is none.
+    A cut-off summary is only returned (complete=False) when the reply has no complete one."""
+    candidates = extract_candidates(text)
+    for complete in (True, False):
+        obj = best_object((o for o, c in candidates if c is complete), preferred_keys=ORDER_KEYS)
+        if obj is None: continue
+        try:
+            summary, problems = validate_order(obj)
+        except OrderSchemaError:
+            continue
+        return ParsedOrder(summary, problems, complete)
+    return None
+
+def order_json(text: str) -> Optional[str]:
+    """The complete order summary in a reply as normalized JSON; None if there is none or it was cut off."""
+    parsed = parse_order(text)
+    return json.dumps(parsed.summary.to_dict()) if parsed and parsed.complete else None
@@ -0,0 +1,120 @@
+# Incremental sales statistics over the order journal.
+#
+# SalesStats keeps running aggregates (orders, revenue, per-item and per-hour
+# breakdowns) and only ever parses the bytes appended since the last refresh.
+# The aggregates and the journal offset are snapshotted next to the journal so
+# a restarted app resumes where it left off instead of re-reading history.
+import csv
+import json
+import os
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+from typing import Dict, Any, List, Optional, Tuple
+
+from order_store import ORDER_COLUMNS, SCHEMA_VERSION
+
+SNAPSHOT_VERSION = 1
+_COL = {name: i for i, name in enumerate(ORDER_COLUMNS)}
+
+class SalesStats:
+    def __init__(self, journal_path: str, snapshot_path: Optional[str] = None):
+        self.journal_path = journal_path
+        self.snapshot_path = snapshot_path or f"{journal_path}.stats.json"
+        self._lock = threading.Lock()
+        self._reset(None)
+        self._load_snapshot()
+
+    def _reset(self, ident: Optional[Tuple[int, int]]):
+        self.ident = ident
+        self.offset = 0
+        self.order_count = 0
+        self.revenue = Decimal("0.00")
+        self.item_qty: Counter = Counter()
+        self.item_revenue: Dict[str, Decimal] = {}
+        self.orders_by_hour: List[int] = [0] * 24
+
+    # ---------- Snapshot ----------
+    def _load_snapshot(self):
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                snap = json.load(f)
+            st = os.stat(self.journal_path)
+        except (OSError, ValueError):
+            return
+        if snap.get("version") != SNAPSHOT_VERSION or tuple(snap.get("ident") or ()) != (st.st_dev, st.st_ino):
+            return
+        if snap.get("offset", 0) > st.st_size:
+            return
+        self.ident = (st.st_dev, st.st_ino)
+        self.offset = int(snap["offset"])
+        self.order_count = int(snap["order_count"])
+        self.revenue = Decimal(snap["revenue"])
+        self.item_qty = Counter(snap["item_qty"])
+        self.item_revenue = {k: Decimal(v) for k, v in snap["item_revenue"].items()}
+        self.orders_by_hour = list(snap["orders_by_hour"])
+
+    def _save_snapshot(self):
+        snap = {
+            "version": SNAPSHOT_VERSION, "ident": list(self.ident or ()), "offset": self.offset,
+            "order_count": self.order_count, "revenue": str(self.revenue),
+            "item_qty": dict(self.item_qty), "item_revenue": {k: str(v) for k, v in self.item_revenue.items()},
+            "orders_by_hour": self.orders_by_hour,
+        }
+        tmp = f"{self.snapshot_path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(snap, f)
+            os.replace(tmp, self.snapshot_path)
+        except OSError:
+            pass  # the snapshot is only an optimisation
+
+    # ---------- Incremental update ----------
+    def refresh(self) -> "SalesStats":
+        """Fold any rows appended since the last call into the aggregates."""
+        with self._lock:
+            try:
+                st = os.stat(self.journal_path)
+            except FileNotFoundError:
+                if self.ident is not None: self._reset(None)
+                return self
+            ident = (st.st_dev, st.st_ino)
+            if ident != self.ident or st.st_size < self.offset:
+                # Journal was rotated or compacted: rebuild from the new file.
+                self._reset(ident)
+            if st.st_size == self.offset:
+                return self
+            with open(self.journal_path, "rb") as f:
+                f.seek(self.offset)
+                chunk = f.read(st.st_size - self.offset)
+            end = chunk.rfind(b"\n") + 1  # never consume a half-written row
+            if end == 0:
+                return self
+            self._consume(chunk[:end].decode("utf-8", errors="replace").splitlines())
+            self.offset += end
+            self._save_snapshot()
+            return self
+
+    def _consume(self, lines: List[str]):
+        for row in csv.reader(lines):
+            if len(row) != len(ORDER_COLUMNS) or row[0] != str(SCHEMA_VERSION):
+                continue  # header or torn row
+            try:
+                line_total = Decimal(row[_COL["line_total"]])
+                qty = int(row[_COL["qty"]])
+                if row[_COL["line_no"]] == "1":
+                    self.order_count += 1
+                    self.revenue += Decimal(row[_COL["order_total"]])
+                    self.orders_by_hour[time.localtime(int(row[_COL["timestamp"]])).tm_hour] += 1
+            except (ValueError, ArithmeticError):
+                continue
+            name = row[_COL["name"]]
+            self.item_qty[name] += qty
+            self.item_revenue[name] = self.item_revenue.get(name, Decimal("0.00")) + line_total
+
+    # ---------- Read side ----------
+    def top_items(self, n: int = 5) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{"item": name, "qty": qty, "revenue": float(self.item_revenue.get(name, 0))}
+                    for name, qty in self.item_qty.most_common(n)]
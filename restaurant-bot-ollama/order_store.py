@@ -0,0 +1,267 @@
+# Append-only order journal for the restaurant bot.
+#
+# Every saved order becomes a block of line-item rows appended to a CSV file
+# with a fixed, versioned header. Appends take an exclusive file lock, write
+# the whole order in a single call and fsync, so concurrent Streamlit sessions
+# never lose orders and the cost of a save does not depend on history size.
+# A row torn by a crash mid-append is cut off by the next append, under the
+# same lock, so it can never swallow the first row of the following order.
+#
+# Maintenance commands:
+#   python order_store.py compact  [journal]          # drop torn/duplicate rows
+#   python order_store.py rotate   [journal] [--max-bytes N]
+#   python order_store.py migrate  <legacy.csv> [journal]
+import csv
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Any, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# ---------- Schema ----------
+SCHEMA_VERSION = 1
+ORDER_COLUMNS = [
+    "schema_version",  # always SCHEMA_VERSION for rows written by this module
+    "order_id",        # 12-char hex, shared by every line of one order
+    "timestamp",       # epoch seconds (int), shared by every line of one order
+    "line_no",         # 1-based position of the line inside its order
+    "type",            # pizza | topping | drink | side
+    "name",
+    "size",
+    "qty",             # int
+    "unit_price",      # decimal string, 2 places, no currency sign
+    "line_total",      # decimal string, 2 places
+    "order_total",     # decimal string, 2 places, repeated on every line
+    "delivery_method",
+    "address",
+    "notes",
+]
+HEADER_LINE = ",".join(ORDER_COLUMNS) + "\n"
+DEFAULT_JOURNAL = "orders_journal.csv"
+DEFAULT_ROTATE_BYTES = 32 * 1024 * 1024
+
+# ---------- Locking ----------
+@contextmanager
+def _locked(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        # msvcrt locks a byte range; lock the first byte as a mutex.
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+@contextmanager
+def _open_journal(path: str):
+    """Open the journal for appending with the lock held, surviving a concurrent rotate."""
+    while True:
+        f = open(path, "a+b")
+        try:
+            with _locked(f):
+                # A rotate/compact may have swapped the file between open() and
+                # the lock; if so, retry against the new file.
+                try:
+                    same = os.path.samestat(os.fstat(f.fileno()), os.stat(path))
+                except FileNotFoundError:
+                    same = False
+                if same:
+                    yield f
+                    return
+        finally:
+            f.close()
+
+# ---------- Row encoding ----------
+def _money(value: Any) -> str:
+    try:
+        d = Decimal(str(value).replace("$", "").replace(",", "").strip() or "0")
+    except InvalidOperation:
+        d = Decimal("0")
+    return str(d.quantize(Decimal("0.01")))
+
+def _text(value: Any) -> str:
+    if value is None: return ""
+    # One physical line per row keeps tail readers (stats, analytics) simple.
+    return " ".join(str(value).split())
+
+def _line_type(value: Any) -> str:
+    # Accepts "🍕 Pizza" style display labels as well as plain "pizza".
+    words = _text(value).lower().split()
+    return words[-1] if words else ""
+
+def _qty(value: Any) -> int:
+    try: return int(float(value))
+    except (TypeError, ValueError): return 1
+
+def encode_order(order: Dict[str, Any], line_items: List[Dict[str, Any]], order_id: Optional[str] = None,
+                 timestamp: Optional[int] = None) -> bytes:
+    """Encode one order as journal rows (no header)."""
+    order_id = order_id or uuid.uuid4().hex[:12]
+    ts = int(timestamp if timestamp is not None else time.time())
+    order_total = _money(sum(Decimal(_money(l.get("total", 0))) for l in line_items))
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    for i, l in enumerate(line_items, start=1):
+        size = _text(l.get("size"))
+        writer.writerow([
+            SCHEMA_VERSION, order_id, ts, i,
+            _line_type(l.get("type")), _text(l.get("name")), "" if size == "-" else size,
+            _qty(l.get("qty", 1)), _money(l.get("unit_price", 0)), _money(l.get("total", 0)), order_total,
+            _text(order.get("delivery_method")), _text(order.get("address")), _text(order.get("notes")),
+        ])
+    return buf.getvalue().encode("utf-8")
+
+def _append(f, payload: bytes):
+    """Append rows to the locked journal, first cutting back a torn last row left by a crash."""
+    end = f.seek(0, os.SEEK_END)
+    if end == 0:
+        payload = HEADER_LINE.encode("utf-8") + payload
+    else:
+        # Find the end of the last complete row; only a crash leaves bytes after it.
+        pos = end
+        while pos > 0:
+            start = max(0, pos - 4096)
+            f.seek(start)
+            nl = f.read(pos - start).rfind(b"\n")
+            if nl != -1:
+                pos = start + nl + 1
+                break
+            pos = start
+        if pos != end:
+            f.truncate(pos)
+            if pos == 0: payload = HEADER_LINE.encode("utf-8") + payload
+    f.write(payload)
+
+# ---------- Public API ----------
+def append_order(order: Dict[str, Any], line_items: List[Dict[str, Any]], path: str = DEFAULT_JOURNAL,
+                 fsync: bool = True) -> str:
+    """Durably append one order and return its order_id. O(1) in journal size."""
+    order_id = uuid.uuid4().hex[:12]
+    payload = encode_order(order, line_items, order_id=order_id)
+    with _open_journal(path) as f:
+        _append(f, payload)
+        f.flush()
+        if fsync:
+            os.fsync(f.fileno())
+    return order_id
+
+def iter_rows(path: str = DEFAULT_JOURNAL) -> Iterator[Dict[str, str]]:
+    """Yield journal rows as dicts, skipping torn or foreign-schema lines."""
+    if not os.path.exists(path): return
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for raw in csv.reader(f):
+            if len(raw) != len(ORDER_COLUMNS) or raw[0] != str(SCHEMA_VERSION):
+                continue
+            yield dict(zip(ORDER_COLUMNS, raw))
+
+def compact(path: str = DEFAULT_JOURNAL) -> int:
+    """Rewrite the journal without torn, foreign or duplicate rows. Returns rows kept."""
+    if not os.path.exists(path): return 0
+    tmp = f"{path}.compact.tmp"
+    with _open_journal(path) as f:
+        seen = set()
+        kept = 0
+        with open(tmp, "w", encoding="utf-8", newline="") as out:
+            out.write(HEADER_LINE)
+            writer = csv.writer(out, lineterminator="\n")
+            for row in iter_rows(path):
+                key = (row["order_id"], row["line_no"])
+                if key in seen: continue
+                seen.add(key)
+                writer.writerow([row[c] for c in ORDER_COLUMNS])
+                kept += 1
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp, path)
+    return kept
+
+def rotate(path: str = DEFAULT_JOURNAL, max_bytes: int = DEFAULT_ROTATE_BYTES) -> Optional[str]:
+    """Move the journal aside once it exceeds max_bytes. Returns the archive path, if rotated."""
+    if not os.path.exists(path) or os.path.getsize(path) < max_bytes: return None
+    root, ext = os.path.splitext(path)
+    archive = f"{root}.{time.strftime('%Y%m%d-%H%M%S')}{ext}"
+    with _open_journal(path):
+        os.replace(path, archive)
+    return archive
+
+def migrate_legacy(legacy_path: str, path: str = DEFAULT_JOURNAL) -> int:
+    """Import rows from the old free-form orders.csv. Returns the number of orders imported.
+    Idempotent: each legacy order gets an order_id hashed from its rows, and orders already in the
+    journal are skipped, so running it again (from either CLI) never duplicates history."""
+    if not os.path.exists(legacy_path): return 0
+    groups: Dict[str, List[Dict[str, str]]] = {}
+    with open(legacy_path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            if not row.get("name"): continue
+            groups.setdefault(row.get("order_id") or row.get("timestamp") or "", []).append(row)
+    with _open_journal(path) as f:
+        existing = {row["order_id"] for row in iter_rows(path)}
+        payload = []
+        for rows in groups.values():
+            order_id = _legacy_order_id(rows)
+            if order_id in existing: continue
+            ts = _legacy_timestamp(rows[0].get("timestamp"))
+            order = {k: rows[0].get(k) for k in ("delivery_method", "address", "notes")}
+            lines = [{"type": r.get("type"), "name": r.get("name"), "size": r.get("size"), "qty": r.get("qty"),
+                      "unit_price": r.get("unit_price") or r.get("unit") or 0, "total": r.get("total")} for r in rows]
+            payload.append(encode_order(order, lines, order_id=order_id, timestamp=ts))
+            existing.add(order_id)
+        if payload:
+            _append(f, b"".join(payload))
+            f.flush()
+            os.fsync(f.fileno())
+    return len(payload)
+
+def _legacy_order_id(rows: List[Dict[str, str]]) -> str:
+    return hashlib.sha1(json.dumps(rows, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+def _legacy_timestamp(value: Optional[str]) -> int:
+    if not value: return int(time.time())
+    try: return int(float(value))
+    except ValueError: pass
+    try: return int(datetime.fromisoformat(value).timestamp())
+    except ValueError: return int(time.time())
+
+# ---------- CLI ----------
+def _main(argv: List[str]) -> int:
+    if not argv or argv[0] not in ("compact", "rotate", "migrate"):
+        print("usage: python order_store.py compact [journal] | rotate [journal] [--max-bytes N] | migrate <legacy.csv> [journal]")
+        return 2
+    cmd, args = argv[0], argv[1:]
+    if cmd == "compact":
+        print(json.dumps({"kept_rows": compact(*(args[:1] or [DEFAULT_JOURNAL]))}))
+    elif cmd == "rotate":
+        max_bytes = DEFAULT_ROTATE_BYTES
+        if "--max-bytes" in args:
+            i = args.index("--max-bytes")
+            max_bytes = int(args[i + 1])
+            args = args[:i] + args[i + 2:]
+        print(json.dumps({"archive": rotate(*(args[:1] or [DEFAULT_JOURNAL]), max_bytes=max_bytes)}))
+    else:
+        if not args:
+            print("migrate needs the legacy CSV path")
+            return 2
+        print(json.dumps({"imported_orders": migrate_legacy(args[0], *(args[1:2] or [DEFAULT_JOURNAL]))}))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
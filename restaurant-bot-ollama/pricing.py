@@ -0,0 +1,158 @@
+# Order pricing: one order for the cart, or many at once for reports and replays.
+#
+# calculate_total_from_summary() prices a single order line by line. price_orders()
+# gives exactly the same result for a batch: it flattens every line of every order
+# into one frame, matches each distinct (category, name) and resolves each distinct
+# (category, item, size) once instead of once per line, does the money in integer
+# cents with NumPy, and sums per order with one scatter-add. Decimal rounding is
+# only used per distinct (price, qty) pair, so totals are identical to the cent.
+from decimal import Decimal
+from typing import Dict, Any, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from menu_index import CATEGORY_NOUNS, MenuIndex, MenuItem, build_menu_index
+from menu_match import Match, matcher_for
+
+LINE_TYPES = [("pizzas", "🍕 Pizza"), ("toppings", "🥓 Topping"), ("drinks", "🥤 Drink"), ("sides", "🍟 Side")]
+UNRESOLVED_PRICE = "?"
+CENT = Decimal("0.01")
+
+def _clarification(category: str, name: str, match: Match, item: Optional[MenuItem]) -> str:
+    if item is not None:
+        sizes = ", ".join(str(sz) for sz in item.prices if sz is not None)
+        return f"❓ Which size of {item.name}? ({sizes})"
+    if match.alternatives:
+        return f"❓ Did you mean {' or '.join(match.alternatives)}?"
+    return f"❓ '{name}' is not on our {CATEGORY_NOUNS[category]} menu"
+
+def _match_text(match: Match) -> str:
+    return "✅" if match.method == "exact" else f"✅ ~{match.score:.0%}"
+
+def _qty(entry: Dict[str, Any]) -> int:
+    return int(entry.get("qty", entry.get("quantity", 1)) or 1)
+
+def _index(menu: Union[MenuIndex, Dict[str, Any]]) -> MenuIndex:
+    return menu if isinstance(menu, MenuIndex) else build_menu_index(menu)
+
+def calculate_total_from_summary(order: Dict[str, Any], menu: Union[MenuIndex, Dict[str, Any]]) -> Tuple[float, List[Dict[str, Any]]]:
+    index = _index(menu)
+    matcher = matcher_for(index)
+    line_items: List[Dict[str, Any]] = []
+    total = Decimal("0")
+
+    for category, label in LINE_TYPES:
+        for entry in order.get(category) or []:
+            name = entry.get("name") or ""
+            size = entry.get("size")
+            qty = _qty(entry)
+            match = matcher.match(category, name)
+            hit = index.resolve(category, match.item.key, size) if match.confident else None
+            if hit is None:
+                # Low-confidence or ambiguous: ask instead of silently pricing at $0.00.
+                item = match.item if match.confident else None
+                line_items.append({"type": label, "name": item.name if item else name.title(), "size": size or "-",
+                                   "qty": qty, "unit_price": UNRESOLVED_PRICE, "total": UNRESOLVED_PRICE,
+                                   "match": _clarification(category, name, match, item)})
+                continue
+            item, price = hit
+            line_total = (price * qty).quantize(CENT)
+            total += line_total
+            line_items.append({"type": label, "name": item.name, "size": size or "-", "qty": qty,
+                               "unit_price": f"${price:.2f}", "total": f"${line_total:.2f}",
+                               "match": _match_text(match)})
+
+    return float(total), line_items
+
+def unresolved_lines(line_items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [l for l in line_items if l.get("unit_price") == UNRESOLVED_PRICE]
+
+# ---------- Batch pricing ----------
+def _flatten(orders: Sequence[Dict[str, Any]]) -> pd.DataFrame:
+    order_no: List[int] = []
+    cats: List[int] = []
+    names: List[str] = []
+    sizes: List[Any] = []
+    qtys: List[int] = []
+    for n, order in enumerate(orders):
+        for c, (category, _) in enumerate(LINE_TYPES):
+            for entry in order.get(category) or []:
+                order_no.append(n)
+                cats.append(c)
+                names.append(entry.get("name") or "")
+                sizes.append(entry.get("size"))
+                qtys.append(_qty(entry))
+    return pd.DataFrame({"order": np.asarray(order_no, dtype=np.int64), "cat": np.asarray(cats, dtype=np.int8),
+                         "name": pd.Series(names, dtype=object), "size": pd.Series(sizes, dtype=object),
+                         "qty": np.asarray(qtys, dtype=np.int64)})
+
+def price_orders(orders: Sequence[Dict[str, Any]], menu: Union[MenuIndex, Dict[str, Any]]) -> List[Tuple[float, List[Dict[str, Any]]]]:
+    """Price many orders; element i equals calculate_total_from_summary(orders[i], menu)."""
+    index = _index(menu)
+    matcher = matcher_for(index)
+    lines = _flatten(orders)
+    if lines.empty: return [(0.0, []) for _ in orders]
+
+    # 1. Match each distinct (category, name) once.
+    lines["pair"] = lines.groupby(["cat", "name"], sort=False).ngroup()
+    pairs = lines.drop_duplicates("pair").sort_values("pair")
+    matches = [matcher.match(LINE_TYPES[c][0], name) for c, name in zip(pairs["cat"], pairs["name"])]
+    pair_key = np.array([m.item.key if m.confident else None for m in matches], dtype=object)
+
+    # 2. Resolve each distinct (category, item, size) of the confident lines once.
+    lines["key"] = pair_key[lines["pair"].to_numpy()]
+    confident = lines["key"].notna().to_numpy()
+    lines["hit"] = -1
+    if confident.any():
+        sized = lines.loc[confident, ["cat", "key", "size"]]
+        codes = sized.groupby(["cat", "key", "size"], sort=False, dropna=False).ngroup().to_numpy()
+        firsts = sized.iloc[np.unique(codes, return_index=True)[1]]
+        hits = [index.resolve(LINE_TYPES[c][0], key, size)
+                for c, key, size in zip(firsts["cat"], firsts["key"], firsts["size"])]
+        hit_of_code = np.full(len(hits), -1, dtype=np.int64)
+        resolved = [h for h in hits if h is not None]
+        hit_of_code[[i for i, h in enumerate(hits) if h is not None]] = np.arange(len(resolved))
+        lines.loc[confident, "hit"] = hit_of_code[codes]
+    else:
+        resolved = []
+    hit = lines["hit"].to_numpy()
+    priced = hit >= 0
+
+    # 3. Money in integer cents; Decimal rounding once per distinct (price, qty).
+    qty = lines["qty"].to_numpy()
+    cents = np.zeros(len(lines), dtype=np.int64)
+    total_text = np.full(len(lines), UNRESOLVED_PRICE, dtype=object)
+    if priced.any():
+        pq = pd.DataFrame({"hit": hit[priced], "qty": qty[priced]})
+        pq_code = pq.groupby(["hit", "qty"], sort=False).ngroup().to_numpy()
+        first = np.unique(pq_code, return_index=True)[1]
+        line_totals = [(resolved[h][1] * int(q)).quantize(CENT)
+                       for h, q in zip(pq["hit"].to_numpy()[first], pq["qty"].to_numpy()[first])]
+        cents[priced] = np.array([int(t * 100) for t in line_totals], dtype=np.int64)[pq_code]
+        total_text[priced] = np.array([f"${t:.2f}" for t in line_totals], dtype=object)[pq_code]
+    order_cents = np.zeros(len(orders), dtype=np.int64)
+    np.add.at(order_cents, lines["order"].to_numpy(), cents)
+
+    # 4. Line-item dicts, built from per-pair / per-hit lookups.
+    unit_text = np.array([f"${p:.2f}" for _, p in resolved] + [UNRESOLVED_PRICE], dtype=object)[hit]
+    item_name = np.array([item.name for item, _ in resolved] + [""], dtype=object)[hit]
+    pair_item = [m.item if m.confident else None for m in matches]
+    fallback_name = np.array([item.name if item else name.title()
+                              for item, name in zip(pair_item, pairs["name"])], dtype=object)
+    # Priced lines show how they matched; unpriced ones ask the customer to clarify.
+    pair_note = np.array([_match_text(m) for m in matches] +
+                         [_clarification(LINE_TYPES[c][0], name, m, item)
+                          for m, item, c, name in zip(matches, pair_item, pairs["cat"], pairs["name"])], dtype=object)
+    pair = lines["pair"].to_numpy()
+    names = np.where(priced, item_name, fallback_name[pair])
+    notes = pair_note[np.where(priced, pair, pair + len(matches))]
+    labels = np.array([label for _, label in LINE_TYPES], dtype=object)[lines["cat"].to_numpy()]
+    sizes = [size or "-" for size in lines["size"].tolist()]
+
+    line_items = [{"type": t, "name": nm, "size": sz, "qty": q, "unit_price": up, "total": tt, "match": note}
+                  for t, nm, sz, q, up, tt, note in zip(labels.tolist(), names.tolist(), sizes, qty.tolist(),
+                                                         unit_text.tolist(), total_text.tolist(), notes.tolist())]
+
+    bounds = np.searchsorted(lines["order"].to_numpy(), np.arange(len(orders) + 1)).tolist()
+    return [(c / 100, line_items[bounds[n]:bounds[n + 1]]) for n, c in enumerate(order_cents.tolist())]
@@ -0,0 +1,89 @@
+# Response cache in front of Ollama chat calls.
+#
+# Keys hash the model, the call kind, the menu version and the whole normalized
+# prompt, system messages included (the cart summary lives there), so a repeated
+# question in the same context ("what's on the menu?" right after the greeting)
+# or a re-requested order summary for an unchanged transcript is answered without
+# another generation. The cache is shared by every session in the process, so a
+# key never covers less than the full prompt: two customers only share a reply
+# when the model would have seen exactly the same conversation. Entries are
+# evicted LRU with a TTL; an optional SQLite file shares them across processes
+# and restarts.
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL_S = 15 * 60
+
+_PUNCT = re.compile(r"[^\w\s$.]")
+
+def normalize_text(text: str) -> str:
+    return " ".join(_PUNCT.sub(" ", (text or "").lower()).split())
+
+class ResponseCache:
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_s: float = DEFAULT_TTL_S,
+                 disk_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+        self._db: Optional[sqlite3.Connection] = None
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, created REAL, value TEXT)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created)")
+
+    @staticmethod
+    def key(model: str, kind: str, menu_version: str, messages: List[Dict[str, str]]) -> str:
+        """Cache key over every message sent, so a reply is only reused for an identical prompt."""
+        payload = [model, kind, menu_version] + [[m.get("role"), normalize_text(m.get("content"))] for m in messages]
+        return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] <= self.ttl_s:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            if self._db is not None:
+                row = self._db.execute("SELECT created, value FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None and now - row[0] <= self.ttl_s:
+                    self._remember(key, row[0], row[1])
+                    self.hits += 1
+                    return row[1]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO responses (key, created, value) VALUES (?, ?, ?)",
+                                 (key, now, value))
+                self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_s,))
+
+    def _remember(self, key: str, created: float, value: str):
+        self._entries[key] = (created, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions, "hit_rate": self.hits / lookups if lookups else 0.0}
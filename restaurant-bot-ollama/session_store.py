@@ -0,0 +1,220 @@
+# Durable chat sessions, so a reconnect or an app restart resumes the conversation.
+#
+# Each session is one append-only JSONL log, named by the session id kept in the
+# page URL (?sid=...): one {"m": message} line per chat message and a {"cart": ...}
+# line whenever the cart changed. A turn costs one small append and no rewrite;
+# resuming replays the log (last cart snapshot wins) with no model call. The log
+# is rewritten only when the transcript was reset or edited, when a crash left a
+# torn last line, or when superseded cart snapshots outnumber the messages.
+# System messages are not stored: they are rebuilt from the current menu on resume.
+#
+# Memory stays bounded with thousands of live sessions: the store keeps only a
+# small LRU of per-session bookkeeping (counts and hashes, no transcripts), and
+# transcripts live in Streamlit session state and on disk. Logs idle for longer
+# than the TTL are deleted by a background sweep.
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+
+DEFAULT_SESSION_DIR = "sessions"
+DEFAULT_TTL_S = 24 * 3600
+DEFAULT_MAX_CACHED = 10_000   # ~200 bytes each
+DEFAULT_SWEEP_INTERVAL = 600.0
+_SESSION_ID = re.compile(r"^[0-9a-f]{32}$")
+
+class SessionState(NamedTuple):
+    messages: List[Dict[str, str]]   # without system messages
+    cart: Optional[Dict[str, Any]]   # Cart.to_state() at the last save
+    updated_at: float
+
+class _Entry:
+    """What the store remembers about a session's log, to turn a save into an append."""
+    __slots__ = ("count", "last", "cart", "records")
+
+    def __init__(self, count: int, last: str, cart: Optional[str], records: int):
+        self.count = count      # messages in the log
+        self.last = last        # hash of the last one, to notice an edited transcript
+        self.cart = cart        # hash of the last cart snapshot
+        self.records = records  # lines in the log
+
+def new_session_id() -> str:
+    return uuid.uuid4().hex
+
+def valid_session_id(value: Any) -> bool:
+    return isinstance(value, str) and bool(_SESSION_ID.match(value))
+
+def _transcript(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    return [{"role": m.get("role"), "content": m.get("content")} for m in messages if m.get("role") != "system"]
+
+def _hash(text: Optional[str]) -> Optional[str]:
+    return None if text is None else hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def _digest(message: Optional[Dict[str, str]]) -> str:
+    if message is None: return ""
+    return _hash(json.dumps(message, ensure_ascii=False, sort_keys=True))
+
+class SessionStore:
+    def __init__(self, directory: str = DEFAULT_SESSION_DIR, ttl_s: float = DEFAULT_TTL_S,
+                 max_cached: int = DEFAULT_MAX_CACHED, sweep_interval: float = DEFAULT_SWEEP_INTERVAL):
+        self.directory = directory
+        self.ttl_s = ttl_s
+        self.max_cached = max_cached
+        self.sweep_interval = sweep_interval
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._thread: Optional[threading.Thread] = None
+        self.appends = self.rewrites = self.resumes = self.expired = 0
+
+    def _path(self, sid: str) -> str:
+        if not valid_session_id(sid): raise ValueError(f"invalid session id {sid!r}")
+        return os.path.join(self.directory, f"{sid}.jsonl")
+
+    def _remember(self, sid: str, entry: _Entry):
+        self._entries[sid] = entry
+        self._entries.move_to_end(sid)
+        while len(self._entries) > self.max_cached:
+            self._entries.popitem(last=False)
+
+    # ---------- Read side ----------
+    @staticmethod
+    def _replay(path: str) -> Tuple[List[Dict[str, str]], Optional[str], int, bool]:
+        """(messages, last cart snapshot as text, line count, torn) from a log; OSError if there is none."""
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+        messages: List[Dict[str, str]] = []
+        cart: Optional[str] = None
+        torn = False
+        for line in lines:
+            try:
+                if not line.endswith("\n"): raise ValueError("unterminated")
+                record = json.loads(line)
+            except ValueError:
+                torn = True  # a crash mid-append: the log must be rewritten before anything is appended
+                continue
+            if "m" in record: messages.append(record["m"])
+            elif "cart" in record: cart = json.dumps(record["cart"], ensure_ascii=False, sort_keys=True)
+        return messages, cart, len(lines), torn
+
+    def load(self, sid: str) -> Optional[SessionState]:
+        """The saved session, or None if there is none or it expired."""
+        path = self._path(sid)
+        try:
+            updated_at = os.path.getmtime(path)
+            if time.time() - updated_at > self.ttl_s:
+                self.delete(sid)
+                return None
+            messages, cart, records, torn = self._replay(path)
+        except OSError:
+            return None
+        with self._lock:
+            if torn:
+                self._rewrite(sid, path, messages, cart)
+            else:
+                self._remember(sid, _Entry(len(messages), _digest(messages[-1] if messages else None), _hash(cart),
+                                           records))
+            self.resumes += 1
+        return SessionState(messages, json.loads(cart) if cart else None, updated_at)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"cached": len(self._entries), "appends": self.appends, "rewrites": self.rewrites,
+                    "resumes": self.resumes, "expired": self.expired}
+
+    # ---------- Write side ----------
+    def save(self, sid: str, messages: List[Dict[str, str]], cart: Optional[Dict[str, Any]] = None):
+        """Persist the session as it is now; appends only what changed since the last save."""
+        path = self._path(sid)
+        transcript = _transcript(messages)
+        cart_text = json.dumps(cart, ensure_ascii=False, sort_keys=True) if cart is not None else None
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None:
+                # Evicted from the LRU (or saved by another process): recount the log instead of rewriting it.
+                try:
+                    saved, cart_saved, records, torn = self._replay(path)
+                    if not torn:  # a torn log is rewritten below rather than appended to
+                        entry = _Entry(len(saved), _digest(saved[-1] if saved else None), _hash(cart_saved), records)
+                        self._remember(sid, entry)
+                except OSError:
+                    pass  # new session
+            if (entry is None or len(transcript) < entry.count or
+                    (entry.count and _digest(transcript[entry.count - 1]) != entry.last) or
+                    entry.records > 2 * len(transcript) + 16):
+                self._rewrite(sid, path, transcript, cart_text)
+                return
+            lines = [json.dumps({"m": m}, ensure_ascii=False) + "\n" for m in transcript[entry.count:]]
+            cart_hash = _hash(cart_text)
+            if cart_hash is not None and cart_hash != entry.cart:
+                lines.append('{"cart": ' + cart_text + "}\n")
+            if not lines: return
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("".join(lines))   # one write: a crash can tear only the last line
+            entry.count = len(transcript)
+            entry.last = _digest(transcript[-1] if transcript else None)
+            entry.cart = cart_hash or entry.cart
+            entry.records += len(lines)
+            self._entries.move_to_end(sid)
+            self.appends += 1
+
+    def _rewrite(self, sid: str, path: str, transcript: List[Dict[str, str]], cart_text: Optional[str]):
+        lines = [json.dumps({"m": m}, ensure_ascii=False) + "\n" for m in transcript]
+        if cart_text is not None:
+            lines.append('{"cart": ' + cart_text + "}\n")
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("".join(lines))
+        os.replace(tmp, path)
+        self._remember(sid, _Entry(len(transcript), _digest(transcript[-1] if transcript else None),
+                                   _hash(cart_text), len(lines)))
+        self.rewrites += 1
+
+    def delete(self, sid: str):
+        with self._lock:
+            self._entries.pop(sid, None)
+        try:
+            os.remove(self._path(sid))
+        except OSError:
+            pass
+
+    # ---------- Expiry ----------
+    def sweep(self) -> int:
+        """Delete logs idle for longer than the TTL; returns how many."""
+        cutoff = time.time() - self.ttl_s
+        removed = 0
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return 0
+        for name in names:
+            sid, ext = os.path.splitext(name)
+            if ext != ".jsonl" or not valid_session_id(sid): continue
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) >= cutoff: continue
+                os.remove(path)
+            except OSError:
+                continue
+            with self._lock:
+                self._entries.pop(sid, None)
+                self.expired += 1
+            removed += 1
+        return removed
+
+    def start(self) -> "SessionStore":
+        with self._lock:
+            if self.sweep_interval > 0 and (self._thread is None or not self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name="session-sweep", daemon=True)
+                self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            self.sweep()
+            time.sleep(self.sweep_interval)
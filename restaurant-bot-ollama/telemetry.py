@@ -0,0 +1,226 @@
+# Per-turn tracing and metrics for the ordering pipeline.
+#
+# A trace covers one customer action (a chat turn, a Calculate click) and holds
+# one span per stage: prompt build, cache lookup, admission wait, the Ollama
+# call with its own eval/prompt-eval timings, JSON extraction, pricing and the
+# journal write. Every finished span also feeds Prometheus-style counters and
+# histograms; finished traces are kept in a small ring buffer for the sidebar
+# debug panel and written as one JSON log line each.
+import contextvars
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+DEFAULT_RECENT_TRACES = 50
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+logger = logging.getLogger("restaurant_bot.telemetry")
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _labels(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs: return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+class Metrics:
+    """Minimal Prometheus registry: counters and fixed-bucket histograms with labels."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, List[float]]] = {}  # bucket counts..., sum, count
+
+    def inc(self, name: str, value: float = 1.0, help: str = "", **labels):
+        with self._lock:
+            self._help.setdefault(name, ("counter", help))
+            series = self._counters.setdefault(name, {})
+            key = _labels(labels)
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, help: str = "", **labels):
+        with self._lock:
+            self._help.setdefault(name, ("histogram", help))
+            series = self._histograms.setdefault(name, {})
+            key = _labels(labels)
+            state = series.get(key)
+            if state is None:
+                state = series[key] = [0.0] * (len(BUCKETS) + 2)
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound: state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def value(self, name: str, **labels) -> float:
+        """Current value of one counter series (0 if it has not been incremented)."""
+        with self._lock:
+            return self._counters.get(name, {}).get(_labels(labels), 0.0)
+
+    def render(self) -> str:
+        """Prometheus text exposition format."""
+        out: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                out.append(f"# HELP {name} {self._help[name][1]}")
+                out.append(f"# TYPE {name} counter")
+                out += [f"{name}{_format_labels(k)} {v:g}" for k, v in sorted(series.items())]
+            for name, series in sorted(self._histograms.items()):
+                out.append(f"# HELP {name} {self._help[name][1]}")
+                out.append(f"# TYPE {name} histogram")
+                for key, state in sorted(series.items()):
+                    for bound, count in zip(BUCKETS, state):
+                        out.append(f"{name}_bucket{_format_labels(key, ('le', f'{bound:g}'))} {count:g}")
+                    out.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {state[-1]:g}")
+                    out.append(f"{name}_sum{_format_labels(key)} {state[-2]:.6f}")
+                    out.append(f"{name}_count{_format_labels(key)} {state[-1]:g}")
+        return "\n".join(out) + "\n"
+
+class Span:
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.name = name
+        self.attrs = dict(attrs)
+        self.started = time.perf_counter()
+        self.duration_s: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def set(self, **attrs):
+        self.attrs.update({k: v for k, v in attrs.items() if v is not None})
+
+    def fail(self, message: str):
+        self.error = message[:200]
+
+class Trace:
+    def __init__(self, kind: str, attrs: Dict[str, Any]):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.kind = kind
+        self.attrs = dict(attrs)
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.duration_s: Optional[float] = None
+        self.spans: List[Span] = []
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id, "kind": self.kind, "started_at": self.started_at,
+            "duration_ms": round((self.duration_s or 0.0) * 1000, 1), **self.attrs,
+            "spans": [{"name": s.name, "offset_ms": round((s.started - self.started) * 1000, 1),
+                       "duration_ms": round((s.duration_s or 0.0) * 1000, 1), "error": s.error, **s.attrs}
+                      for s in self.spans],
+        }
+
+_current: "contextvars.ContextVar[Optional[Trace]]" = contextvars.ContextVar("current_trace", default=None)
+
+class Telemetry:
+    def __init__(self, recent: int = DEFAULT_RECENT_TRACES):
+        self.metrics = Metrics()
+        self.recent: "deque[Dict[str, Any]]" = deque(maxlen=recent)
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @contextmanager
+    def trace(self, kind: str, **attrs) -> Iterator[Trace]:
+        """Root of one customer action; spans opened in this context attach to it."""
+        trace = Trace(kind, attrs)
+        token = _current.set(trace)
+        try:
+            yield trace
+        finally:
+            _current.reset(token)
+            trace.duration_s = time.perf_counter() - trace.started
+            self.metrics.observe("pipeline_turn_seconds", trace.duration_s, "End-to-end time of a customer action",
+                                 kind=kind)
+            record = trace.to_dict()
+            with self._lock:
+                self.recent.append(record)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(json.dumps(record, default=str))
+
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[Span]:
+        """Time one stage. Works without an active trace (metrics only), e.g. on background threads."""
+        span = Span(name, attrs)
+        try:
+            yield span
+        except Exception as e:
+            span.fail(f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            span.duration_s = time.perf_counter() - span.started
+            outcome = "error" if span.error else "ok"
+            self.metrics.observe("pipeline_stage_seconds", span.duration_s, "Time spent per pipeline stage",
+                                 stage=name)
+            if span.error:
+                self.metrics.inc("pipeline_stage_errors_total", help="Pipeline stages that failed", stage=name)
+            trace = _current.get()
+            if trace is not None:
+                trace.spans.append(span)
+            if span.error and logger.isEnabledFor(logging.WARNING):
+                logger.warning(json.dumps({"event": "stage_error", "stage": name, "outcome": outcome,
+                                           "error": span.error, "trace_id": trace.trace_id if trace else None}))
+
+    def record_ollama(self, kind: str, outcome: str, timings: Dict[str, Any]):
+        """Count an Ollama call and export the timings Ollama reported for it."""
+        self.metrics.inc("ollama_requests_total", help="Ollama chat calls by outcome", kind=kind, outcome=outcome)
+        if timings.get("eval_count"):
+            self.metrics.inc("ollama_eval_tokens_total", timings["eval_count"], "Tokens generated", kind=kind)
+            self.metrics.observe("ollama_eval_duration_seconds", timings.get("eval_duration_s") or 0.0,
+                                 "Generation time reported by Ollama", kind=kind)
+        if timings.get("prompt_eval_count"):
+            self.metrics.inc("ollama_prompt_tokens_total", timings["prompt_eval_count"], "Prompt tokens evaluated",
+                             kind=kind)
+            self.metrics.observe("ollama_prompt_eval_duration_seconds", timings.get("prompt_eval_duration_s") or 0.0,
+                                 "Prompt evaluation time reported by Ollama", kind=kind)
+        if timings.get("ttft_s") is not None:
+            self.metrics.observe("ollama_time_to_first_token_seconds", timings["ttft_s"], "Streaming time to first token",
+                                 kind=kind)
+
+    def recent_traces(self, n: int = 10) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self.recent)[-n:][::-1]
+
+    def serve_metrics(self, port: int, host: str = "0.0.0.0") -> bool:
+        """Expose GET /metrics on a daemon thread. Returns False if the port is taken."""
+        if self._server is not None: return True
+        telemetry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if not self.path.startswith("/metrics"):
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = telemetry.metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        try:
+            self._server = ThreadingHTTPServer((host, port), Handler)
+        except OSError as e:
+            logger.warning(json.dumps({"event": "metrics_server_failed", "port": port, "error": str(e)}))
+            return False
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True).start()
+        return True
+
+def configure_json_logs(path: Optional[str] = None, level: int = logging.INFO):
+    """Send trace records to stderr or a file, one JSON object per line."""
+    handler: logging.Handler = logging.FileHandler(path, encoding="utf-8") if path else logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.handlers[:] = [handler]
+    logger.setLevel(level)
+    logger.propagate = False
@@ -1,9 +1,9 @@
-import requests
+from ollama_client import OllamaClient
 
 OLLAMA_URL = "http://localhost:11434"
 try:
-    response = requests.get(f"{OLLAMA_URL}/api/tags", timeout=5)
+    client = OllamaClient(OLLAMA_URL, retries=0)
+    response = client.get("/api/tags", read_timeout=5)
     print("Success:", response.status_code, response.json())
 except Exception as e:
     print("Error:", e)
-